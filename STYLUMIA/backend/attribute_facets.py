@@ -0,0 +1,109 @@
+import json
+import logging
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+from fastapi import HTTPException
+
+from index_bundle import row_fingerprint_mismatch
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN_CODE = 255
+ATTRIBUTE_FINGERPRINT_FILE = "attribute_codes.json"
+
+
+def parse_attribute_filter(attributes: Optional[str]) -> Dict[str, List[str]]:
+    """Parse "color:red,color:blue,pattern:floral" into {facet: [values]}"""
+    filters = {}
+    if not attributes:
+        return filters
+    for term in attributes.split(","):
+        facet, sep, value = term.partition(":")
+        if not sep or not facet.strip() or not value.strip():
+            raise HTTPException(status_code=400, detail=f"Invalid attribute filter: {term!r}")
+        filters.setdefault(facet.strip().lower(), []).append(value.strip().lower())
+    return filters
+
+
+class AttributeFacets:
+    """
+    Precomputed per-product attribute codes (see scripts/build_attribute_tags.py)
+
+    The codes are only used while their row fingerprint matches product_ids;
+    rows added to the index since the build count as untagged.
+    """
+
+    def __init__(self, index_path: str, product_ids: np.ndarray):
+        self.codes = None
+        self.facets: Dict[str, List[str]] = {}
+        codes_file = os.path.join(index_path, "attribute_codes.npy")
+        vocab_file = os.path.join(index_path, "attribute_vocabulary.json")
+        if not os.path.exists(codes_file) or not os.path.exists(vocab_file):
+            return
+        try:
+            mismatch = row_fingerprint_mismatch(os.path.join(index_path, ATTRIBUTE_FINGERPRINT_FILE), product_ids)
+            if mismatch:
+                logger.warning(f"Ignoring attribute facets ({mismatch}); re-run build_attribute_tags.py")
+                return
+            with open(vocab_file, encoding="utf-8") as f:
+                self.facets = json.load(f)["facets"]
+            codes = np.load(codes_file, mmap_mode="r")
+            self.codes = codes[:min(len(codes), len(product_ids))]
+            self._value_codes = {
+                facet: {value.lower(): code for code, value in enumerate(values)}
+                for facet, values in self.facets.items()
+            }
+            logger.info(f"Loaded attribute codes for {self.codes.shape[0]} products: {list(self.facets)}")
+        except Exception as e:
+            logger.error(f"Error loading attribute facets: {e}")
+            self.codes = None
+
+    @property
+    def available(self) -> bool:
+        return self.codes is not None
+
+    def attributes(self, row: int) -> Dict[str, str]:
+        """Decoded attribute values of one product"""
+        if not self.available or row >= self.codes.shape[0]:
+            return {}
+        return {
+            facet: values[code]
+            for (facet, values), code in zip(self.facets.items(), self.codes[row])
+            if code != UNKNOWN_CODE
+        }
+
+    def mask(self, filters: Dict[str, List[str]], n: int) -> np.ndarray:
+        """Rows matching any value within each facet and all given facets"""
+        if not self.available:
+            raise HTTPException(status_code=400, detail="Attribute facets are not available")
+        rows = min(self.codes.shape[0], n)
+        mask = np.zeros(n, dtype=bool)
+        mask[:rows] = True
+        facet_names = list(self.facets)
+        for facet, values in filters.items():
+            if facet not in self._value_codes:
+                raise HTTPException(status_code=400, detail=f"Unknown facet: {facet}")
+            unknown = [v for v in values if v not in self._value_codes[facet]]
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Unknown {facet} values: {unknown}")
+            wanted = [self._value_codes[facet][v] for v in values]
+            column = self.codes[:rows, facet_names.index(facet)]
+            mask[:rows] &= np.isin(column, wanted)
+        return mask
+
+    def counts(self, mask: Optional[np.ndarray] = None) -> Dict[str, Dict[str, int]]:
+        """Per-facet value counts over the catalog, or over rows in mask"""
+        if not self.available:
+            return {}
+        if mask is None:
+            codes = self.codes
+        else:
+            rows = min(self.codes.shape[0], len(mask))
+            codes = self.codes[:rows][mask[:rows]]
+        result = {}
+        for f, (facet, values) in enumerate(self.facets.items()):
+            counts = np.bincount(codes[:, f], minlength=UNKNOWN_CODE + 1)
+            result[facet] = {value: int(counts[code]) for code, value in enumerate(values) if counts[code]}
+        return result
@@ -0,0 +1,217 @@
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict, deque
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from fastapi import HTTPException
+
+from stage_metrics import StageMetrics, stage_metrics
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+# In-flight items one client may have queued or running per scheduler
+CLIENT_CONCURRENCY = int(os.environ.get("STYLUMIA_CLIENT_CONCURRENCY", 8))
+
+
+class Lane:
+    """One priority class: dequeue weight, batching behaviour and admission limit"""
+
+    def __init__(self, name: str, weight: int = 1, max_batch_size: int = 16,
+                 max_wait_ms: float = 2.0, max_queue_depth: int = 256):
+        self.name = name
+        self.weight = weight
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue_depth = max_queue_depth
+        self.queue = deque()
+        self.current = 0  # smooth weighted round-robin credit
+
+
+def default_lanes(interactive_batch: int = 8, bulk_batch: int = 64) -> List[Lane]:
+    """Interactive: small batches, short waits, shed early. Bulk: large batches, deep queue."""
+    return [
+        Lane(INTERACTIVE, weight=int(os.environ.get("STYLUMIA_INTERACTIVE_WEIGHT", 8)),
+             max_batch_size=interactive_batch, max_wait_ms=1.0,
+             max_queue_depth=int(os.environ.get("STYLUMIA_INTERACTIVE_QUEUE_DEPTH", 64))),
+        Lane(BULK, weight=int(os.environ.get("STYLUMIA_BULK_WEIGHT", 1)),
+             max_batch_size=bulk_batch, max_wait_ms=10.0,
+             max_queue_depth=int(os.environ.get("STYLUMIA_BULK_QUEUE_DEPTH", 1024))),
+    ]
+
+
+class PriorityScheduler:
+    """
+    Batch requests into one model / index call, with separate priority lanes
+
+    Each lane has its own queue. The worker picks the next lane by smooth
+    weighted round-robin over non-empty lanes, then batches up to that lane's
+    max_batch_size items, waiting at most max_wait_ms for more unless another
+    lane has work. batch_fn runs in the default thread pool and must return
+    one output per input, in order.
+
+    Admission: a submit is shed with 503 when its lane is at max_queue_depth,
+    and rejected with 429 when the client already has client_concurrency
+    items in flight.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], Sequence[Any]],
+                 lanes: Optional[List[Lane]] = None, client_concurrency: int = CLIENT_CONCURRENCY,
+                 name: str = "batch", metrics: StageMetrics = stage_metrics):
+        self.batch_fn = batch_fn
+        self.lanes = {lane.name: lane for lane in (lanes or default_lanes())}
+        self.client_concurrency = client_concurrency
+        self.name = name
+        self.metrics = metrics
+        self._in_flight = defaultdict(int)
+        self._arrival = None
+        self._worker = None
+        self._loop = None
+
+    def _ensure_worker(self, loop):
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            # Items queued on a previous event loop can never complete
+            for lane in self.lanes.values():
+                lane.queue.clear()
+            self._in_flight.clear()
+            self._loop = loop
+            self._arrival = asyncio.Event()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, item: Any, lane: str = INTERACTIVE, client: str = "anonymous") -> Any:
+        if lane not in self.lanes:
+            raise HTTPException(status_code=400, detail=f"priority must be one of {list(self.lanes)}")
+        queue_lane = self.lanes[lane]
+        loop = asyncio.get_running_loop()
+        self._ensure_worker(loop)
+
+        if len(queue_lane.queue) >= queue_lane.max_queue_depth:
+            self.metrics.increment(f"{self.name}_shed_{lane}")
+            raise HTTPException(status_code=503, detail=f"Server busy: {lane} queue is full",
+                                headers={"Retry-After": "1"})
+        if self._in_flight[client] >= self.client_concurrency:
+            self.metrics.increment(f"{self.name}_client_limited")
+            raise HTTPException(status_code=429, detail="Too many concurrent requests from this client",
+                                headers={"Retry-After": "1"})
+
+        self._in_flight[client] += 1
+        try:
+            future = loop.create_future()
+            queue_lane.queue.append((item, future, time.perf_counter()))
+            self._arrival.set()
+            return await future
+        finally:
+            self._in_flight[client] -= 1
+            if self._in_flight[client] <= 0:
+                self._in_flight.pop(client, None)
+
+    def in_flight(self, client: str) -> int:
+        """Items the client has queued or running"""
+        return self._in_flight.get(client, 0)
+
+    def _next_lane(self) -> Optional[Lane]:
+        """Smooth weighted round-robin over lanes with queued work"""
+        ready = [lane for lane in self.lanes.values() if lane.queue]
+        if not ready:
+            return None
+        total = sum(lane.weight for lane in ready)
+        for lane in ready:
+            lane.current += lane.weight
+        chosen = max(ready, key=lambda lane: lane.current)
+        chosen.current -= total
+        return chosen
+
+    def _others_waiting(self, lane: Lane) -> bool:
+        return any(other.queue for other in self.lanes.values() if other is not lane)
+
+    async def _collect(self, lane: Lane) -> List:
+        loop = asyncio.get_running_loop()
+        batch = [lane.queue.popleft()]
+        deadline = loop.time() + lane.max_wait
+        while len(batch) < lane.max_batch_size:
+            if lane.queue:
+                batch.append(lane.queue.popleft())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0 or self._others_waiting(lane):
+                break
+            self._arrival.clear()
+            try:
+                await asyncio.wait_for(self._arrival.wait(), timeout)
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            lane = self._next_lane()
+            if lane is None:
+                self._arrival.clear()
+                await self._arrival.wait()
+                continue
+
+            batch = await self._collect(lane)
+            dequeued = time.perf_counter()
+            for _, _, enqueued in batch:
+                self.metrics.record(f"{self.name}_wait_{lane.name}", dequeued - enqueued)
+
+            items = [item for item, _, _ in batch]
+            try:
+                outputs = await loop.run_in_executor(None, self.batch_fn, items)
+            except Exception as e:
+                logger.error(f"{self.name} {lane.name} batch of {len(items)} failed: {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.metrics.record(f"{self.name}_batch_{lane.name}", time.perf_counter() - dequeued)
+            self.metrics.increment(f"{self.name}_batches_{lane.name}")
+            self.metrics.increment(f"{self.name}_items_{lane.name}", len(items))
+            for (_, future, _), output in zip(batch, outputs):
+                if future.done():
+                    continue
+                # batch_fn may fail single items by returning their exception
+                if isinstance(output, BaseException):
+                    future.set_exception(output)
+                else:
+                    future.set_result(output)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "lanes": {
+                name: {
+                    "queue_depth": len(lane.queue),
+                    "max_queue_depth": lane.max_queue_depth,
+                    "weight": lane.weight,
+                    "max_batch_size": lane.max_batch_size,
+                }
+                for name, lane in self.lanes.items()
+            },
+            "clients_in_flight": len(self._in_flight),
+            "client_concurrency": self.client_concurrency,
+        }
+
+
+def batch_client(client: str) -> str:
+    """
+    Client id for multi-item endpoints: their items count against a separate
+    per-client allowance, so a large batch cannot crowd out the same client's
+    interactive requests with 429s
+    """
+    return f"{client}:batch"
+
+
+def run_calls(calls: List[Callable[[], Any]]) -> List[Any]:
+    """batch_fn for schedulers whose items are zero-argument callables"""
+    outputs = []
+    for call in calls:
+        try:
+            outputs.append(call())
+        except Exception as e:
+            outputs.append(e)
+    return outputs
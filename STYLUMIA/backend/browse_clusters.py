@@ -0,0 +1,96 @@
+import logging
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+
+from index_bundle import row_fingerprint_mismatch
+
+logger = logging.getLogger(__name__)
+
+BROWSE_CENTROIDS_FILE = "browse_centroids.npy"
+BROWSE_LABELS_FILE = "browse_labels.npy"
+BROWSE_MEMBERS_FILE = "browse_members.npy"
+BROWSE_SCORES_FILE = "browse_scores.npy"
+BROWSE_OFFSETS_FILE = "browse_offsets.npy"
+BROWSE_FINGERPRINT_FILE = "browse_clusters.json"
+BROWSE_FILES = (BROWSE_CENTROIDS_FILE, BROWSE_LABELS_FILE, BROWSE_MEMBERS_FILE,
+                BROWSE_SCORES_FILE, BROWSE_OFFSETS_FILE)
+
+
+class BrowseClusters:
+    """
+    Memory-mapped "browse by look" clusters (see scripts/build_browse_clusters.py)
+
+    members lists index rows grouped by cluster, most typical first, with
+    scores holding each member's similarity to its centroid; cluster c is
+    members[offsets[c]:offsets[c + 1]], so its first member is the medoid.
+    The files are only used while their row fingerprint matches product_ids.
+    """
+
+    def __init__(self, index_path: str, product_ids: np.ndarray):
+        self.index_path = index_path
+        self.fingerprint_file = os.path.join(index_path, BROWSE_FINGERPRINT_FILE)
+        self.product_ids = product_ids
+        self.n = len(product_ids)
+        self.centroids = None
+        self.labels = None
+        self.members = None
+        self.scores = None
+        self.offsets = None
+        self._mtime = None
+        self.refresh()
+
+    @property
+    def available(self) -> bool:
+        return self.offsets is not None
+
+    def __len__(self):
+        return len(self.offsets) - 1 if self.available else 0
+
+    def refresh(self):
+        """(Re)map the files if they were (re)written since the last load"""
+        paths = [os.path.join(self.index_path, name) for name in BROWSE_FILES]
+        if not all(os.path.exists(path) for path in paths):
+            return
+        mtime = max(os.path.getmtime(path) for path in paths + [self.fingerprint_file]
+                    if os.path.exists(path))
+        if mtime == self._mtime:
+            return
+        try:
+            mismatch = row_fingerprint_mismatch(self.fingerprint_file, self.product_ids)
+            if mismatch:
+                # Remember the mtime so stale clusters are not re-checked on every request
+                self.centroids = self.labels = self.members = self.scores = self.offsets = None
+                self._mtime = mtime
+                logger.warning(f"Ignoring browse clusters ({mismatch}); re-run build_browse_clusters.py")
+                return
+            centroids, labels, members, scores, offsets = (np.load(path, mmap_mode="r") for path in paths)
+            if len(labels) > self.n or len(members) != len(labels) or len(offsets) != len(centroids) + 1:
+                raise ValueError(f"{len(labels)} labelled rows for an index of {self.n}; "
+                                 f"re-run build_browse_clusters.py")
+            self.centroids, self.labels, self.members, self.scores, self.offsets = \
+                centroids, labels, members, scores, np.asarray(offsets)
+            self._mtime = mtime
+            logger.info(f"Mapped browse clusters: {len(labels)} products -> {len(centroids)} clusters")
+        except Exception as e:
+            logger.error(f"Error loading browse clusters: {e}")
+
+    def sizes(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def medoids(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(cluster ids, medoid rows, medoid scores) of the non-empty clusters"""
+        clusters = np.flatnonzero(self.sizes() > 0)
+        starts = self.offsets[clusters]
+        return clusters, np.asarray(self.members[starts]), np.asarray(self.scores[starts], dtype='float32')
+
+    def page(self, cluster: int, page: int, page_size: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """(rows, scores) of one page of a cluster's members, or None for an unknown cluster"""
+        if not 0 <= cluster < len(self):
+            return None
+        start = self.offsets[cluster] + page * page_size
+        stop = min(start + page_size, self.offsets[cluster + 1])
+        if start >= stop:
+            return np.empty(0, dtype='int64'), np.empty(0, dtype='float32')
+        return np.asarray(self.members[start:stop], dtype='int64'), np.asarray(self.scores[start:stop], dtype='float32')
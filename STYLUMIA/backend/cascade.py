@@ -0,0 +1,137 @@
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+import torch
+from PIL import Image
+
+from batching import PriorityScheduler
+from index_bundle import row_fingerprint_mismatch
+from resource_registry import acquire_clip, acquire_index, release_clip, release_index
+
+logger = logging.getLogger(__name__)
+
+# Escalate to the primary encoder when the cheap encoder's score gaps fall below this
+CASCADE_MARGIN = float(os.environ.get("STYLUMIA_CASCADE_MARGIN", 0.02))
+# Rows the cheap encoder retrieves for the primary encoder to re-rank
+CASCADE_CANDIDATES = int(os.environ.get("STYLUMIA_CASCADE_CANDIDATES", 100))
+
+ENCODERS_FILE = "encoders.json"
+ENCODERS_DIR = "encoders"
+# Next to the cascade index: the product_ids.npy rows its ids refer to
+CASCADE_FINGERPRINT_FILE = "product_rows.json"
+
+
+def encoder_dir_name(model_name: str) -> str:
+    """Directory name for an encoder's index, e.g. ViT-B/32 -> ViT-B-32"""
+    return model_name.replace("/", "-")
+
+
+def load_encoder_manifest(index_path: str) -> Dict[str, Dict]:
+    """Model tags for the indexes in index_path (empty when never written)"""
+    manifest_file = os.path.join(index_path, ENCODERS_FILE)
+    if not os.path.exists(manifest_file):
+        return {}
+    with open(manifest_file) as f:
+        return json.load(f)
+
+
+class ModelCascade:
+    """
+    Cheap-encoder first pass over a second, row-aligned copy of the catalog index
+
+    scripts/build_cascade_index.py embeds the catalog with a smaller CLIP
+    backbone and records it under "cascade" in encoders.json. Queries are
+    embedded with that backbone (batched through its own scheduler) and its
+    top candidates are kept as-is when the ranking is clear-cut; otherwise
+    the caller re-ranks them with the primary encoder. Its ids are rows of
+    product_ids, so the cascade stays off unless the row fingerprint written
+    with the index still matches.
+    """
+
+    def __init__(self, index_path: str, device: str, product_ids: np.ndarray,
+                 margin: float = CASCADE_MARGIN, candidates: int = CASCADE_CANDIDATES):
+        self.margin = margin
+        self.candidates = candidates
+        self.device = device
+        self.available = False
+        self.model_name = None
+        self.index = None
+        self.index_file = None
+        self.file_size = 0
+        self.scheduler = None
+
+        entry = load_encoder_manifest(index_path).get("cascade")
+        if not entry:
+            return
+        index_file = os.path.join(index_path, entry["path"], "cosine_index.faiss")
+        if not os.path.exists(index_file):
+            logger.warning(f"Cascade encoder {entry['model']} listed but {index_file} is missing")
+            return
+        mismatch = row_fingerprint_mismatch(
+            os.path.join(index_path, entry["path"], CASCADE_FINGERPRINT_FILE), product_ids
+        )
+        if mismatch:
+            logger.warning(f"Ignoring cascade encoder {entry['model']} ({mismatch}); "
+                           f"re-run build_cascade_index.py")
+            return
+        try:
+            self.index = acquire_index(index_file)
+            self.index_file = index_file
+            self.file_size = os.path.getsize(index_file)
+            self.model_name = entry["model"]
+            self.model, self.preprocess = acquire_clip(self.model_name, device)
+            self.scheduler = PriorityScheduler(self.get_embeddings, name="cascade_encode")
+            self.available = True
+            logger.info(f"Cascade: {self.model_name} over {self.index.ntotal} products "
+                        f"(margin {self.margin}, {self.candidates} candidates)")
+        except Exception as e:
+            logger.error(f"Error loading cascade encoder: {e}")
+
+    def close(self):
+        """Release the shared cheap encoder and index"""
+        if self.index_file:
+            release_index(self.index_file)
+        if self.available:
+            release_clip(self.model_name, self.device)
+        self.available = False
+
+    def get_embeddings(self, images: List[Image.Image]) -> np.ndarray:
+        """Normalized cheap-encoder embeddings for a batch of PIL images, one row per image"""
+        image_input = torch.stack([
+            self.preprocess(image if image.mode == 'RGB' else image.convert('RGB')) for image in images
+        ]).to(self.device)
+        with torch.no_grad():
+            embeddings = self.model.encode_image(image_input).cpu().numpy().astype('float32')
+        faiss.normalize_L2(embeddings)
+        return embeddings
+
+    def search(self, query_embedding: np.ndarray,
+               mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(scores, rows) of the cheap encoder's candidates, best first"""
+        n_candidates = min(self.candidates, self.index.ntotal)
+        if mask is not None:
+            bitmap = np.packbits(mask, bitorder='little')
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bitmap)))
+            scores, rows = self.index.search(query_embedding, n_candidates, params=params)
+        else:
+            scores, rows = self.index.search(query_embedding, n_candidates)
+        valid = rows[0] >= 0
+        return scores[0][valid], rows[0][valid]
+
+    def is_ambiguous(self, scores: np.ndarray, top_k: int) -> bool:
+        """
+        Whether the cheap ranking is too close to call
+
+        Ambiguous when the best match barely beats the runner-up, or when the
+        last result kept barely beats the first one cut off.
+        """
+        if len(scores) < 2:
+            return False
+        gaps = [scores[0] - scores[1]]
+        if len(scores) > top_k:
+            gaps.append(scores[top_k - 1] - scores[top_k])
+        return bool(min(gaps) < self.margin)
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from fastapi import HTTPException
+
+from stage_metrics import stage_metrics
+
+logger = logging.getLogger(__name__)
+
+INDEX_MEMORY_BUDGET_BYTES = int(os.environ.get("STYLUMIA_INDEX_MEMORY_BUDGET_MB", 4096)) * 1024 * 1024
+
+
+class CategoryConfig:
+    """Where one category's index, id table, images and product metadata live"""
+
+    def __init__(self, name: str, index_path: str, images_dir: Optional[str] = None,
+                 metadata_csv: Optional[str] = None, thumbnails_dir: Optional[str] = None):
+        self.name = name
+        self.index_path = index_path
+        self.images_dir = images_dir
+        self.metadata_csv = metadata_csv
+        # scripts/build_thumbnails.py writes <images_dir>_thumbs by default
+        if thumbnails_dir is None and images_dir:
+            thumbnails_dir = os.path.normpath(images_dir) + "_thumbs"
+        self.thumbnails_dir = thumbnails_dir
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "index_path": self.index_path,
+            "images_dir": self.images_dir,
+            "metadata_csv": self.metadata_csv,
+            "thumbnails_dir": self.thumbnails_dir,
+        }
+
+
+def load_category_configs(path: str, defaults: Dict[str, Dict[str, str]]) -> Dict[str, CategoryConfig]:
+    """
+    Read a {category: {index_path, images_dir, metadata_csv, thumbnails_dir}} JSON file
+
+    Falls back to `defaults` when the file does not exist.
+    """
+    entries = defaults
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            entries = json.load(f)
+        logger.info(f"Loaded {len(entries)} categories from {path}")
+    return {name: CategoryConfig(name, **entry) for name, entry in entries.items()}
+
+
+class CategoryRegistry:
+    """
+    Per-category search services, loaded on first use
+
+    Loaded services are kept in LRU order and the least recently used ones are
+    evicted once their combined memory_bytes() exceeds the budget. Pinned
+    categories are never evicted. Async callers use get_async, which loads
+    on an executor thread so the event loop keeps serving.
+    """
+
+    def __init__(self, configs: Dict[str, CategoryConfig], loader: Callable[[CategoryConfig], Any],
+                 memory_budget_bytes: int = INDEX_MEMORY_BUDGET_BYTES):
+        self.configs = configs
+        self.loader = loader
+        self.memory_budget_bytes = memory_budget_bytes
+        self.pinned = set()
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {name: threading.Lock() for name in configs}
+        # In-flight executor loads by category, only touched from the event loop
+        self._loading: Dict[str, asyncio.Future] = {}
+
+    @property
+    def names(self) -> Iterable[str]:
+        return list(self.configs)
+
+    def add(self, name: str, service: Any, pinned: bool = False):
+        """Register an already loaded service"""
+        with self._lock:
+            self._loaded[name] = service
+            if pinned:
+                self.pinned.add(name)
+
+    def loaded(self, name: str) -> Optional[Any]:
+        """The service if it is already loaded (404 for unknown categories)"""
+        if name not in self.configs:
+            raise HTTPException(status_code=404, detail=f"Unknown category: {name}")
+        with self._lock:
+            if name in self._loaded:
+                self._loaded.move_to_end(name)
+                return self._loaded[name]
+        return None
+
+    async def get_async(self, name: str) -> Any:
+        """get() without blocking the event loop; concurrent callers share one load"""
+        service = self.loaded(name)
+        if service is not None:
+            return service
+        future = self._loading.get(name)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(None, self.get, name)
+            self._loading[name] = future
+            future.add_done_callback(lambda _: self._loading.pop(name, None))
+        # Shielded: one caller disconnecting must not cancel the load for the others
+        return await asyncio.shield(future)
+
+    def get(self, name: str) -> Any:
+        service = self.loaded(name)
+        if service is not None:
+            return service
+
+        # One loader per category; other categories keep serving meanwhile
+        with self._load_locks[name]:
+            with self._lock:
+                if name in self._loaded:
+                    self._loaded.move_to_end(name)
+                    return self._loaded[name]
+
+            logger.info(f"Loading category '{name}'")
+            service = self.loader(self.configs[name])
+            stage_metrics.increment("category_loads")
+
+            with self._lock:
+                self._loaded[name] = service
+                self._evict(keep=name)
+            return service
+
+    def _evict(self, keep: str):
+        while self._memory_bytes() > self.memory_budget_bytes:
+            victim = next((name for name in self._loaded if name != keep and name not in self.pinned), None)
+            if victim is None:
+                break
+            service = self._loaded.pop(victim)
+            if hasattr(service, "close"):
+                service.close()
+            stage_metrics.increment("category_evictions")
+            logger.info(f"Evicted category '{victim}' (memory budget {self.memory_budget_bytes} bytes)")
+
+    def _memory_bytes(self) -> int:
+        return sum(service.memory_bytes() for service in self._loaded.values())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            loaded = {name: service.memory_bytes() for name, service in self._loaded.items()}
+        return {
+            "categories": list(self.configs),
+            "loaded": loaded,
+            "pinned": sorted(self.pinned),
+            "memory_bytes": sum(loaded.values()),
+            "memory_budget_bytes": self.memory_budget_bytes,
+        }
@@ -0,0 +1,130 @@
+import logging
+import os
+import re
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+from fastapi import HTTPException
+
+from index_bundle import row_fingerprint_mismatch
+from lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Written by scripts/build_color_palettes.py, rows aligned with product_ids.npy
+COLOR_PALETTES_FILE = "color_palettes.npy"  # (n, k, 3) uint8, OpenCV 8-bit Lab
+COLOR_WEIGHTS_FILE = "color_weights.npy"    # (n, k) uint8, share of the product's pixels * 255
+COLOR_FINGERPRINT_FILE = "color_palettes.json"  # product_ids the rows were built for
+# A palette color matches within this CIE76 distance, if it covers at least this share of the product
+COLOR_MAX_DISTANCE = float(os.environ.get("STYLUMIA_COLOR_MAX_DISTANCE", 20.0))
+COLOR_MIN_SHARE = float(os.environ.get("STYLUMIA_COLOR_MIN_SHARE", 0.15))
+COLOR_MASK_CACHE_SIZE = 64
+
+COLOR_NAMES = {
+    "black": "#1a1a1a", "white": "#f5f5f5", "grey": "#808080", "gray": "#808080", "silver": "#c0c0c0",
+    "red": "#c62828", "maroon": "#6d1b1b", "burgundy": "#800020", "pink": "#f48fb1", "hot pink": "#e91e63",
+    "orange": "#ef6c00", "coral": "#ff7f50", "yellow": "#fdd835", "mustard": "#d4a017", "gold": "#c9a227",
+    "beige": "#d8c3a5", "cream": "#f3e5c0", "tan": "#c19a6b", "brown": "#6d4c41",
+    "green": "#2e7d32", "olive": "#6b6b23", "mint": "#98d7c2", "teal": "#00796b",
+    "blue": "#1e63c6", "navy": "#1b2a4a", "sky blue": "#87ceeb", "turquoise": "#30c5c0",
+    "purple": "#6a1b9a", "lavender": "#b39ddb", "lilac": "#c8a2c8",
+}
+HEX_COLOR = re.compile(r"^#?([0-9a-f]{6})$")
+
+
+def rgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """uint8 RGB (..., 3) -> float32 CIE Lab (L in 0-100)"""
+    pixels = np.ascontiguousarray(rgb, dtype='float32').reshape(-1, 1, 3) / 255.0
+    return cv2.cvtColor(pixels, cv2.COLOR_RGB2Lab).reshape(np.shape(rgb))
+
+
+def lab_from_uint8(lab: np.ndarray) -> np.ndarray:
+    """OpenCV 8-bit Lab (L * 255 / 100, a + 128, b + 128) -> float32 CIE Lab"""
+    lab = np.asarray(lab, dtype='float32')
+    return np.stack([lab[..., 0] * (100.0 / 255.0), lab[..., 1] - 128.0, lab[..., 2] - 128.0], axis=-1)
+
+
+def lab_to_uint8(lab: np.ndarray) -> np.ndarray:
+    encoded = np.stack([lab[..., 0] * (255.0 / 100.0), lab[..., 1] + 128.0, lab[..., 2] + 128.0], axis=-1)
+    return np.clip(np.rint(encoded), 0, 255).astype('uint8')
+
+
+def parse_color(color: str) -> Tuple[np.ndarray, str]:
+    """(CIE Lab, hex) for a color name ("navy") or hex code ("#1b2a4a")"""
+    text = " ".join(color.lower().split())
+    match = HEX_COLOR.match(COLOR_NAMES.get(text, text))
+    if match is None:
+        raise HTTPException(status_code=400, detail=f"Unknown color {color!r}: use a hex code like #1b2a4a "
+                                                    f"or one of {sorted(COLOR_NAMES)}")
+    rgb = np.array([int(match.group(1)[i:i + 2], 16) for i in (0, 2, 4)], dtype='uint8')
+    return rgb_to_lab(rgb), f"#{match.group(1)}"
+
+
+class ColorPalettes:
+    """
+    Per-product dominant colors for color= filtering (see scripts/build_color_palettes.py)
+
+    Palette entries covering at least COLOR_MIN_SHARE of a product are kept
+    as one flat (entries, 3) Lab array with precomputed squared norms, so a
+    color filter is one matrix-vector product (|c|^2 - 2 c.q <= r^2 - |q|^2);
+    recent masks are cached per color. Palettes are only used while their
+    row fingerprint matches product_ids.
+    """
+
+    def __init__(self, index_path: str, product_ids: np.ndarray, max_distance: float = COLOR_MAX_DISTANCE,
+                 min_share: float = COLOR_MIN_SHARE):
+        n = len(product_ids)
+        self.n = n
+        self.max_distance = max_distance
+        self.rows = None
+        self.colors = None
+        self.norms = None
+        self._masks = LRUCache(COLOR_MASK_CACHE_SIZE)
+        palettes_file = os.path.join(index_path, COLOR_PALETTES_FILE)
+        weights_file = os.path.join(index_path, COLOR_WEIGHTS_FILE)
+        if not os.path.exists(palettes_file) or not os.path.exists(weights_file):
+            return
+        try:
+            mismatch = row_fingerprint_mismatch(os.path.join(index_path, COLOR_FINGERPRINT_FILE), product_ids)
+            if mismatch:
+                logger.warning(f"Ignoring {palettes_file} ({mismatch}); re-run build_color_palettes.py")
+                return
+            palettes = np.load(palettes_file)
+            weights = np.load(weights_file)
+            if len(palettes) != n or weights.shape != palettes.shape[:2]:
+                logger.warning(f"Ignoring {palettes_file}: {len(palettes)} rows, index has {n}; "
+                               f"re-run build_color_palettes.py")
+                return
+            rows, slots = np.nonzero(weights >= min_share * 255.0)
+            self.rows = rows.astype('int64')
+            self.colors = lab_from_uint8(palettes[rows, slots])
+            self.norms = np.einsum('ij,ij->i', self.colors, self.colors)
+            logger.info(f"Loaded color palettes: {n} products, {len(self.rows)} dominant colors")
+        except Exception as e:
+            logger.error(f"Error loading color palettes: {e}")
+            self.rows = None
+
+    @property
+    def available(self) -> bool:
+        return self.rows is not None
+
+    def mask(self, lab: np.ndarray, key: Optional[str] = None) -> np.ndarray:
+        """Row mask of products with a dominant color within max_distance of lab"""
+        if key is not None:
+            cached = self._masks.get(key)
+            if cached is not None:
+                return cached.copy()
+        lab = np.asarray(lab, dtype='float32')
+        scores = self.colors @ lab
+        scores *= -2.0
+        scores += self.norms
+        mask = np.zeros(self.n, dtype=bool)
+        mask[self.rows[scores <= self.max_distance ** 2 - float(lab @ lab)]] = True
+        if key is not None:
+            self._masks.put(key, mask.copy())
+        return mask
+
+    def stats(self) -> Dict[str, object]:
+        return {"available": self.available, "colors": len(self.rows) if self.available else 0,
+                "max_distance": self.max_distance, "mask_cache": self._masks.stats()}
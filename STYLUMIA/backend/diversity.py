@@ -0,0 +1,52 @@
+import os
+from typing import Sequence, Tuple
+
+import numpy as np
+
+# Candidates over-fetched from the index before diversifying
+MMR_CANDIDATES = int(os.environ.get("STYLUMIA_MMR_CANDIDATES", 200))
+
+
+def mmr_select(vectors: np.ndarray, relevance: np.ndarray, top_k: int, diversity: float,
+               group_caps: Sequence[Tuple[np.ndarray, int]] = ()) -> np.ndarray:
+    """
+    Maximal marginal relevance over a candidate set, with per-group caps
+
+    Each pick maximizes (1 - diversity) * relevance - diversity * (max
+    similarity to anything already picked). Pairwise similarities come from
+    one candidate x candidate Gram matrix; each pick then costs a few vector
+    ops over the candidates. group_caps holds (group code per candidate,
+    cap) pairs, e.g. brands; negative codes are never capped.
+
+    Returns:
+        Positions into the candidate arrays, in pick order
+    """
+    n = len(relevance)
+    penalties = diversity * (vectors @ vectors.T)
+    base = (1.0 - diversity) * relevance
+    # Already picked or capped-out candidates carry an infinite penalty
+    penalty = np.zeros(n, dtype=penalties.dtype)
+    scores = np.empty(n, dtype=penalties.dtype)
+    counts = [np.zeros(int(groups.max()) + 1 if len(groups) else 0, dtype='int32') for groups, _ in group_caps]
+
+    selected = []
+    for _ in range(min(top_k, n)):
+        np.subtract(base, penalty, out=scores)
+        best = int(np.argmax(scores))
+        if scores[best] == -np.inf:
+            break
+        if selected:
+            np.maximum(penalty, penalties[best], out=penalty)
+        else:
+            penalty[:] = penalties[best]
+        selected.append(best)
+        penalty[best] = np.inf
+
+        for (groups, cap), group_counts in zip(group_caps, counts):
+            group = groups[best]
+            if group < 0:
+                continue
+            group_counts[group] += 1
+            if group_counts[group] >= cap:
+                penalty[groups == group] = np.inf
+    return np.array(selected, dtype='int64')
@@ -0,0 +1,117 @@
+import io
+import os
+from typing import Any, Dict, Tuple, Union
+
+from fastapi import HTTPException, UploadFile
+from PIL import Image, UnidentifiedImageError
+
+# Upload / decode limits (override via environment)
+MAX_UPLOAD_BYTES = int(os.environ.get("STYLUMIA_MAX_UPLOAD_BYTES", 15 * 1024 * 1024))
+MAX_IMAGE_PIXELS = int(os.environ.get("STYLUMIA_MAX_IMAGE_PIXELS", 50_000_000))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# CLIP ViT-B/32 input resolution; decoding much beyond this is wasted work
+CLIP_INPUT_SIZE = 224
+
+EXIF_ORIENTATION_TAG = 0x0112
+EXIF_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+async def read_upload_bounded(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> bytes:
+    """Read an upload in chunks, rejecting it as soon as it exceeds max_bytes"""
+    size = getattr(file, "size", None)
+    if size is not None and size > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+
+    buffer = bytearray()
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        buffer.extend(chunk)
+        if len(buffer) > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+
+    if not buffer:
+        raise HTTPException(status_code=400, detail="Empty upload")
+    return bytes(buffer)
+
+
+def decode_image(source: Union[bytes, str],
+                 target_size: int = CLIP_INPUT_SIZE,
+                 max_pixels: int = MAX_IMAGE_PIXELS) -> Tuple[Image.Image, Dict[str, Any]]:
+    """
+    Decode an image directly near target_size instead of at full resolution
+
+    JPEGs use DCT scaling via draft() (1/2, 1/4, 1/8); anything still at least
+    twice the target (other formats, or JPEGs beyond 1/8) gets an integer
+    reduce(). The shorter side is never reduced below target_size, so CLIP
+    preprocess output is unchanged in practice.
+    EXIF orientation is applied after decoding.
+
+    Args:
+        source: Encoded image bytes or a file path
+        target_size: Minimum size of the shorter side after decoding
+        max_pixels: Reject images whose header declares more pixels than this
+
+    Returns:
+        (RGB PIL image, decode info dict)
+    """
+    try:
+        image = Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+    except UnidentifiedImageError:
+        raise HTTPException(status_code=400, detail="Unsupported or corrupt image")
+    except Image.DecompressionBombError as e:
+        # Pillow's own limit (about 179MP) fires at open, before the max_pixels check below
+        raise HTTPException(status_code=413, detail=str(e))
+
+    source_format = image.format
+    original_size = image.size
+    if original_size[0] * original_size[1] > max_pixels:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Image has {original_size[0]}x{original_size[1]} pixels, limit is {max_pixels}"
+        )
+
+    # Read orientation up front: reduce() returns a new image without EXIF
+    orientation = image.getexif().get(EXIF_ORIENTATION_TAG, 1)
+
+    steps = []
+    try:
+        if source_format == "JPEG":
+            image.draft("RGB", (target_size, target_size))
+        image.load()
+    except Image.DecompressionBombError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except OSError as e:
+        raise HTTPException(status_code=400, detail=f"Failed to decode image: {str(e)}")
+    if image.size != original_size:
+        steps.append("draft")
+
+    # DCT scaling stops at 1/8; finish very large images with a cheap box reduce
+    factor = min(image.size) // target_size
+    if factor >= 2:
+        image = image.reduce(factor)
+        steps.append("reduce")
+
+    if orientation in EXIF_TRANSPOSE:
+        image = image.transpose(EXIF_TRANSPOSE[orientation])
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+
+    info = {
+        "format": source_format,
+        "original_size": original_size,
+        "decoded_size": image.size,
+        "method": "+".join(steps) or "full",
+        "pixels_saved": original_size[0] * original_size[1] - image.size[0] * image.size[1],
+    }
+    return image, info
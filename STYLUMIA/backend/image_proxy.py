@@ -0,0 +1,233 @@
+import asyncio
+import hashlib
+import logging
+import mimetypes
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from fastapi import HTTPException
+
+from product_metadata import read_product_csv
+from stage_metrics import stage_metrics
+
+logger = logging.getLogger(__name__)
+
+IMAGE_CACHE_DIR = os.environ.get("STYLUMIA_IMAGE_CACHE_DIR", "image_cache")
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get("STYLUMIA_IMAGE_CACHE_MB", 2048)) * 1024 * 1024
+IMAGE_FETCH_TIMEOUT_S = float(os.environ.get("STYLUMIA_IMAGE_FETCH_TIMEOUT_S", 10))
+MAX_FETCH_BYTES = 20 * 1024 * 1024
+SOURCE_URL_COLUMN = "feature_image_s3"
+
+
+class ImageSources:
+    """product_id -> source image URL from a category's metadata CSV, loaded on first use"""
+
+    def __init__(self, metadata_csv: Optional[str], url_column: str = SOURCE_URL_COLUMN):
+        self.metadata_csv = metadata_csv
+        self.url_column = url_column
+        self._urls = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, str]:
+        df = read_product_csv(self.metadata_csv, ["product_id", self.url_column])
+        if df is None:
+            return {}
+        df = df.dropna()
+        logger.info(f"Loaded {len(df)} image source URLs from {self.metadata_csv}")
+        return dict(zip(df["product_id"].astype(str), df[self.url_column].astype(str)))
+
+    def get(self, product_id: str) -> Optional[str]:
+        if self._urls is None:
+            with self._lock:
+                if self._urls is None:
+                    self._urls = self._load()
+        return self._urls.get(product_id)
+
+
+class DiskLRUCache:
+    """
+    Size-bounded directory of cached files, evicted least recently used first
+
+    Files are named <key>.<ext>; recency survives restarts through file mtimes,
+    which are bumped on every hit.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_bytes = 0
+        self._entries = OrderedDict()  # key -> (filename, size)
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        files = []
+        for filename in os.listdir(directory):
+            path = os.path.join(directory, filename)
+            if filename.endswith(".tmp"):
+                os.remove(path)
+                continue
+            stat = os.stat(path)
+            files.append((stat.st_mtime, filename, stat.st_size))
+        for _, filename, size in sorted(files):
+            self._entries[os.path.splitext(filename)[0]] = (filename, size)
+            self.total_bytes += size
+
+    def get(self, key: str) -> Optional[str]:
+        """Path of a cached file (marking it recently used), or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        path = os.path.join(self.directory, entry[0])
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._drop(key)
+            return None
+        return path
+
+    def put(self, key: str, data: bytes, ext: str) -> str:
+        """Store data atomically and evict down to the size budget"""
+        filename = f"{key}{ext}"
+        path = os.path.join(self.directory, filename)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (filename, len(data))
+            self.total_bytes += len(data)
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                old_key = next(iter(self._entries))
+                old_filename, _ = self._entries[old_key]
+                self._drop(old_key)
+                self.evictions += 1
+                try:
+                    os.remove(os.path.join(self.directory, old_filename))
+                except FileNotFoundError:
+                    pass
+        return path
+
+    def entries(self) -> List[Tuple[str, str, int]]:
+        """(key, filename, size) of every cached file, least recently used first"""
+        with self._lock:
+            return [(key, filename, size) for key, (filename, size) in self._entries.items()]
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry[1]
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class ImageProxy:
+    """
+    Read-through proxy for remote catalog images
+
+    Misses are fetched with a pooled async client; concurrent requests for
+    the same URL share one in-flight fetch. Pass an httpx transport (e.g.
+    httpx.MockTransport) to run against a stand-in instead of the network.
+    """
+
+    def __init__(self, cache: DiskLRUCache, timeout_s: float = IMAGE_FETCH_TIMEOUT_S,
+                 max_bytes: int = MAX_FETCH_BYTES, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.cache = cache
+        self.timeout = timeout_s
+        self.max_bytes = max_bytes
+        self.transport = transport
+        self._client = None
+        self._loop = None
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Pooled keep-alive connections, bound to the running loop
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._loop = loop
+            self._inflight = {}
+            self._client = httpx.AsyncClient(timeout=self.timeout, follow_redirects=True,
+                                             transport=self.transport)
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @staticmethod
+    def cache_key(url: str) -> str:
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    async def fetch(self, url: str) -> Tuple[str, str, str]:
+        """(local path, media type, "hit" | "miss" | "coalesced") for a source URL"""
+        key = self.cache_key(url)
+        path = self.cache.get(key)
+        if path is not None:
+            stage_metrics.increment("image_proxy_hit")
+            return path, mimetypes.guess_type(path)[0] or "application/octet-stream", "hit"
+
+        client = self.client
+        task = self._inflight.get(key)
+        if task is None:
+            source = "miss"
+            task = asyncio.get_running_loop().create_task(self._fetch_and_store(client, url, key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            source = "coalesced"
+        stage_metrics.increment(f"image_proxy_{source}")
+
+        # Shielded: one client disconnecting must not cancel a fetch others wait on
+        path, media_type = await asyncio.shield(task)
+        return path, media_type, source
+
+    async def _fetch_and_store(self, client: httpx.AsyncClient, url: str, key: str) -> Tuple[str, str]:
+        start = time.perf_counter()
+        try:
+            async with client.stream("GET", url) as response:
+                if response.status_code == 404:
+                    raise HTTPException(status_code=404, detail="Source image not found")
+                if response.status_code != 200:
+                    raise HTTPException(status_code=502, detail=f"Source image returned {response.status_code}")
+                media_type = response.headers.get("content-type", "").split(";")[0].strip()
+                if not media_type.startswith("image/"):
+                    raise HTTPException(status_code=502, detail=f"Source returned {media_type or 'no content type'}")
+
+                data = bytearray()
+                async for chunk in response.aiter_bytes():
+                    data.extend(chunk)
+                    if len(data) > self.max_bytes:
+                        raise HTTPException(status_code=502, detail=f"Source image exceeds {self.max_bytes} bytes")
+        except httpx.TimeoutException:
+            raise HTTPException(status_code=504, detail="Timed out fetching source image")
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=502, detail=f"Error fetching source image: {e}")
+        finally:
+            stage_metrics.record("image_proxy_fetch", time.perf_counter() - start)
+
+        ext = mimetypes.guess_extension(media_type) or ""
+        path = await asyncio.get_running_loop().run_in_executor(None, self.cache.put, key, bytes(data), ext)
+        return path, media_type
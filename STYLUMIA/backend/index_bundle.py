@@ -0,0 +1,194 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_MANIFEST = "manifest.json"
+BUNDLE_FORMAT = "stylumia-index-bundle"
+BUNDLE_VERSION = 1
+INDEX_FILE = "cosine_index.faiss"
+IDS_FILE = "product_ids.npy"
+BUNDLE_FILES = (INDEX_FILE, IDS_FILE)
+# "changed": checksum files whose mtime differs from the manifest; "always"; "never"
+BUNDLE_VERIFY = os.environ.get("STYLUMIA_BUNDLE_VERIFY", "changed")
+CHECKSUM_CHUNK_BYTES = 4 * 1024 * 1024
+FINGERPRINT_CHUNK_ROWS = 65536
+
+# Background checksum state per bundle directory, shared by every loader in the process
+_verifications: Dict[str, Dict[str, Any]] = {}
+_verifications_lock = threading.Lock()
+
+
+class BundleMismatchError(ValueError):
+    """An index directory does not match its manifest (or the caller's model)"""
+
+
+def file_checksum(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHECKSUM_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def ids_fingerprint(product_ids) -> str:
+    """sha256 of product ids in row order (the same for a prefix whichever way it is chunked)"""
+    digest = hashlib.sha256()
+    for start in range(0, len(product_ids), FINGERPRINT_CHUNK_ROWS):
+        chunk = product_ids[start:start + FINGERPRINT_CHUNK_ROWS]
+        digest.update(("\n".join(str(product_id) for product_id in chunk) + "\n").encode("utf-8"))
+    return digest.hexdigest()
+
+
+def write_row_fingerprint(path: str, product_ids, **extra):
+    """
+    Record which product_ids.npy rows a row-aligned derived file was built for
+
+    build_faiss.py assigns rows in directory listing order, so a rebuild can
+    move every product; readers compare the fingerprint before trusting rows.
+    """
+    info = {"rows": len(product_ids), "ids_sha256": ids_fingerprint(product_ids), **extra}
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(info, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def row_fingerprint_mismatch(path: str, product_ids) -> Optional[str]:
+    """
+    Why rows recorded by write_row_fingerprint no longer line up with
+    product_ids, or None when they do (product_ids may have grown past them)
+    """
+    if not os.path.exists(path):
+        return f"no {os.path.basename(path)} row fingerprint"
+    with open(path) as f:
+        info = json.load(f)
+    rows = info["rows"]
+    if rows > len(product_ids):
+        return f"built for {rows} rows, index has {len(product_ids)}"
+    if ids_fingerprint(product_ids[:rows]) != info["ids_sha256"]:
+        return "product_ids.npy was rebuilt or reordered since"
+    return None
+
+
+def describe_index(index) -> str:
+    """e.g. IndexIDMap2(IndexFlatIP)"""
+    import faiss
+    name = type(index).__name__
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        name = f"{name}({type(faiss.downcast_index(index.index)).__name__})"
+    return name
+
+
+def write_manifest(index_dir: str, model: str, dim: int, count: int, index_type: str,
+                   build_params: Optional[Dict[str, Any]] = None, normalization: str = "l2") -> Dict[str, Any]:
+    """Record model, shape, build parameters and per-file sha256 / size / mtime for an index dir"""
+    files = {}
+    for name in BUNDLE_FILES:
+        path = os.path.join(index_dir, name)
+        stat = os.stat(path)
+        files[name] = {"sha256": file_checksum(path), "bytes": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "version": BUNDLE_VERSION,
+        "model": model,
+        "dim": int(dim),
+        "count": int(count),
+        "index_type": index_type,
+        "metric": "inner_product",
+        "normalization": normalization,
+        "build_params": build_params or {},
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "files": files
+    }
+    manifest_file = os.path.join(index_dir, BUNDLE_MANIFEST)
+    tmp_file = manifest_file + ".tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_file, manifest_file)
+    return manifest
+
+
+def load_manifest(index_dir: str) -> Optional[Dict[str, Any]]:
+    manifest_file = os.path.join(index_dir, BUNDLE_MANIFEST)
+    if not os.path.exists(manifest_file):
+        return None
+    with open(manifest_file) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != BUNDLE_FORMAT or manifest.get("version", 0) > BUNDLE_VERSION:
+        raise BundleMismatchError(f"{manifest_file}: unsupported bundle format "
+                                  f"{manifest.get('format')} v{manifest.get('version')}")
+    return manifest
+
+
+def _verify_checksums(key: str, index_dir: str, names, manifest: Dict[str, Any]):
+    start = time.time()
+    bad = [name for name in names
+           if file_checksum(os.path.join(index_dir, name)) != manifest["files"][name]["sha256"]]
+    with _verifications_lock:
+        _verifications[key].update(state="corrupt" if bad else "ok", mismatched=bad,
+                                   seconds=round(time.time() - start, 3))
+    if bad:
+        logger.error(f"Index bundle {index_dir}: checksum mismatch in {bad}; rebuild or re-copy the bundle")
+    else:
+        logger.info(f"Index bundle {index_dir}: checksums verified in {time.time() - start:.2f}s")
+
+
+def validate_bundle(index_dir: str, model: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Check an index dir against its manifest before loading it
+
+    Only stats files: a wrong model or size raises BundleMismatchError.
+    Files whose mtime differs from the manifest (copied bundles, or every
+    file with STYLUMIA_BUNDLE_VERIFY=always) are checksummed on a background
+    thread. Returns the manifest, or None for legacy dirs without one.
+    """
+    manifest = load_manifest(index_dir)
+    if manifest is None:
+        logger.warning(f"No {BUNDLE_MANIFEST} in {index_dir}; model and dimension are unchecked "
+                       f"(run scripts/build_manifest.py)")
+        return None
+    if model is not None and manifest["model"] != model:
+        raise BundleMismatchError(f"Index in {index_dir} was built with {manifest['model']}, serving {model}")
+
+    changed = []
+    for name, entry in manifest["files"].items():
+        stat = os.stat(os.path.join(index_dir, name))
+        if stat.st_size != entry["bytes"]:
+            raise BundleMismatchError(f"{name} in {index_dir} is {stat.st_size} bytes, "
+                                      f"manifest says {entry['bytes']}")
+        if BUNDLE_VERIFY == "always" or (BUNDLE_VERIFY == "changed" and stat.st_mtime_ns != entry["mtime_ns"]):
+            changed.append(name)
+
+    key = os.path.realpath(index_dir)
+    with _verifications_lock:
+        previous = _verifications.get(key)
+        if previous is not None and previous["created_at"] == manifest["created_at"]:
+            return manifest
+        _verifications[key] = {"created_at": manifest["created_at"], "state": "pending" if changed else "unchanged",
+                               "files": changed}
+    if changed:
+        threading.Thread(target=_verify_checksums, args=(key, index_dir, changed, manifest),
+                         name="bundle-verify", daemon=True).start()
+    return manifest
+
+
+def check_loaded(manifest: Optional[Dict[str, Any]], dim: int, count: int, index_dir: str):
+    """Compare a loaded index's dimension and row count with its manifest"""
+    if manifest is None:
+        return
+    if dim != manifest["dim"] or count != manifest["count"]:
+        raise BundleMismatchError(f"Index in {index_dir} has {count} x {dim} vectors, "
+                                  f"manifest says {manifest['count']} x {manifest['dim']}")
+
+
+def bundle_status(index_dir: str) -> Optional[Dict[str, Any]]:
+    """Background checksum state for a validated bundle ("pending", "ok", "corrupt" or "unchanged")"""
+    with _verifications_lock:
+        status = _verifications.get(os.path.realpath(index_dir))
+        return dict(status) if status is not None else None
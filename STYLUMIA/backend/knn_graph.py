@@ -0,0 +1,73 @@
+import logging
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+
+from index_bundle import row_fingerprint_mismatch
+
+logger = logging.getLogger(__name__)
+
+KNN_IDS_FILE = "knn_ids.npy"
+KNN_SCORES_FILE = "knn_scores.npy"
+KNN_FINGERPRINT_FILE = "knn_graph.json"
+
+
+class KnnGraph:
+    """
+    Memory-mapped precomputed neighbor table (see scripts/build_knn_graph.py)
+
+    The table is only used while its row fingerprint matches product_ids;
+    otherwise callers fall back to a live index search.
+    """
+
+    def __init__(self, index_path: str, product_ids: np.ndarray):
+        self.ids_file = os.path.join(index_path, KNN_IDS_FILE)
+        self.scores_file = os.path.join(index_path, KNN_SCORES_FILE)
+        self.fingerprint_file = os.path.join(index_path, KNN_FINGERPRINT_FILE)
+        self.product_ids = product_ids
+        self.ids = None
+        self.scores = None
+        self._mtime = None
+        self.refresh()
+
+    @property
+    def available(self) -> bool:
+        return self.ids is not None
+
+    @property
+    def k(self) -> int:
+        return self.ids.shape[1] if self.available else 0
+
+    def __len__(self):
+        return self.ids.shape[0] if self.available else 0
+
+    def refresh(self):
+        """(Re)map the table if the files were (re)written since the last load"""
+        paths = [self.ids_file, self.scores_file, self.fingerprint_file]
+        if not os.path.exists(self.ids_file) or not os.path.exists(self.scores_file):
+            return
+        mtime = max(os.path.getmtime(path) for path in paths if os.path.exists(path))
+        if mtime == self._mtime:
+            return
+        try:
+            mismatch = row_fingerprint_mismatch(self.fingerprint_file, self.product_ids)
+            if mismatch:
+                # Remember the mtime so a stale graph is not re-checked on every request
+                self.ids, self.scores, self._mtime = None, None, mtime
+                logger.warning(f"Ignoring kNN graph ({mismatch}); re-run build_knn_graph.py")
+                return
+            ids = np.load(self.ids_file, mmap_mode="r")
+            scores = np.load(self.scores_file, mmap_mode="r")
+            if ids.shape != scores.shape:
+                raise ValueError(f"Shape mismatch: {ids.shape} vs {scores.shape}")
+            self.ids, self.scores, self._mtime = ids, scores, mtime
+            logger.info(f"Mapped kNN graph: {ids.shape[0]} products x {ids.shape[1]} neighbors")
+        except Exception as e:
+            logger.error(f"Error loading kNN graph: {e}")
+
+    def neighbors(self, row: int, top_k: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Neighbor rows and scores for an index row, or None if not covered"""
+        if not self.available or row >= len(self) or top_k > self.k:
+            return None
+        return np.asarray(self.ids[row, :top_k]), np.asarray(self.scores[row, :top_k], dtype='float32')
@@ -0,0 +1,136 @@
+import logging
+import re
+from collections import Counter
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from product_metadata import read_product_csv
+
+logger = logging.getLogger(__name__)
+
+TEXT_COLUMNS = ["product_name", "brand"]
+BM25_K1 = 1.2
+BM25_B = 0.75
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over product_name and brand, aligned with index rows
+
+    Postings are stored CSR-style: the rows and precomputed BM25 weights of
+    term t are rows[offsets[t]:offsets[t + 1]] and weights[...], so a query
+    is one scatter-add per term into a dense score array.
+    """
+
+    def __init__(self, metadata_csv: Optional[str], product_ids: np.ndarray):
+        self.n = len(product_ids)
+        self.vocabulary = {}
+        self.offsets = None
+        self.rows = None
+        self.weights = None
+        df = read_product_csv(metadata_csv, ["product_id"] + TEXT_COLUMNS)
+        if df is not None:
+            self._build(df, product_ids)
+
+    @property
+    def available(self) -> bool:
+        return self.offsets is not None
+
+    @property
+    def nbytes(self) -> int:
+        if not self.available:
+            return 0
+        return self.offsets.nbytes + self.rows.nbytes + self.weights.nbytes
+
+    def _build(self, df, product_ids: np.ndarray):
+        row_of = {str(product_id): row for row, product_id in enumerate(product_ids)}
+        df = df.drop_duplicates("product_id")
+        text = df[TEXT_COLUMNS[0]].fillna("").astype(str)
+        for column in TEXT_COLUMNS[1:]:
+            text = text + " " + df[column].fillna("").astype(str)
+
+        term_ids, rows, term_freqs = [], [], []
+        lengths = np.zeros(len(product_ids), dtype='float32')
+        for product_id, doc in zip(df["product_id"].astype(str), text):
+            row = row_of.get(product_id)
+            if row is None:
+                continue
+            tokens = tokenize(doc)
+            lengths[row] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                term_ids.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                rows.append(row)
+                term_freqs.append(tf)
+
+        if not term_ids:
+            logger.warning("No product text to index for keyword search")
+            return
+        term_ids = np.array(term_ids, dtype='int32')
+        rows = np.array(rows, dtype='int32')
+        term_freqs = np.array(term_freqs, dtype='float32')
+        n_docs = int((lengths > 0).sum())
+        avg_length = float(lengths[lengths > 0].mean())
+
+        order = np.argsort(term_ids, kind='stable')
+        term_ids, rows, term_freqs = term_ids[order], rows[order], term_freqs[order]
+        doc_freqs = np.bincount(term_ids, minlength=len(self.vocabulary))
+        self.offsets = np.concatenate([[0], np.cumsum(doc_freqs)]).astype('int64')
+
+        idf = np.log(1.0 + (n_docs - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype('float32')
+        norm = BM25_K1 * (1.0 - BM25_B + BM25_B * lengths[rows] / avg_length)
+        self.weights = (idf[term_ids] * term_freqs * (BM25_K1 + 1.0) / (term_freqs + norm)).astype('float32')
+        self.rows = rows
+        logger.info(f"Built keyword index: {n_docs} products, {len(self.vocabulary)} terms, "
+                    f"{len(rows)} postings ({self.nbytes / 1024:.0f} KiB)")
+
+    def _postings(self, query: str) -> Tuple[List[np.ndarray], List[np.ndarray], int]:
+        terms = set(tokenize(query))
+        row_lists, weight_lists = [], []
+        for term in terms:
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            row_lists.append(self.rows[start:end])
+            weight_lists.append(self.weights[start:end])
+        return row_lists, weight_lists, len(terms)
+
+    def search(self, query: str, mask: Optional[np.ndarray] = None,
+               limit: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, BM25 scores) matching any query term, best first, optionally within a row mask"""
+        row_lists, weight_lists, _ = self._postings(query)
+        if not row_lists:
+            return np.empty(0, dtype='int64'), np.empty(0, dtype='float32')
+        if len(row_lists) == 1:
+            rows, scores = row_lists[0], weight_lists[0]
+        else:
+            # Rows are unique within a posting list, so fancy-index += is exact
+            dense = np.zeros(self.n, dtype='float32')
+            for term_rows, term_weights in zip(row_lists, weight_lists):
+                dense[term_rows] += term_weights
+            rows = np.flatnonzero(dense > 0)
+            scores = dense[rows]
+        if mask is not None:
+            keep = mask[rows]
+            rows, scores = rows[keep], scores[keep]
+        if limit is not None and len(scores) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            rows, scores = rows[top], scores[top]
+        order = np.argsort(-scores, kind='stable')
+        return rows[order].astype('int64'), scores[order]
+
+    def match_mask(self, query: str, n: int) -> np.ndarray:
+        """Row mask of products containing every query term"""
+        row_lists, _, n_terms = self._postings(query)
+        if not row_lists or len(row_lists) < n_terms:
+            return np.zeros(n, dtype=bool)
+        counts = np.zeros(n, dtype='int32')
+        for term_rows in row_lists:
+            counts[term_rows] += 1
+        return counts == n_terms
@@ -1,25 +1,66 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, RedirectResponse, Response
 import numpy as np
-import cv2
 from PIL import Image
-import io
 import os
 import json
-from typing import List, Dict, Any, Optional
+from typing import Callable, List, Dict, Any, Optional, Tuple
 import uvicorn
 import faiss
 import clip
 import torch
 import time
+import heapq
 import logging
+import asyncio
+
+from attribute_facets import AttributeFacets, parse_attribute_filter
+from browse_clusters import BrowseClusters
+from color_palette import ColorPalettes, parse_color
+from batching import INTERACTIVE, PriorityScheduler, batch_client, default_lanes, run_calls
+from cascade import ModelCascade, load_encoder_manifest
+from category_registry import CategoryRegistry, load_category_configs
+from diversity import MMR_CANDIDATES, mmr_select
+from knn_graph import KnnGraph
+from lexical_index import LexicalIndex
+from lru_cache import LRUCache
+from resource_registry import acquire_clip, acquire_index, registry, release_clip, release_index
+from shard_coordinator import ShardCoordinator, launch_local_shards, wait_for_shards
+from two_stage import TwoStageIndex
+from thumbnails import IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, ThumbnailStore, etag_matches
+from text_embeddings import TextEmbeddingCache, normalize_query
+from image_proxy import IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES, DiskLRUCache, ImageProxy, ImageSources
+from product_metadata import BrandCodes
+from profiling import RequestProfiler
+from query_composition import (MAX_COMPOSE_IMAGES, MAX_COMPOSE_ITEMS, NEGATIVE_WEIGHT, compose_query,
+                               parse_weighted_ids, parse_weights)
+from index_bundle import bundle_status, check_loaded, row_fingerprint_mismatch, validate_bundle
+from image_decode import MAX_IMAGE_PIXELS, MAX_UPLOAD_BYTES, decode_image, read_upload_bounded
+from search_cursors import CURSOR_CANDIDATES, CandidateList, CursorStore, next_cursor, parse_cursor
+from serialization import parse_fields, render
+from session_taste import DEFAULT_TASTE_WEIGHT, EVENT_WEIGHTS, TASTE_CANDIDATES, SessionStore
+from style_tables import StyleClusters, StyleTable
+from stage_metrics import StageTimer, stage_metrics
+from vector_codec import (IMAGE_EMBEDDING_CACHE_SIZE, MAX_EMBED_BATCH, OCTET_STREAM, check_dtype, content_key,
+                          encode_base64, encode_vectors, parse_vector)
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+CLIP_MODEL = "ViT-B/32"
+# "exact" (flat index) or "two_stage" (compressed candidates + exact re-rank)
+SEARCH_MODE = os.environ.get("STYLUMIA_SEARCH_MODE", "exact")
+# Keyword + vector search: candidates per side, fusion methods and weighted-fusion keyword weight
+HYBRID_CANDIDATES = int(os.environ.get("STYLUMIA_HYBRID_CANDIDATES", 200))
+HYBRID_FUSIONS = ("rrf", "weighted", "intersect")
+HYBRID_KEYWORD_WEIGHT = float(os.environ.get("STYLUMIA_HYBRID_KEYWORD_WEIGHT", 0.3))
+RRF_K = 60
+# Compatible clusters drawn from per target category for "complete the look"
+STYLE_CLUSTERS_PER_TARGET = 3
+
 app = FastAPI(title="Stylumia Image Search API", version="1.0.0")
 
 # Configure CORS for React frontend
@@ -31,31 +72,120 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Serve static images
+# Reject oversized request bodies before multipart parsing spools them; routes
+# taking several uploads get one upload's allowance per file they accept
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+UPLOADS_PER_ROUTE = {"/embed": MAX_EMBED_BATCH, "/search/compose": MAX_COMPOSE_IMAGES}
+
+@app.middleware("http")
+async def limit_upload_size(request, call_next):
+    content_length = request.headers.get("content-length")
+    max_bytes = UPLOADS_PER_ROUTE.get(request.url.path, 1) * MAX_UPLOAD_BYTES
+    if content_length and content_length.isdigit() and \
+            int(content_length) > max_bytes + MULTIPART_OVERHEAD_BYTES:
+        return JSONResponse(status_code=413, content={"detail": f"Upload exceeds {max_bytes} bytes"})
+    return await call_next(request)
+
+# On-demand profiling (admin X-Profile header or sampling); not installed at all when disabled
+profiler = RequestProfiler()
+
+async def profile_requests(request, call_next):
+    reason = profiler.reason(request.url.path, request.headers)
+    session = profiler.start(reason, request.url.path, request.method) if reason else None
+    if session is None:
+        return await call_next(request)
+    loop = asyncio.get_running_loop()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        profile_id = await loop.run_in_executor(None, profiler.finish, session, status_code)
+    response.headers["X-Profile-Id"] = profile_id
+    return response
+
+if profiler.enabled:
+    app.middleware("http")(profile_requests)
+
+# Category registry: category -> index dir, images dir and product metadata
+CATEGORY_DEFAULTS = {
+    "dresses": {
+        "index_path": r"C:\Users\ANAND\Downloads\STYLUMIA\STYLUMIA\faiss_index",
+        "images_dir": r"C:\Users\ANAND\Downloads\STYLUMIA\images_dressees",
+        "metadata_csv": r"C:\Users\ANAND\Downloads\STYLUMIA\STYLUMIA\data\dresses_bd_processed_data.csv"
+    }
+}
+category_configs = load_category_configs(os.environ.get("STYLUMIA_CATEGORIES", "categories.json"), CATEGORY_DEFAULTS)
+DEFAULT_CATEGORY = os.environ.get("STYLUMIA_DEFAULT_CATEGORY", next(iter(category_configs)))
+# category=all searches every category and merges the top_k by score
+FANOUT_CATEGORY = "all"
+
+# Serve static images (category mounts first so "/images" doesn't shadow them)
+for name, config in category_configs.items():
+    if name != DEFAULT_CATEGORY and config.images_dir and os.path.exists(config.images_dir):
+        app.mount(f"/images/{name}", StaticFiles(directory=config.images_dir), name=f"images_{name}")
 if os.path.exists("images_dressees"):
     app.mount("/images", StaticFiles(directory="images_dressees"), name="images")
 
 class StylumiaImageSearch:
     def __init__(self, 
                  index_path=r"C:\Users\ANAND\Downloads\STYLUMIA\STYLUMIA\faiss_index",
-                 images_dir=r"C:\Users\ANAND\Downloads\STYLUMIA\images_dressees"):
+                 images_dir=r"C:\Users\ANAND\Downloads\STYLUMIA\images_dressees",
+                 category="dresses",
+                 image_url_prefix="/images",
+                 search_mode=SEARCH_MODE,
+                 thumbnails_dir=None,
+                 metadata_csv=None):
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         self.images_dir = images_dir
+        self.index_path = index_path
+        self.category = category
+        self.image_url_prefix = image_url_prefix
+        self.search_mode = search_mode
         self.model = None
         self.preprocess = None
         self.index = None
+        self.index_file = None
+        self.index_file_size = 0
         self.product_ids = []
+        self.id_to_row = {}
+        self.duplicate_clusters = None
+        self.duplicate_counts = None
+        self.representatives = None
+        self.representative_selector = None
         
-        # Initialize CLIP model
+        # Initialize CLIP model (one shared copy per process, see resource_registry)
         self._load_clip_model()
         # Load FAISS index
         self._load_index(index_path)
+        # Cheap first-pass encoder over a row-aligned second index (optional)
+        self.cascade = ModelCascade(index_path, self.device, self.product_ids)
+        # Precomputed "similar items" table (optional)
+        self.knn_graph = KnnGraph(index_path, self.product_ids)
+        # Near-duplicate clusters (optional)
+        self._load_duplicate_clusters(index_path)
+        # Style k-means for cross-category "complete the look" (optional)
+        self.style_clusters = StyleClusters(index_path, self.product_ids)
+        # Memory-mapped "browse by look" clusters (optional)
+        self.browse_clusters = BrowseClusters(index_path, self.product_ids)
+        # Dominant-color palettes for color= filtering (optional)
+        self.color_palettes = ColorPalettes(index_path, self.product_ids)
+        # Zero-shot attribute codes for facets (optional)
+        self.attribute_facets = AttributeFacets(index_path, self.product_ids)
+        # Precomputed thumbnails served from /thumbs (optional)
+        self.thumbnails = ThumbnailStore(thumbnails_dir)
+        # Remote source URLs for images that were never downloaded (lazy)
+        self.image_sources = ImageSources(metadata_csv)
+        # Brand per row for diversity caps (lazy)
+        self.brand_codes = BrandCodes(metadata_csv, self.product_ids)
+        # BM25 over product names and brands for keyword search
+        self.lexical = LexicalIndex(metadata_csv, self.product_ids)
 
     def _load_clip_model(self):
         """Load CLIP model"""
         try:
             logger.info("Loading CLIP model...")
-            self.model, self.preprocess = clip.load("ViT-B/32", device=self.device)
+            self.model, self.preprocess = acquire_clip(CLIP_MODEL, self.device)
             logger.info(f"CLIP model loaded successfully on {self.device}")
         except Exception as e:
             logger.error(f"Error loading CLIP model: {e}")
@@ -72,20 +202,84 @@ class StylumiaImageSearch:
 
             if not os.path.exists(index_file) or not os.path.exists(ids_file):
                 raise FileNotFoundError("Required index files not found")
+            # Model and file sizes against manifest.json (checksums continue in the background)
+            manifest = validate_bundle(index_path, CLIP_MODEL)
 
-            self.index = faiss.read_index(index_file)
+            if self.search_mode == "two_stage":
+                # Only the compressed index is resident; full vectors are mmapped
+                self.index = TwoStageIndex(index_path)
+                self.index_file_size = self.index.file_size
+            else:
+                self.index = acquire_index(index_file)
+                self.index_file = index_file
+                self.index_file_size = os.path.getsize(index_file)
+            self.dim = self.index.d
+            check_loaded(manifest, self.dim, self.index.ntotal, index_path)
             self.product_ids = np.load(ids_file)
+            self.id_to_row = {str(pid): row for row, pid in enumerate(self.product_ids)}
             
-            logger.info(f"Loaded FAISS index with {len(self.product_ids)} products")
+            logger.info(f"Loaded FAISS index with {len(self.product_ids)} products ({self.search_mode})")
+
+            primary = load_encoder_manifest(index_path).get("primary")
+            if primary and primary["model"] != CLIP_MODEL:
+                logger.warning(f"Index was built with {primary['model']}, serving {CLIP_MODEL}")
 
             # Verify index type
-            if not isinstance(self.index, faiss.IndexFlatIP):
+            if self.search_mode != "two_stage" and not isinstance(self.index, faiss.IndexFlatIP):
                 logger.warning("Index is not using inner product metric")
 
         except Exception as e:
             logger.error(f"Error loading FAISS index: {e}")
             raise HTTPException(status_code=500, detail=f"Failed to load search index: {str(e)}")
 
+    def _load_duplicate_clusters(self, index_path):
+        """Load duplicate cluster ids and build a representatives-only ID selector"""
+        clusters_file = os.path.join(index_path, "duplicate_clusters.npy")
+        if not os.path.exists(clusters_file):
+            return
+        try:
+            # Cluster ids are rows: after a rebuild they would merge or hide unrelated products
+            mismatch = row_fingerprint_mismatch(os.path.join(index_path, "duplicate_clusters.json"),
+                                                self.product_ids)
+            if mismatch:
+                logger.warning(f"Ignoring {clusters_file} ({mismatch}); re-run build_duplicate_clusters.py")
+                return
+            clusters = np.load(clusters_file)
+            n = self.index.ntotal
+            if len(clusters) < n:
+                # Products appended since the last dedup run are their own cluster
+                clusters = np.concatenate([clusters, np.arange(len(clusters), n, dtype=clusters.dtype)])
+            clusters = clusters[:n]
+
+            self.representatives = clusters == np.arange(n)
+            # Keep the bitmap referenced: the selector only holds a raw pointer
+            self._representative_bitmap = np.packbits(self.representatives, bitorder='little')
+            self.representative_selector = faiss.IDSelectorBitmap(n, faiss.swig_ptr(self._representative_bitmap))
+            self.duplicate_clusters = clusters
+            self.duplicate_counts = np.bincount(clusters, minlength=n)
+            logger.info(f"Loaded duplicate clusters: {n} products -> {int(self.representatives.sum())} clusters")
+        except Exception as e:
+            logger.error(f"Error loading duplicate clusters: {e}")
+
+    def two_stage_report(self) -> Optional[Dict[str, Any]]:
+        """Recall / timing report written by scripts/build_two_stage.py, if any"""
+        report_file = os.path.join(self.index_path, "two_stage_report.json")
+        if not os.path.exists(report_file):
+            return None
+        with open(report_file) as f:
+            return json.load(f)
+
+    def close(self):
+        """Release this service's references to shared models and indexes"""
+        release_clip(CLIP_MODEL, self.device)
+        if self.index_file:
+            release_index(self.index_file)
+        self.cascade.close()
+
+    def memory_bytes(self) -> int:
+        """Approximate resident size of this category's index and id table"""
+        return self.index_file_size + self.cascade.file_size + self.product_ids.nbytes + self.lexical.nbytes
+
     def get_embedding(self, image: Image.Image) -> np.ndarray:
         """Get normalized CLIP embedding for a PIL image"""
         try:
@@ -107,47 +301,316 @@ class StylumiaImageSearch:
             logger.error(f"Error creating embedding: {e}")
             raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
 
-    def search_similar_images(self, query_embedding: np.ndarray, top_k: int = 10) -> Dict[str, Any]:
-        """Search for similar images using FAISS"""
+    def get_embeddings(self, images: List[Image.Image]) -> np.ndarray:
+        """Get normalized CLIP embeddings for a batch of PIL images, one row per image"""
+        try:
+            image_input = torch.stack([
+                self.preprocess(image if image.mode == 'RGB' else image.convert('RGB')) for image in images
+            ]).to(self.device)
+            with torch.no_grad():
+                embeddings = self.model.encode_image(image_input).cpu().numpy().astype('float32')
+            faiss.normalize_L2(embeddings)
+            return embeddings
+        except Exception as e:
+            logger.error(f"Error creating embeddings for {len(images)} images: {e}")
+            raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
+
+    def format_results(self, similarities: np.ndarray, indices: np.ndarray) -> List[Dict[str, Any]]:
+        """Build result dicts from one row of scores and index ids"""
+        results = []
+        for i in range(len(indices)):
+            if indices[i] >= 0:  # Valid index
+                product_id = self.product_ids[indices[i]]
+                
+                # Create image URL
+                image_filename = f"{product_id}.jpg"
+                image_path = os.path.join(self.images_dir, image_filename)
+                
+                # Check if image exists, try .png if .jpg doesn't exist
+                image_exists = os.path.exists(image_path)
+                if not image_exists:
+                    image_filename = f"{product_id}.png"
+                    image_path = os.path.join(self.images_dir, image_filename)
+                    image_exists = os.path.exists(image_path)
+                
+                image_url = f"{self.image_url_prefix}/{image_filename}" if image_exists else None
+                if image_url is None and self.image_sources.get(str(product_id)):
+                    image_url = f"/proxy/images/{product_id}?category={self.category}"
+                
+                result = {
+                    "id": int(indices[i]),
+                    "product_id": str(product_id),
+                    "category": self.category,
+                    "similarity": float(similarities[i]),
+                    "rank": i + 1,
+                    "image_url": image_url,
+                    "image_path": image_path if image_exists else None,
+                    "thumbnail_urls": self.thumbnails.urls(str(product_id), self.category),
+                    "metadata": {
+                        "filename": image_filename,
+                        "exists": image_exists
+                    }
+                }
+                if self.duplicate_clusters is not None:
+                    cluster = self.duplicate_clusters[indices[i]]
+                    result["duplicate_cluster"] = int(cluster)
+                    result["duplicate_count"] = int(self.duplicate_counts[cluster]) - 1
+                if self.attribute_facets.available:
+                    result["attributes"] = self.attribute_facets.attributes(int(indices[i]))
+                results.append(result)
+        return results
+
+    def similar_from_graph(self, product_id: str, top_k: int,
+                           collapse_duplicates: bool = True) -> Optional[Dict[str, Any]]:
+        """Serve neighbors from the precomputed kNN graph, or None if not covered"""
+        start_time = time.time()
+        self.knn_graph.refresh()
+        row = self.id_to_row.get(product_id)
+        if row is None:
+            return None
+        collapse = collapse_duplicates and self.duplicate_clusters is not None
+        neighbors = self.knn_graph.neighbors(row, self.knn_graph.k if collapse else top_k)
+        if neighbors is None:
+            return None
+        indices, similarities = neighbors
+        if collapse:
+            # First neighbor per cluster, skipping copies of the query itself
+            clusters = self.duplicate_clusters[indices]
+            _, first = np.unique(clusters, return_index=True)
+            keep = np.sort(first)
+            keep = keep[clusters[keep] != self.duplicate_clusters[row]][:top_k]
+            if len(keep) < top_k:
+                return None
+            indices, similarities = indices[keep], similarities[keep]
+        results = self.format_results(similarities, indices)
+        return {
+            "results": results,
+            "search_time": time.time() - start_time,
+            "total_found": len(results)
+        }
+
+    def attribute_mask(self, attributes: Optional[str]) -> Optional[np.ndarray]:
+        """Row mask for an attribute filter string, or None when unfiltered"""
+        filters = parse_attribute_filter(attributes)
+        if not filters:
+            return None
+        return self.attribute_facets.mask(filters, self.index.ntotal)
+
+    def encode_texts(self, texts: List[str]) -> np.ndarray:
+        """Get normalized CLIP text embeddings for a batch of queries"""
+        tokens = clip.tokenize(texts, truncate=True).to(self.device)
+        with torch.no_grad():
+            embeddings = self.model.encode_text(tokens).cpu().numpy().astype('float32')
+        faiss.normalize_L2(embeddings)
+        return embeddings
+
+    def _effective_mask(self, collapse_duplicates: bool,
+                        row_mask: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        """Row mask combining a filter with duplicate-cluster representatives"""
+        if collapse_duplicates and self.duplicate_clusters is not None:
+            return self.representatives if row_mask is None else row_mask & self.representatives
+        return row_mask
+
+    def primary_vectors(self, rows: np.ndarray) -> np.ndarray:
+        """Full-precision catalog vectors for the given rows"""
+        if self.search_mode == "two_stage":
+            # Read the mmap in row order, then restore the caller's order
+            order = np.argsort(rows)
+            vectors = np.empty((len(rows), self.dim), dtype='float32')
+            vectors[order] = self.index.embeddings[rows[order]]
+            return vectors
+        return self.index.reconstruct_batch(rows.astype('int64'))
+
+    def cascade_candidates(self, cheap_embedding: np.ndarray, top_k: int = 10,
+                           collapse_duplicates: bool = True,
+                           row_mask: Optional[np.ndarray] = None,
+                           timer: Optional[StageTimer] = None) -> Tuple[np.ndarray, np.ndarray, bool]:
+        """(cheap scores, rows, escalate) for a cheap-encoder query embedding"""
+        timer = timer or StageTimer(stage_metrics)
+        mask = self._effective_mask(collapse_duplicates, row_mask)
+        with timer.stage("cascade_search"):
+            scores, rows = self.cascade.search(cheap_embedding, mask)
+        escalated = self.cascade.is_ambiguous(scores, top_k)
+        stage_metrics.increment("cascade_queries")
+        if escalated:
+            stage_metrics.increment("cascade_escalations")
+        return scores, rows, escalated
+
+    def cascade_results(self, cheap_scores: np.ndarray, rows: np.ndarray, top_k: int,
+                        query_embedding: Optional[np.ndarray] = None,
+                        timer: Optional[StageTimer] = None) -> Dict[str, Any]:
+        """
+        Top_k cascade candidates, re-ranked by primary similarity when the
+        query was escalated (query_embedding given)
+
+        The cheap encoder's cosine is not on the primary scale, so it is
+        reported as cascade_similarity; similarity is None unless escalated.
+        """
+        timer = timer or StageTimer(stage_metrics)
+        escalated = query_embedding is not None
+        similarities = np.full(len(rows), np.nan, dtype='float32')
+        if escalated:
+            with timer.stage("rerank"):
+                similarities = self.primary_vectors(rows) @ query_embedding[0]
+                order = np.argsort(-similarities, kind='stable')
+                similarities, cheap_scores, rows = similarities[order], cheap_scores[order], rows[order]
+
+        results = self.format_results(similarities[:top_k], rows[:top_k])
+        for result, cheap_score in zip(results, cheap_scores[:top_k]):
+            if not escalated:
+                result["similarity"] = None
+            result["cascade_similarity"] = float(cheap_score)
+        return {
+            "results": results,
+            "total_found": len(results),
+            "cascade": {
+                "model": self.cascade.model_name if not escalated else f"{self.cascade.model_name} -> {CLIP_MODEL}",
+                "candidates": len(rows),
+                "escalated": escalated
+            }
+        }
+
+    def diversify(self, relevance: np.ndarray, rows: np.ndarray, top_k: int, diversity: float,
+                  brand_cap: Optional[int], timer: StageTimer,
+                  vectors: Optional[np.ndarray] = None) -> np.ndarray:
+        """MMR re-rank of candidate rows down to top_k positions, capping results per brand"""
+        with timer.stage("diversify"):
+            group_caps = []
+            if brand_cap is not None and self.brand_codes.codes is not None:
+                group_caps.append((self.brand_codes.codes[rows], brand_cap))
+            if vectors is None:
+                vectors = self.primary_vectors(rows)
+            return mmr_select(vectors, relevance, top_k, diversity, group_caps)
+
+    def keyword_mask(self, keywords: str) -> np.ndarray:
+        """Row mask of products whose name or brand contains every keyword"""
+        if not self.lexical.available:
+            raise HTTPException(status_code=400, detail=f"Keyword search is not available for {self.category}")
+        return self.lexical.match_mask(keywords, self.index.ntotal)
+
+    def color_mask(self, color_lab: np.ndarray, color_hex: str) -> np.ndarray:
+        """Row mask of products with a dominant color near the query color"""
+        if not self.color_palettes.available:
+            raise HTTPException(status_code=400, detail=f"Color filtering is not available for {self.category}")
+        return self.color_palettes.mask(color_lab, color_hex)
+
+    def _index_search(self, query_embedding: np.ndarray, k: int, mask: Optional[np.ndarray],
+                      timer: Optional[StageTimer] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """FAISS search restricted to rows in mask; restricting to cluster
+        representatives returns one result per duplicate cluster without over-fetching"""
+        if self.search_mode == "two_stage":
+            return self.index.search(query_embedding, k, mask, timer)
+        if mask is not None and mask is self.representatives:
+            # Unfiltered collapse: reuse the prebuilt representatives selector
+            params = faiss.SearchParameters(sel=self.representative_selector)
+            return self.index.search(query_embedding, k, params=params)
+        if mask is not None:
+            bitmap = np.packbits(mask, bitorder='little')
+            selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bitmap))
+            params = faiss.SearchParameters(sel=selector)
+            return self.index.search(query_embedding, k, params=params)
+        return self.index.search(query_embedding, k)
+
+    def hybrid_search(self, query_embedding: np.ndarray, keywords: str, top_k: int = 10,
+                      fusion: str = "rrf", collapse_duplicates: bool = True,
+                      row_mask: Optional[np.ndarray] = None,
+                      timer: Optional[StageTimer] = None) -> Dict[str, Any]:
+        """
+        Fuse FAISS candidates with BM25 keyword matches
+
+        "rrf" sums 1 / (RRF_K + rank) over both rankings; "weighted" mixes
+        cosine similarity with max-normalized BM25 by HYBRID_KEYWORD_WEIGHT.
+        Keyword-only candidates get their exact cosine from the stored vectors.
+        """
+        if not self.lexical.available:
+            raise HTTPException(status_code=400, detail=f"Keyword search is not available for {self.category}")
+        timer = timer or StageTimer(stage_metrics)
+        start_time = time.time()
+        faiss.normalize_L2(query_embedding)
+        mask = self._effective_mask(collapse_duplicates, row_mask)
+
+        similarities, indices = self._index_search(query_embedding, HYBRID_CANDIDATES, mask, timer)
+        valid = indices[0] >= 0
+        vector_rows = indices[0][valid]
+        with timer.stage("lexical"):
+            keyword_rows, keyword_scores = self.lexical.search(keywords, mask, HYBRID_CANDIDATES)
+
+        with timer.stage("fuse"):
+            rows = np.union1d(vector_rows, keyword_rows)
+            cosine = self.primary_vectors(rows) @ query_embedding[0]
+            bm25 = np.zeros(len(rows), dtype='float32')
+            bm25[np.searchsorted(rows, keyword_rows)] = keyword_scores
+            if fusion == "weighted":
+                top_bm25 = keyword_scores[0] if len(keyword_scores) else 1.0
+                fused = (1.0 - HYBRID_KEYWORD_WEIGHT) * cosine + HYBRID_KEYWORD_WEIGHT * bm25 / top_bm25
+            else:
+                fused = np.zeros(len(rows), dtype='float32')
+                fused[np.searchsorted(rows, vector_rows)] += 1.0 / (RRF_K + np.arange(1, len(vector_rows) + 1))
+                fused[np.searchsorted(rows, keyword_rows)] += 1.0 / (RRF_K + np.arange(1, len(keyword_rows) + 1))
+            order = np.argsort(-fused, kind='stable')[:top_k]
+
+        results = self.format_results(cosine[order], rows[order])
+        for result, keyword_score, fused_score in zip(results, bm25[order], fused[order]):
+            result["keyword_score"] = float(keyword_score)
+            result["fused_score"] = float(fused_score)
+        return {
+            "results": results,
+            "search_time": time.time() - start_time,
+            "total_found": len(results)
+        }
+
+    def search_similar_images(self, query_embedding: np.ndarray, top_k: int = 10,
+                              collapse_duplicates: bool = True,
+                              row_mask: Optional[np.ndarray] = None,
+                              timer: Optional[StageTimer] = None,
+                              diversity: float = 0.0,
+                              brand_cap: Optional[int] = None,
+                              taste: Optional[np.ndarray] = None,
+                              taste_weight: float = 0.0) -> Dict[str, Any]:
+        """
+        Search for similar images using FAISS, optionally restricted to rows in row_mask
+
+        Re-ranking over-fetches candidates first: a session taste vector blends
+        (1 - taste_weight) * query similarity + taste_weight * taste similarity,
+        and diversity > 0 or a brand_cap applies maximal marginal relevance.
+        """
         try:
             start_time = time.time()
+            timer = timer or StageTimer(stage_metrics)
+            diversify = diversity > 0 or brand_cap is not None
+            fetch_k = top_k
+            if diversify:
+                fetch_k = max(fetch_k, MMR_CANDIDATES)
+            if taste is not None:
+                fetch_k = max(fetch_k, TASTE_CANDIDATES)
             
             # Ensure embedding is normalized
             faiss.normalize_L2(query_embedding)
             
             # Search using FAISS
-            similarities, indices = self.index.search(query_embedding, top_k)
+            mask = self._effective_mask(collapse_duplicates, row_mask)
+            similarities, indices = self._index_search(query_embedding, fetch_k, mask, timer)
             
-            # Prepare results
-            results = []
-            for i in range(top_k):
-                if indices[0][i] >= 0:  # Valid index
-                    product_id = self.product_ids[indices[0][i]]
-                    
-                    # Create image URL
-                    image_filename = f"{product_id}.jpg"
-                    image_path = os.path.join(self.images_dir, image_filename)
-                    
-                    # Check if image exists, try .png if .jpg doesn't exist
-                    if not os.path.exists(image_path):
-                        image_filename = f"{product_id}.png"
-                        image_path = os.path.join(self.images_dir, image_filename)
-                    
-                    image_url = f"/images/{image_filename}" if os.path.exists(image_path) else None
-                    
-                    result = {
-                        "id": int(indices[0][i]),
-                        "product_id": str(product_id),
-                        "similarity": float(similarities[0][i]),
-                        "rank": i + 1,
-                        "image_url": image_url,
-                        "image_path": image_path if os.path.exists(image_path) else None,
-                        "metadata": {
-                            "filename": image_filename,
-                            "exists": os.path.exists(image_path) if image_path else False
-                        }
-                    }
-                    results.append(result)
+            if diversify or taste is not None:
+                valid = indices[0] >= 0
+                similarities, rows = similarities[0][valid], indices[0][valid]
+                relevance, vectors = similarities, None
+                if taste is not None:
+                    with timer.stage("personalize"):
+                        vectors = self.primary_vectors(rows)
+                        taste_similarities = vectors @ taste
+                        relevance = (1.0 - taste_weight) * similarities + taste_weight * taste_similarities
+                if diversify:
+                    picked = self.diversify(relevance, rows, top_k, diversity, brand_cap, timer, vectors)
+                else:
+                    picked = np.argsort(-relevance, kind='stable')[:top_k]
+                results = self.format_results(similarities[picked], rows[picked])
+                if taste is not None:
+                    for result, taste_similarity, score in zip(results, taste_similarities[picked], relevance[picked]):
+                        result["taste_similarity"] = float(taste_similarity)
+                        result["personalized_score"] = float(score)
+            else:
+                results = self.format_results(similarities[0], indices[0])
             
             search_time = time.time() - start_time
             
@@ -161,14 +624,328 @@ class StylumiaImageSearch:
             logger.error(f"Error during search: {e}")
             raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
-# Initialize the search service
+# Initialize the search service (default category, always resident)
 try:
-    search_service = StylumiaImageSearch()
+    default_config = category_configs[DEFAULT_CATEGORY]
+    search_service = StylumiaImageSearch(default_config.index_path, default_config.images_dir,
+                                         category=DEFAULT_CATEGORY,
+                                         thumbnails_dir=default_config.thumbnails_dir,
+                                         metadata_csv=default_config.metadata_csv)
     logger.info("Stylumia Image Search service initialized successfully")
 except Exception as e:
     logger.error(f"Failed to initialize search service: {e}")
     search_service = None
 
+def load_category(config):
+    """Load another category's index (the CLIP model is shared through the resource registry)"""
+    return StylumiaImageSearch(config.index_path, config.images_dir, category=config.name,
+                               image_url_prefix=f"/images/{config.name}",
+                               thumbnails_dir=config.thumbnails_dir, metadata_csv=config.metadata_csv)
+
+# Other categories load on first use and are evicted LRU under a memory budget
+category_registry = CategoryRegistry(category_configs, load_category)
+if search_service:
+    category_registry.add(DEFAULT_CATEGORY, search_service, pinned=True)
+
+async def get_service(category: Optional[str]) -> StylumiaImageSearch:
+    """Search service for a single category (default when not given), loaded off the event loop"""
+    if category == FANOUT_CATEGORY:
+        raise HTTPException(status_code=400, detail=f"category={FANOUT_CATEGORY} is not supported here")
+    return await category_registry.get_async(category or DEFAULT_CATEGORY)
+
+async def resolve_services(category: Optional[str]) -> List[StylumiaImageSearch]:
+    """Services to query: one category, or every category for category=all"""
+    if category == FANOUT_CATEGORY:
+        return [await category_registry.get_async(name) for name in category_registry.names]
+    return [await get_service(category)]
+
+def search_categories(targets, query_embedding: np.ndarray, top_k: int,
+                      collapse_duplicates: bool = True,
+                      timer: Optional[StageTimer] = None,
+                      diversity: float = 0.0,
+                      brand_cap: Optional[int] = None,
+                      keywords: Optional[str] = None,
+                      fusion: str = "rrf",
+                      taste: Optional[np.ndarray] = None,
+                      taste_weight: float = 0.0) -> Dict[str, Any]:
+    """
+    Search each (service, row_mask) target and merge the per-category top_k by score
+
+    keywords with rrf / weighted fusion go through hybrid_search and merge by
+    fused score; intersect keyword filters are already part of the row masks.
+    Personalized results merge by their blended score.
+    """
+    def search(service, row_mask, embedding):
+        if keywords and fusion != "intersect":
+            return service.hybrid_search(embedding, keywords, top_k, fusion, collapse_duplicates, row_mask, timer)
+        return service.search_similar_images(embedding, top_k, collapse_duplicates, row_mask, timer,
+                                             diversity, brand_cap, taste, taste_weight)
+
+    if len(targets) == 1:
+        service, row_mask = targets[0]
+        return search(service, row_mask, query_embedding)
+
+    start_time = time.time()
+    merged = []
+    for service, row_mask in targets:
+        merged.extend(search(service, row_mask, query_embedding.copy())["results"])
+    results = heapq.nlargest(top_k, merged, key=lambda result: result.get(
+        "fused_score", result.get("personalized_score", result["similarity"])))
+    for rank, result in enumerate(results, 1):
+        result["rank"] = rank
+    return {
+        "results": results,
+        "search_time": time.time() - start_time,
+        "total_found": len(results)
+    }
+
+# Model and index work is queued in interactive / bulk lanes so bulk jobs
+# cannot starve storefront traffic
+image_scheduler = None
+text_scheduler = None
+search_scheduler = PriorityScheduler(run_calls, default_lanes(interactive_batch=4, bulk_batch=16), name="search")
+if search_service:
+    image_scheduler = PriorityScheduler(search_service.get_embeddings, name="image_encode")
+
+# Text query path: pinned warm set + LRU in front of a micro-batched text encoder
+text_cache = TextEmbeddingCache()
+if search_service:
+    text_cache.load_warm_set(os.path.join(search_service.index_path, "text_warmset.npz"),
+                             CLIP_MODEL, search_service.dim)
+    text_scheduler = PriorityScheduler(search_service.encode_texts, default_lanes(interactive_batch=32, bulk_batch=256),
+                                       name="text_encode")
+
+# Image query vectors keyed on upload bytes, shared by /search and /embed
+image_embedding_cache = LRUCache(IMAGE_EMBEDDING_CACHE_SIZE)
+
+def decode_query(contents: bytes, timer: StageTimer) -> Tuple[Image.Image, Dict[str, Any]]:
+    """Decode an uploaded query image near CLIP input size; returns (image, image info)"""
+    with timer.stage("decode"):
+        image, decode_info = decode_image(contents)
+    if decode_info["method"] != "full":
+        stage_metrics.increment("decode_reduced")
+        stage_metrics.increment("decode_pixels_saved", decode_info["pixels_saved"])
+    return image, {
+        "dimensions": "{}x{}".format(*decode_info["original_size"]),
+        "decoded_dimensions": f"{image.width}x{image.height}",
+        "decode_method": decode_info["method"],
+        "mode": image.mode
+    }
+
+async def embed_upload(contents: bytes, lane: str, client: str, timer: StageTimer,
+                       cascade: Optional[ModelCascade] = None,
+                       decode: Optional[Callable[[], Tuple[Image.Image, Dict[str, Any]]]] = None
+                       ) -> Tuple[np.ndarray, Dict[str, Any], str]:
+    """
+    (normalized vector, image info, "hit" | "miss") for uploaded image bytes, through the cache
+
+    With a cascade, the vector comes from its cheap encoder (cached under the
+    model name). decode lets callers embedding one upload twice decode it once.
+    """
+    key = content_key(contents) if cascade is None else f"{cascade.model_name}:{content_key(contents)}"
+    cached = image_embedding_cache.get(key)
+    if cached is not None:
+        stage_metrics.increment("image_embedding_cache_hit")
+        return cached[0], cached[1], "hit"
+    image, image_info = decode() if decode is not None else decode_query(contents, timer)
+    scheduler = image_scheduler if cascade is None else cascade.scheduler
+    with timer.stage("embed" if cascade is None else "cascade_embed"):
+        # Batched with concurrent requests in the same lane; copied so the cache holds one row, not the batch
+        vector = np.array(await scheduler.submit(image, lane, client), dtype='float32')
+    image_embedding_cache.put(key, (vector, image_info))
+    stage_metrics.increment("image_embedding_cache_miss")
+    return vector, image_info, "miss"
+
+async def search_cascade(service: "StylumiaImageSearch", contents: bytes, top_k: int, collapse_duplicates: bool,
+                         row_mask: Optional[np.ndarray], lane: str, client: str, timer: StageTimer
+                         ) -> Tuple[Dict[str, Any], Dict[str, Any], str, Optional[np.ndarray]]:
+    """
+    Cheap-encoder search for an upload; the primary encoder only runs on
+    ambiguous rankings. Returns (search results, image info, cheap embedding
+    cache status, primary query embedding or None)
+    """
+    start_time = time.time()
+    decoded = []
+    def decode():
+        if not decoded:
+            decoded.append(decode_query(contents, timer))
+        return decoded[0]
+
+    cheap_vector, image_info, cache_status = await embed_upload(contents, lane, client, timer, service.cascade, decode)
+    scores, rows, escalated = await search_scheduler.submit(
+        lambda: service.cascade_candidates(cheap_vector.reshape(1, -1), top_k, collapse_duplicates, row_mask, timer),
+        lane, client
+    )
+    query_embedding = None
+    if escalated:
+        query_vector, _, _ = await embed_upload(contents, lane, client, timer, decode=decode)
+        query_embedding = query_vector.reshape(1, -1)
+    search_results = service.cascade_results(scores, rows, top_k, query_embedding, timer)
+    search_results["search_time"] = time.time() - start_time
+    return search_results, image_info, cache_status, query_embedding
+
+def request_lane(request: Request, priority: Optional[str]) -> Tuple[str, str]:
+    """(lane, client id): ?priority= or X-Priority (default interactive), X-Client-Id or remote address"""
+    lane = priority or request.headers.get("x-priority") or INTERACTIVE
+    client = request.headers.get("x-client-id") or (request.client.host if request.client else "anonymous")
+    return lane, client
+
+# Sharded catalog: remote shard URLs, or local workers spawned from a shards dir
+shard_coordinator = None
+shard_processes = []
+if os.environ.get("STYLUMIA_SHARD_URLS"):
+    shard_coordinator = ShardCoordinator(os.environ["STYLUMIA_SHARD_URLS"].split(","))
+elif os.environ.get("STYLUMIA_LOCAL_SHARDS_DIR"):
+    shard_urls, shard_processes = launch_local_shards(os.environ["STYLUMIA_LOCAL_SHARDS_DIR"])
+    wait_for_shards(shard_urls)
+    shard_coordinator = ShardCoordinator(shard_urls)
+
+# Remote catalog images are fetched once and kept in a size-bounded disk cache
+image_proxy = ImageProxy(DiskLRUCache(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES))
+
+# Session taste vectors for personalized re-ranking (sqlite-backed when configured)
+session_store = SessionStore(db_path=os.environ.get("STYLUMIA_SESSION_DB"))
+
+# Over-fetched candidate lists behind /search/page cursors (TTL-bounded LRU)
+cursor_store = CursorStore()
+
+async def format_page(candidates: CandidateList, offset: int) -> List[Dict[str, Any]]:
+    """Result dicts for one page of a cached candidate list, formatted per category in list order"""
+    positions = np.arange(offset, min(offset + candidates.page_size, len(candidates)))
+    results = [None] * len(positions)
+    for code, category in enumerate(candidates.categories):
+        picked = np.flatnonzero(candidates.codes[positions] == code)
+        if not len(picked):
+            continue
+        service = await get_service(category)
+        formatted = service.format_results(candidates.similarities[positions[picked]],
+                                           candidates.rows[positions[picked]])
+        for i, result in zip(picked, formatted):
+            result["rank"] = int(positions[i]) + 1
+            for field, scores in candidates.scores.items():
+                if not np.isnan(scores[positions[i]]):
+                    result[field] = float(scores[positions[i]])
+            results[i] = result
+    return results
+
+# Cross-category cluster compatibility (see scripts/build_style_tables.py)
+style_table = StyleTable()
+
+@app.on_event("shutdown")
+async def shutdown_shards():
+    if shard_coordinator:
+        await shard_coordinator.close()
+    for process in shard_processes:
+        process.terminate()
+    await image_proxy.close()
+    session_store.close()
+
+def use_shards(sharded: Optional[bool], category: Optional[str], attributes: Optional[str],
+               color: Optional[str] = None, personalized: bool = False) -> bool:
+    """
+    Whether a search goes to the shard coordinator
+
+    Opt-in with sharded=true: shards only rank by similarity, so the default
+    stays on the local index, which supports every filter and re-ranking.
+    """
+    if not sharded:
+        return False
+    if shard_coordinator is None:
+        raise HTTPException(status_code=400, detail="No index shards are configured")
+    if category or attributes or color or personalized:
+        raise HTTPException(status_code=400, detail="category, attributes, color and session personalization "
+                                                    "are not supported for sharded search")
+    return True
+
+def format_shard_results(hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Full result fields for shard hits via the default category's id table
+    (scripts/build_shards.py splits that catalog); unknown ids stay bare
+    """
+    rows = [search_service.id_to_row.get(hit["product_id"]) for hit in hits]
+    known = [i for i, row in enumerate(rows) if row is not None]
+    formatted = search_service.format_results(np.array([hits[i]["similarity"] for i in known], dtype='float32'),
+                                              np.array([rows[i] for i in known], dtype='int64'))
+    results = list(hits)
+    for i, result in zip(known, formatted):
+        results[i] = {**result, "rank": hits[i]["rank"], "shard": hits[i]["shard"]}
+    return results
+
+async def search_shards(query_embedding: np.ndarray, top_k: int) -> Dict[str, Any]:
+    """Scatter-gather search over all shards, reporting shards that did not answer"""
+    start_time = time.time()
+    hits, shard_report = await shard_coordinator.search(query_embedding, top_k)
+    results = format_shard_results(hits)
+    return {
+        "results": results,
+        "search_time": time.time() - start_time,
+        "total_found": len(results),
+        "shards": shard_report
+    }
+
+def check_diversity(diversity: float, brand_cap: Optional[int], sharded_search: bool) -> bool:
+    """Validate diversity settings; True when results get MMR re-ranked"""
+    if not 0.0 <= diversity <= 1.0:
+        raise HTTPException(status_code=400, detail="diversity must be between 0 and 1")
+    if brand_cap is not None and brand_cap < 1:
+        raise HTTPException(status_code=400, detail="brand_cap must be at least 1")
+    diversify = diversity > 0 or brand_cap is not None
+    if diversify and sharded_search:
+        raise HTTPException(status_code=400, detail="diversity and brand_cap are not supported for sharded search")
+    return diversify
+
+def check_keywords(keywords: Optional[str], fusion: str, sharded_search: bool, diversify: bool) -> bool:
+    """Validate keyword search settings; True when keywords apply"""
+    if fusion not in HYBRID_FUSIONS:
+        raise HTTPException(status_code=400, detail=f"fusion must be one of {list(HYBRID_FUSIONS)}")
+    if not keywords or not keywords.strip():
+        return False
+    if sharded_search:
+        raise HTTPException(status_code=400, detail="keywords are not supported for sharded search")
+    if diversify and fusion != "intersect":
+        raise HTTPException(status_code=400, detail="diversity and brand_cap need fusion=intersect with keywords")
+    return True
+
+def narrow_targets(targets, mask_of: Callable[[StylumiaImageSearch], np.ndarray]):
+    """AND each (service, row_mask) target with a per-service mask"""
+    narrowed = []
+    for service, row_mask in targets:
+        mask = mask_of(service)
+        narrowed.append((service, mask if row_mask is None else row_mask & mask))
+    return narrowed
+
+def keyword_targets(targets, keywords: str):
+    """Narrow each (service, row_mask) target to products matching every keyword"""
+    return narrow_targets(targets, lambda service: service.keyword_mask(keywords))
+
+def session_taste(session_id: Optional[str], personalization: float) -> Optional[np.ndarray]:
+    """Taste vector to blend into a search, or None without a session or its events"""
+    if not 0.0 <= personalization <= 1.0:
+        raise HTTPException(status_code=400, detail="personalization must be between 0 and 1")
+    if not session_id or personalization == 0:
+        return None
+    return session_store.taste(session_id)
+
+def use_cascade(cascade: Optional[bool], targets, primary_only: bool = False) -> bool:
+    """
+    Whether an image search runs the cheap-encoder cascade
+
+    Opt-in with cascade=true: unescalated results carry the cheap encoder's
+    cascade_similarity instead of a primary-scale similarity.
+    """
+    if primary_only:
+        # Re-ranking, keyword fusion and pagination need the over-fetched primary-encoder candidates
+        if cascade:
+            raise HTTPException(status_code=400, detail="cascade is not supported with diversity, brand_cap, "
+                                                        "keywords, session personalization, vector queries "
+                                                        "or paginate")
+        return False
+    if not cascade:
+        return False
+    if len(targets) != 1 or not targets[0][0].cascade.available:
+        raise HTTPException(status_code=400, detail="No cascade encoder index is available for this search")
+    return True
+
 @app.get("/")
 async def root():
     return {
@@ -192,57 +969,156 @@ async def health_check():
 
 @app.post("/search")
 async def search_similar_images(
-    file: UploadFile = File(...),
-    top_k: int = 10
+    request: Request,
+    file: Optional[UploadFile] = File(None),
+    vector: Optional[str] = Form(None),
+    top_k: int = 10,
+    collapse_duplicates: bool = True,
+    attributes: Optional[str] = None,
+    category: Optional[str] = None,
+    sharded: Optional[bool] = None,
+    cascade: Optional[bool] = None,
+    diversity: float = 0.0,
+    brand_cap: Optional[int] = None,
+    keywords: Optional[str] = None,
+    fusion: str = "rrf",
+    color: Optional[str] = None,
+    session_id: Optional[str] = None,
+    personalization: float = DEFAULT_TASTE_WEIGHT,
+    paginate: bool = False,
+    fields: Optional[str] = None,
+    priority: Optional[str] = None
 ):
     """
-    Upload an image and get similar fashion items
+    Upload an image and get similar fashion items (category=all searches every category)
+
+    Instead of a file, a precomputed CLIP vector (vector form field, base64
+    float16 / float32 as returned by /embed, or comma-separated floats) skips
+    upload decoding and inference.
+    keywords (e.g. "linen" or "zara") match product names and brands and are
+    combined with the image ranking by fusion: rrf, weighted or intersect.
+    color (a name like "navy" or a hex code) keeps products whose precomputed
+    palette has a dominant color near it, applied as a filter inside the search.
+    With a session_id, results lean toward the session's engagement history
+    by the personalization weight.
+    paginate=true ranks CURSOR_CANDIDATES results once and returns the first
+    top_k with a next_cursor; GET /search/page serves the following pages
+    from that cached list without model or index work.
+    sharded=true scatters the query to the configured index shards instead
+    (similarity ranking only). cascade=true ranks with the cheap encoder
+    first, escalating to CLIP only when that ranking is ambiguous.
     """
     if not search_service:
         raise HTTPException(status_code=503, detail="Search service not available")
     
+    timer = StageTimer(stage_metrics)
     try:
-        # Validate file type
-        if not file.content_type.startswith("image/"):
+        # Validate query input
+        if (file is None) == (vector is None):
+            raise HTTPException(status_code=400, detail="Send either an image file or a precomputed vector")
+        if file is not None and not file.content_type.startswith("image/"):
             raise HTTPException(status_code=400, detail="File must be an image")
         
         # Validate top_k parameter
         if top_k < 1 or top_k > 50:
             raise HTTPException(status_code=400, detail="top_k must be between 1 and 50")
+        result_fields = parse_fields(fields)
+        lane, client = request_lane(request, priority)
         
-        # Read and process image
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
+        # Resolve categories and attribute filters before any model work
+        sharded_search = use_shards(sharded, category, attributes, color,
+                                    bool(session_id) and personalization > 0)
+        if paginate and sharded_search:
+            raise HTTPException(status_code=400, detail="paginate is not supported for sharded search")
+        diversify = check_diversity(diversity, brand_cap, sharded_search)
+        use_keywords = check_keywords(keywords, fusion, sharded_search, diversify)
+        targets = [] if sharded_search else \
+            [(service, service.attribute_mask(attributes)) for service in await resolve_services(category)]
+        if use_keywords and fusion == "intersect":
+            targets = keyword_targets(targets, keywords)
+        color_hex = None
+        if color:
+            with timer.stage("color_filter"):
+                color_lab, color_hex = parse_color(color)
+                targets = narrow_targets(targets, lambda service: service.color_mask(color_lab, color_hex))
+        # Taste re-ranking applies to plain and keyword-filtered index searches
+        taste = None if sharded_search or (use_keywords and fusion != "intersect") else \
+            session_taste(session_id, personalization)
+        cascade_search = use_cascade(cascade, targets, diversify or use_keywords or taste is not None
+                                     or vector is not None or paginate)
         
-        logger.info(f"Processing image: {file.filename}, size: {len(contents)} bytes, dimensions: {image.size}")
+        if vector is not None:
+            with timer.stage("parse_vector"):
+                query_embedding = parse_vector(vector, search_service.dim)
+            query_image = {"source": "vector", "dim": query_embedding.shape[1]}
+        else:
+            # Read (bounded); decode and embed unless this exact upload was seen recently
+            with timer.stage("upload_read"):
+                contents = await read_upload_bounded(file)
+            if cascade_search:
+                # Cheap encoder first; the CLIP model only runs on ambiguous rankings
+                service, row_mask = targets[0]
+                search_results, image_info, cache_status, query_embedding = await search_cascade(
+                    service, contents, top_k, collapse_duplicates, row_mask, lane, client, timer
+                )
+            else:
+                query_vector, image_info, cache_status = await embed_upload(contents, lane, client, timer)
+                query_embedding = query_vector.reshape(1, -1)
+            # image_info is shared with the embedding cache entry; annotate a copy
+            image_info = {**image_info, "embedding_cache": cache_status}
+            query_image = {"filename": file.filename, "size": len(contents), **image_info}
+            logger.info(f"Processing image: {file.filename}, size: {len(contents)} bytes, "
+                        f"dimensions: {image_info['dimensions']}, decoded: {image_info['decoded_dimensions']} "
+                        f"({image_info['decode_method']})")
         
-        # Create embedding using CLIP
-        query_embedding = search_service.get_embedding(image)
+        if not cascade_search:
+            # Search for similar images
+            with timer.stage("search"):
+                if sharded_search:
+                    search_results = await search_shards(query_embedding, top_k)
+                else:
+                    fetch_k = max(top_k, CURSOR_CANDIDATES) if paginate else top_k
+                    search_results = await search_scheduler.submit(
+                        lambda: search_categories(targets, query_embedding, fetch_k, collapse_duplicates, timer,
+                                                  diversity, brand_cap, keywords if use_keywords else None, fusion,
+                                                  taste, personalization),
+                        lane, client
+                    )
         
-        # Search for similar images
-        search_results = search_service.search_similar_images(query_embedding, top_k)
+        pagination = None
+        if paginate:
+            # Keep the whole ranking for later pages; answer with the first one
+            candidates, list_id = cursor_store.create(search_results["results"], top_k)
+            search_results["results"] = search_results["results"][:top_k]
+            search_results["total_found"] = len(search_results["results"])
+            pagination = {"next_cursor": next_cursor(list_id, candidates, 0), "offset": 0,
+                          "total_candidates": len(candidates)}
         
         # Prepare response
         response = {
             "success": True,
-            "query_image": {
-                "filename": file.filename,
-                "size": len(contents),
-                "dimensions": f"{image.width}x{image.height}",
-                "mode": image.mode
-            },
+            "query_image": query_image,
             "results": search_results["results"],
             "total_found": search_results["total_found"],
             "search_time": search_results["search_time"],
             "processing_info": {
                 "device": search_service.device,
-                "embedding_shape": query_embedding.shape
+                "embedding_shape": query_embedding.shape if query_embedding is not None else None,
+                "personalized": taste is not None,
+                "color_filter": color_hex,
+                "stage_timings_ms": timer.as_ms()
             }
         }
+        if "shards" in search_results:
+            response["shards"] = search_results["shards"]
+        if "cascade" in search_results:
+            response["cascade"] = search_results["cascade"]
+        if pagination is not None:
+            response["pagination"] = pagination
         
         logger.info(f"Search completed: {search_results['total_found']} results in {search_results['search_time']:.4f}s")
         
-        return response
+        return render(response, request.headers.get("accept"), result_fields, timer)
         
     except HTTPException as he:
         raise he
@@ -250,10 +1126,130 @@ async def search_similar_images(
         logger.error(f"Search error: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.get("/search/page")
+async def search_page(request: Request, cursor: str, fields: Optional[str] = None):
+    """
+    Next page of a paginate=true search, sliced from its cached candidate list
+
+    Cursors expire after CURSOR_TTL_S (or earlier under LRU pressure) with a
+    410; the client then re-runs the search.
+    """
+    timer = StageTimer(stage_metrics)
+    result_fields = parse_fields(fields)
+    list_id, offset = parse_cursor(cursor)
+    candidates = cursor_store.get(list_id)
+    if candidates is None:
+        raise HTTPException(status_code=410, detail="Cursor expired; repeat the search")
+    if offset >= len(candidates):
+        raise HTTPException(status_code=400, detail=f"Cursor offset {offset} is past the "
+                                                    f"{len(candidates)} cached results")
+    start_time = time.time()
+    with timer.stage("page"):
+        results = await format_page(candidates, offset)
+    response = {
+        "success": True,
+        "results": results,
+        "total_found": len(results),
+        "search_time": time.time() - start_time,
+        "pagination": {"next_cursor": next_cursor(list_id, candidates, offset), "offset": offset,
+                       "total_candidates": len(candidates)},
+        "processing_info": {"stage_timings_ms": timer.as_ms()}
+    }
+    return render(response, request.headers.get("accept"), result_fields, timer)
+
+@app.post("/search/text")
+async def search_by_text(
+    request: Request,
+    query: str,
+    top_k: int = 10,
+    collapse_duplicates: bool = True,
+    attributes: Optional[str] = None,
+    category: Optional[str] = None,
+    sharded: Optional[bool] = None,
+    diversity: float = 0.0,
+    brand_cap: Optional[int] = None,
+    session_id: Optional[str] = None,
+    personalization: float = DEFAULT_TASTE_WEIGHT,
+    fields: Optional[str] = None,
+    priority: Optional[str] = None
+):
+    """
+    Search fashion items with a text description, e.g. "red floral maxi dress"
+    """
+    if not search_service:
+        raise HTTPException(status_code=503, detail="Search service not available")
+    
+    timer = StageTimer(stage_metrics)
+    try:
+        key = normalize_query(query)
+        if not key:
+            raise HTTPException(status_code=400, detail="query must not be empty")
+        
+        if top_k < 1 or top_k > 50:
+            raise HTTPException(status_code=400, detail="top_k must be between 1 and 50")
+        result_fields = parse_fields(fields)
+        lane, client = request_lane(request, priority)
+        
+        sharded_search = use_shards(sharded, category, attributes,
+                                    personalized=bool(session_id) and personalization > 0)
+        check_diversity(diversity, brand_cap, sharded_search)
+        targets = [] if sharded_search else \
+            [(service, service.attribute_mask(attributes)) for service in await resolve_services(category)]
+        taste = None if sharded_search else session_taste(session_id, personalization)
+        
+        # Cached text vector, or one row of a micro-batched encode_text call
+        with timer.stage("text_embed"):
+            query_embedding, cache_source = text_cache.get(key)
+            if query_embedding is None:
+                query_embedding = await text_scheduler.submit(key, lane, client)
+                text_cache.put(key, query_embedding)
+        stage_metrics.increment(f"text_cache_{cache_source}")
+        
+        with timer.stage("search"):
+            if sharded_search:
+                search_results = await search_shards(query_embedding, top_k)
+            else:
+                search_results = await search_scheduler.submit(
+                    lambda: search_categories(
+                        targets, query_embedding.reshape(1, -1).copy(), top_k, collapse_duplicates, timer,
+                        diversity, brand_cap, taste=taste, taste_weight=personalization
+                    ),
+                    lane, client
+                )
+        
+        response = {
+            "success": True,
+            "query": query,
+            "results": search_results["results"],
+            "total_found": search_results["total_found"],
+            "search_time": search_results["search_time"],
+            "processing_info": {
+                "device": search_service.device,
+                "text_cache": cache_source,
+                "personalized": taste is not None,
+                "stage_timings_ms": timer.as_ms()
+            }
+        }
+        if "shards" in search_results:
+            response["shards"] = search_results["shards"]
+        
+        return render(response, request.headers.get("accept"), result_fields, timer)
+        
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error(f"Text search error: {e}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
 @app.post("/search-by-product-id")
 async def search_by_product_id(
+    request: Request,
     product_id: str,
-    top_k: int = 10
+    top_k: int = 10,
+    collapse_duplicates: bool = True,
+    category: Optional[str] = None,
+    fields: Optional[str] = None,
+    priority: Optional[str] = None
 ):
     """
     Search for similar images using an existing product ID
@@ -262,14 +1258,31 @@ async def search_by_product_id(
         raise HTTPException(status_code=503, detail="Search service not available")
     
     try:
+        service = await get_service(category)
+        result_fields = parse_fields(fields)
+        accept = request.headers.get("accept")
+        lane, client = request_lane(request, priority)
+        
         # Find the product in our database
-        if product_id not in search_service.product_ids:
+        if product_id not in service.id_to_row:
             raise HTTPException(status_code=404, detail=f"Product ID {product_id} not found")
         
+        # Serve from the precomputed neighbor table when it covers this product
+        search_results = service.similar_from_graph(product_id, top_k, collapse_duplicates)
+        if search_results is not None:
+            return render({
+                "success": True,
+                "query_product_id": product_id,
+                "results": search_results["results"],
+                "total_found": search_results["total_found"],
+                "search_time": search_results["search_time"],
+                "source": "knn_graph"
+            }, accept, result_fields)
+        
         # Get the image path
         image_path = None
         for ext in ['.jpg', '.png']:
-            potential_path = os.path.join(search_service.images_dir, f"{product_id}{ext}")
+            potential_path = os.path.join(service.images_dir, f"{product_id}{ext}")
             if os.path.exists(potential_path):
                 image_path = potential_path
                 break
@@ -278,19 +1291,22 @@ async def search_by_product_id(
             raise HTTPException(status_code=404, detail=f"Image for product {product_id} not found")
         
         # Load and process the image
-        image = Image.open(image_path)
-        query_embedding = search_service.get_embedding(image)
+        image, _ = decode_image(image_path)
+        query_embedding = (await image_scheduler.submit(image, lane, client)).reshape(1, -1)
         
         # Search for similar images
-        search_results = search_service.search_similar_images(query_embedding, top_k)
+        search_results = await search_scheduler.submit(
+            lambda: service.search_similar_images(query_embedding, top_k, collapse_duplicates), lane, client
+        )
         
-        return {
+        return render({
             "success": True,
             "query_product_id": product_id,
             "results": search_results["results"],
             "total_found": search_results["total_found"],
-            "search_time": search_results["search_time"]
-        }
+            "search_time": search_results["search_time"],
+            "source": "index"
+        }, accept, result_fields)
         
     except HTTPException as he:
         raise he
@@ -298,8 +1314,377 @@ async def search_by_product_id(
         logger.error(f"Product search error: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.post("/search/compose")
+async def search_composed(
+    request: Request,
+    positive_ids: Optional[str] = None,
+    negative_ids: Optional[str] = None,
+    positive_images: Optional[List[UploadFile]] = File(None),
+    negative_images: Optional[List[UploadFile]] = File(None),
+    image_weights: Optional[str] = None,
+    negative_weight: float = NEGATIVE_WEIGHT,
+    exclude_ids: Optional[str] = None,
+    exclude_query_items: bool = True,
+    top_k: int = 10,
+    collapse_duplicates: bool = True,
+    attributes: Optional[str] = None,
+    category: Optional[str] = None,
+    fields: Optional[str] = None,
+    priority: Optional[str] = None
+):
+    """
+    "More like these, less like those": one search from a composed query vector
+
+    positive_ids / negative_ids take "id" or "id:weight" lists and use the
+    stored catalog vectors; uploads are encoded, with image_weights giving one
+    weight per upload (positives first). exclude_ids, plus the catalog query
+    items unless exclude_query_items=false, are removed inside the FAISS
+    search through its ID selector, so top_k stays full.
+    """
+    if not search_service:
+        raise HTTPException(status_code=503, detail="Search service not available")
+    
+    timer = StageTimer(stage_metrics)
+    try:
+        if top_k < 1 or top_k > 50:
+            raise HTTPException(status_code=400, detail="top_k must be between 1 and 50")
+        if negative_weight < 0:
+            raise HTTPException(status_code=400, detail="negative_weight must not be negative")
+        result_fields = parse_fields(fields)
+        lane, client = request_lane(request, priority)
+        service = await get_service(category)
+        
+        positive = parse_weighted_ids(positive_ids)
+        negative = parse_weighted_ids(negative_ids)
+        positive_images = positive_images or []
+        negative_images = negative_images or []
+        uploads = positive_images + negative_images
+        upload_weights = parse_weights(image_weights, len(uploads))
+        if not positive and not positive_images:
+            raise HTTPException(status_code=400, detail="At least one positive product id or image is required")
+        if len(positive) + len(negative) > MAX_COMPOSE_ITEMS or len(uploads) > MAX_COMPOSE_IMAGES:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_COMPOSE_ITEMS} product ids "
+                                                        f"and {MAX_COMPOSE_IMAGES} images per query")
+        unknown = [product_id for product_id, _ in positive + negative if product_id not in service.id_to_row]
+        if unknown:
+            raise HTTPException(status_code=404, detail=f"Product IDs not found: {unknown}")
+        
+        # Catalog items: stored vectors, no re-encoding
+        with timer.stage("lookup"):
+            query_rows = np.array([service.id_to_row[product_id] for product_id, _ in positive + negative],
+                                  dtype='int64')
+            catalog_vectors = service.primary_vectors(query_rows) if len(query_rows) else \
+                np.empty((0, service.dim), dtype='float32')
+        
+        # Uploads: decoded, then encoded together through the image lane
+        images = []
+        for upload in uploads:
+            if not upload.content_type.startswith("image/"):
+                raise HTTPException(status_code=400, detail=f"{upload.filename} must be an image")
+            with timer.stage("upload_read"):
+                contents = await read_upload_bounded(upload)
+            with timer.stage("decode"):
+                images.append(decode_image(contents)[0])
+        upload_vectors = np.empty((0, service.dim), dtype='float32')
+        if images:
+            with timer.stage("embed"):
+                upload_vectors = np.vstack(await asyncio.gather(
+                    *[image_scheduler.submit(image, lane, client) for image in images]
+                ))
+        
+        with timer.stage("compose"):
+            n_positive, n_positive_images = len(positive), len(positive_images)
+            query_embedding = compose_query(
+                np.vstack([catalog_vectors[:n_positive], upload_vectors[:n_positive_images]]),
+                np.array([weight for _, weight in positive] + upload_weights[:n_positive_images], dtype='float32'),
+                np.vstack([catalog_vectors[n_positive:], upload_vectors[n_positive_images:]]),
+                np.array([weight for _, weight in negative] + upload_weights[n_positive_images:], dtype='float32'),
+                negative_weight
+            )
+            
+            # Seen items (and their near-duplicates) are cleared in the row mask
+            seen_ids = [product_id.strip() for product_id in (exclude_ids or "").split(",")]
+            excluded = [service.id_to_row[product_id] for product_id in seen_ids if product_id in service.id_to_row]
+            if exclude_query_items:
+                excluded.extend(query_rows.tolist())
+            row_mask = service.attribute_mask(attributes)
+            if excluded:
+                if row_mask is None:
+                    row_mask = np.ones(service.index.ntotal, dtype=bool)
+                if service.duplicate_clusters is not None:
+                    row_mask &= ~np.isin(service.duplicate_clusters, service.duplicate_clusters[excluded])
+                else:
+                    row_mask[excluded] = False
+        
+        with timer.stage("search"):
+            search_results = await search_scheduler.submit(
+                lambda: service.search_similar_images(query_embedding, top_k, collapse_duplicates, row_mask, timer),
+                lane, client
+            )
+        
+        response = {
+            "success": True,
+            "query": {
+                "positive_ids": [product_id for product_id, _ in positive],
+                "negative_ids": [product_id for product_id, _ in negative],
+                "positive_images": n_positive_images,
+                "negative_images": len(negative_images),
+                "excluded": len(set(excluded))
+            },
+            "results": search_results["results"],
+            "total_found": search_results["total_found"],
+            "search_time": search_results["search_time"],
+            "processing_info": {
+                "device": search_service.device,
+                "stage_timings_ms": timer.as_ms()
+            }
+        }
+        return render(response, request.headers.get("accept"), result_fields, timer)
+        
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error(f"Compose search error: {e}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.post("/embed")
+async def embed_images(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    dtype: str = "float16",
+    priority: Optional[str] = None
+):
+    """
+    L2-normalized CLIP vectors for one or more images, through the same
+    batcher and embedding cache as /search
+
+    JSON responses carry one base64 vector per file; with
+    Accept: application/octet-stream the body is the raw row-major
+    little-endian (n, dim) matrix, shape in X-Embedding-Shape. Offline
+    callers should send priority=bulk.
+    """
+    if not search_service:
+        raise HTTPException(status_code=503, detail="Search service not available")
+    
+    timer = StageTimer(stage_metrics)
+    check_dtype(dtype)
+    if len(files) > MAX_EMBED_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_EMBED_BATCH} images per request")
+    lane, client = request_lane(request, priority)
+    
+    uploads = []
+    for upload in files:
+        if not upload.content_type.startswith("image/"):
+            raise HTTPException(status_code=400, detail=f"{upload.filename} must be an image")
+        with timer.stage("upload_read"):
+            uploads.append(await read_upload_bounded(upload))
+    
+    # Encoded concurrently so the scheduler batches them, under the client's batch
+    # allowance and never more at a time than that allowance has free
+    client = batch_client(client)
+    embedded = []
+    start = 0
+    while start < len(uploads):
+        step = max(1, image_scheduler.client_concurrency - image_scheduler.in_flight(client))
+        embedded.extend(await asyncio.gather(
+            *[embed_upload(contents, lane, client, timer) for contents in uploads[start:start + step]]
+        ))
+        start += step
+    vectors = np.vstack([vector for vector, _, _ in embedded])
+    stage_metrics.increment("embed_images", len(vectors))
+    
+    if OCTET_STREAM in (request.headers.get("accept") or ""):
+        return Response(content=encode_vectors(vectors, dtype), media_type=OCTET_STREAM, headers={
+            "X-Embedding-Shape": f"{vectors.shape[0]},{vectors.shape[1]}",
+            "X-Embedding-Dtype": dtype,
+            "X-Embedding-Model": CLIP_MODEL
+        })
+    return render({
+        "success": True,
+        "model": CLIP_MODEL,
+        "dim": vectors.shape[1],
+        "dtype": dtype,
+        "embeddings": [
+            {"filename": upload.filename, "vector": encode_base64(vector, dtype), "embedding_cache": cache_status}
+            for upload, vector, (_, _, cache_status) in zip(files, vectors, embedded)
+        ],
+        "processing_info": {"stage_timings_ms": timer.as_ms()}
+    }, request.headers.get("accept"), None, timer)
+
+@app.post("/sessions/{session_id}/events")
+async def record_session_event(session_id: str, product_id: str, event: str = "click",
+                               category: Optional[str] = None):
+    """
+    Record a click / like on a catalog product, folding its stored embedding
+    into the session's taste vector used by /search?session_id=
+    """
+    if not search_service:
+        raise HTTPException(status_code=503, detail="Search service not available")
+    if event not in EVENT_WEIGHTS:
+        raise HTTPException(status_code=400, detail=f"event must be one of {list(EVENT_WEIGHTS)}")
+    
+    service = await get_service(category)
+    row = service.id_to_row.get(product_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"Product ID {product_id} not found")
+    vector = service.primary_vectors(np.array([row]))[0]
+    events = await asyncio.get_running_loop().run_in_executor(
+        None, session_store.record, session_id, vector, EVENT_WEIGHTS[event]
+    )
+    stage_metrics.increment(f"session_{event}")
+    return {"success": True, "session_id": session_id, "event": event, "events": events}
+
+@app.delete("/sessions/{session_id}")
+async def reset_session(session_id: str):
+    """Forget a session's taste vector"""
+    session_store.reset(session_id)
+    return {"success": True, "session_id": session_id}
+
+@app.get("/style/{product_id}")
+async def complete_the_look(
+    request: Request,
+    product_id: str,
+    category: Optional[str] = None,
+    targets: Optional[str] = None,
+    per_category: int = 4,
+    fields: Optional[str] = None
+):
+    """
+    "Complete the look": complementary items from other categories
+
+    Looks up the product's style cluster and, in the precomputed style table,
+    the compatible clusters of each target category; those clusters' items are
+    ranked by compatibility x similarity to the product. No model calls.
+    """
+    if not search_service:
+        raise HTTPException(status_code=503, detail="Search service not available")
+    if not style_table.available:
+        raise HTTPException(status_code=404, detail="No style table; run scripts/build_style_tables.py")
+    if per_category < 1 or per_category > 20:
+        raise HTTPException(status_code=400, detail="per_category must be between 1 and 20")
+    
+    start_time = time.time()
+    result_fields = parse_fields(fields)
+    service = await get_service(category)
+    source = service.category
+    row = service.id_to_row.get(product_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"Product ID {product_id} not found")
+    if not service.style_clusters.available:
+        raise HTTPException(status_code=404, detail=f"No style clusters for {source}")
+    
+    target_names = style_table.targets.get(source, [])
+    if targets:
+        requested = [name.strip() for name in targets.split(",") if name.strip()]
+        unknown = [name for name in requested if name not in target_names]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"No style pairing from {source} to {unknown}; "
+                                                        f"available: {target_names}")
+        target_names = requested
+    
+    cluster = int(service.style_clusters.labels[row])
+    query_vector = service.primary_vectors(np.array([row]))[0]
+    results = []
+    for target in target_names:
+        target_service = await category_registry.get_async(target)
+        if not target_service.style_clusters.available:
+            continue
+        clusters, cluster_scores = style_table.complements(source, cluster, target, STYLE_CLUSTERS_PER_TARGET)
+        rows, positions = target_service.style_clusters.cluster_items(clusters)
+        similarities = target_service.primary_vectors(rows) @ query_vector
+        scores = cluster_scores[positions] * (1.0 + similarities) / 2.0
+        top = np.argsort(-scores)[:per_category]
+        target_results = target_service.format_results(similarities[top], rows[top])
+        for result, score, position in zip(target_results, scores[top], positions[top]):
+            result["style_score"] = float(score)
+            result["style_cluster"] = int(clusters[position])
+        results.extend(target_results)
+    
+    return render({
+        "success": True,
+        "query_product_id": product_id,
+        "category": source,
+        "style_cluster": cluster,
+        "targets": target_names,
+        "results": results,
+        "total_found": len(results),
+        "search_time": time.time() - start_time
+    }, request.headers.get("accept"), result_fields)
+
+async def browse_clusters_for(category: Optional[str]) -> Tuple[StylumiaImageSearch, BrowseClusters]:
+    """A category's service and its (refreshed) browse clusters, or 404 when not built"""
+    service = await get_service(category)
+    service.browse_clusters.refresh()
+    if not service.browse_clusters.available:
+        raise HTTPException(status_code=404, detail=f"No browse clusters for {service.category}; "
+                                                    f"run scripts/build_browse_clusters.py")
+    return service, service.browse_clusters
+
+@app.get("/clusters")
+async def list_clusters(request: Request, category: Optional[str] = None):
+    """
+    "Browse by look" groupings of a category, each with its size and medoid product
+    """
+    if not search_service:
+        raise HTTPException(status_code=503, detail="Search service not available")
+    
+    service, browse = await browse_clusters_for(category)
+    clusters, rows, scores = browse.medoids()
+    sizes = browse.sizes()
+    medoids = service.format_results(scores, rows)
+    return render({
+        "success": True,
+        "category": service.category,
+        "total_clusters": len(medoids),
+        "clusters": [
+            {"cluster_id": int(cluster), "size": int(sizes[cluster]), "medoid": medoid}
+            for cluster, medoid in zip(clusters, medoids)
+        ]
+    }, request.headers.get("accept"))
+
+@app.get("/clusters/{cluster_id}")
+async def get_cluster(
+    request: Request,
+    cluster_id: int,
+    page: int = 0,
+    page_size: int = 24,
+    category: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """
+    One page of a browse cluster's products, most typical first
+    """
+    if not search_service:
+        raise HTTPException(status_code=503, detail="Search service not available")
+    if page < 0:
+        raise HTTPException(status_code=400, detail="page must not be negative")
+    if page_size < 1 or page_size > 100:
+        raise HTTPException(status_code=400, detail="page_size must be between 1 and 100")
+    
+    result_fields = parse_fields(fields)
+    service, browse = await browse_clusters_for(category)
+    members = browse.page(cluster_id, page, page_size)
+    if members is None:
+        raise HTTPException(status_code=404, detail=f"Cluster {cluster_id} not found")
+    rows, scores = members
+    results = service.format_results(scores, rows)
+    size = int(browse.sizes()[cluster_id])
+    for result in results:
+        result["rank"] += page * page_size
+    return render({
+        "success": True,
+        "category": service.category,
+        "cluster_id": cluster_id,
+        "size": size,
+        "page": page,
+        "page_size": page_size,
+        "total_pages": -(-size // page_size),
+        "results": results,
+        "total_found": len(results)
+    }, request.headers.get("accept"), result_fields)
+
 @app.get("/product/{product_id}")
-async def get_product_info(product_id: str):
+async def get_product_info(product_id: str, category: Optional[str] = None):
     """
     Get information about a specific product
     """
@@ -307,32 +1692,157 @@ async def get_product_info(product_id: str):
         raise HTTPException(status_code=503, detail="Search service not available")
     
     try:
-        if product_id not in search_service.product_ids:
+        service = await get_service(category)
+        
+        if product_id not in service.id_to_row:
             raise HTTPException(status_code=404, detail=f"Product ID {product_id} not found")
         
         # Check for image files
         image_info = {}
         for ext in ['.jpg', '.png']:
-            image_path = os.path.join(search_service.images_dir, f"{product_id}{ext}")
+            image_path = os.path.join(service.images_dir, f"{product_id}{ext}")
             if os.path.exists(image_path):
                 image_info = {
                     "filename": f"{product_id}{ext}",
                     "path": image_path,
-                    "url": f"/images/{product_id}{ext}",
+                    "url": f"{service.image_url_prefix}/{product_id}{ext}",
                     "exists": True
                 }
                 break
         
         return {
             "product_id": product_id,
+            "category": service.category,
             "image": image_info,
-            "index_position": int(np.where(search_service.product_ids == product_id)[0][0])
+            "index_position": service.id_to_row[product_id]
         }
         
+    except HTTPException as he:
+        raise he
     except Exception as e:
         logger.error(f"Product info error: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.get("/thumbs/{size}/{product_id}")
+async def get_thumbnail(size: int, product_id: str, request: Request, v: Optional[str] = None,
+                        category: Optional[str] = None):
+    """
+    Serve a precomputed thumbnail with a strong ETag
+
+    Only URLs naming the current build version (v=, as in thumbnail_urls) are
+    cached as immutable; an older version redirects to the current URL.
+    """
+    if not search_service:
+        raise HTTPException(status_code=503, detail="Search service not available")
+    
+    service = await get_service(category)
+    service.thumbnails.refresh()
+    if not service.thumbnails.available:
+        raise HTTPException(status_code=404, detail="Thumbnails have not been built")
+    if size not in service.thumbnails.sizes:
+        raise HTTPException(status_code=404, detail=f"Thumbnail size must be one of {list(service.thumbnails.sizes)}")
+    
+    path = service.thumbnails.path(size, product_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Thumbnail for product {product_id} not found")
+    if v is not None and v != str(service.thumbnails.version):
+        # The old build's bytes are gone; never pin the new ones under the old URL
+        stage_metrics.increment("thumbnail_version_redirect")
+        return RedirectResponse(service.thumbnails.urls(product_id, category)[str(size)], status_code=302)
+    
+    etag = service.thumbnails.etag(path)
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL if v is not None else REVALIDATE_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        stage_metrics.increment("thumbnail_not_modified")
+        return Response(status_code=304, headers=headers)
+    stage_metrics.increment("thumbnail_served")
+    return FileResponse(path, media_type=service.thumbnails.media_type, headers=headers)
+
+@app.get("/proxy/images/{product_id}")
+async def get_proxied_image(product_id: str, category: Optional[str] = None):
+    """
+    Serve a product image from local files, or fetch its source URL through the disk cache
+    """
+    if not search_service:
+        raise HTTPException(status_code=503, detail="Search service not available")
+    
+    service = await get_service(category)
+    for ext, media_type in [('.jpg', 'image/jpeg'), ('.png', 'image/png')]:
+        local_path = os.path.join(service.images_dir, f"{product_id}{ext}")
+        if os.path.exists(local_path):
+            return FileResponse(local_path, media_type=media_type, headers={"X-Cache": "local"})
+    
+    source_url = service.image_sources.get(product_id)
+    if source_url is None:
+        raise HTTPException(status_code=404, detail=f"No image source for product {product_id}")
+    
+    path, media_type, cache_status = await image_proxy.fetch(source_url)
+    return FileResponse(path, media_type=media_type,
+                        headers={"Cache-Control": "public, max-age=86400", "X-Cache": cache_status})
+
+@app.get("/facets")
+async def get_facets(attributes: Optional[str] = None, category: Optional[str] = None):
+    """
+    Attribute facet counts over the catalog, optionally within an attribute filter
+    """
+    if not search_service:
+        raise HTTPException(status_code=503, detail="Search service not available")
+    
+    service = await get_service(category)
+    if not service.attribute_facets.available:
+        raise HTTPException(status_code=404, detail="Attribute facets have not been built")
+    
+    row_mask = service.attribute_mask(attributes)
+    return {
+        "category": service.category,
+        "facets": service.attribute_facets.counts(row_mask),
+        "total_products": int(row_mask.sum()) if row_mask is not None else len(service.product_ids)
+    }
+
+def check_admin(request: Request):
+    if not profiler.admin_token:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled (set STYLUMIA_ADMIN_TOKEN)")
+    if not profiler.is_admin(request.headers):
+        raise HTTPException(status_code=403, detail="Invalid or missing X-Admin-Token")
+
+@app.get("/admin/profiles")
+async def list_profiles(request: Request):
+    """
+    Stored request profiles, newest first
+    """
+    check_admin(request)
+    profiles = await asyncio.get_running_loop().run_in_executor(None, profiler.list)
+    return {"profiles": profiles, **profiler.stats()}
+
+@app.get("/admin/profiles/{profile_id}")
+async def download_profile(profile_id: str, request: Request):
+    """
+    Download one profile: a zip of meta.json, stacks.folded (flamegraph input)
+    and torch_trace.json (chrome://tracing) when torch.profiler was available
+    """
+    check_admin(request)
+    path = profiler.path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+    return FileResponse(path, media_type="application/zip", filename=f"profile-{profile_id}.zip")
+
+def cascade_stats() -> Optional[Dict[str, Any]]:
+    """Cascade settings for the default category and how often it escalates"""
+    if not search_service.cascade.available:
+        return None
+    counters = stage_metrics.summary()["counters"]
+    queries = counters.get("cascade_queries", 0)
+    escalations = counters.get("cascade_escalations", 0)
+    return {
+        "encoders": load_encoder_manifest(search_service.index_path),
+        "margin": search_service.cascade.margin,
+        "candidates": search_service.cascade.candidates,
+        "scheduler": search_service.cascade.scheduler.stats(),
+        "queries": queries,
+        "escalations": escalations,
+        "escalation_rate": escalations / queries if queries else None
+    }
+
 @app.get("/stats")
 async def get_stats():
     """
@@ -344,10 +1854,39 @@ async def get_stats():
     return {
         "total_products": len(search_service.product_ids),
         "device": search_service.device,
-        "clip_model": "ViT-B/32",
-        "index_type": "FAISS IndexFlatIP (Cosine Similarity)",
+        "clip_model": CLIP_MODEL,
+        "index_type": "FAISS IndexFlatIP (Cosine Similarity)" if search_service.search_mode != "two_stage"
+        else f"Two-stage ({search_service.index.kind} candidates + exact re-rank)",
+        "two_stage_report": search_service.two_stage_report(),
         "supported_formats": ["jpg", "png", "webp", "gif"],
-        "max_top_k": 50
+        "max_top_k": 50,
+        "knn_graph": {
+            "available": search_service.knn_graph.available,
+            "products": len(search_service.knn_graph),
+            "k": search_service.knn_graph.k
+        },
+        "duplicate_clusters": int((search_service.duplicate_counts > 0).sum())
+        if search_service.duplicate_counts is not None else None,
+        "max_upload_bytes": MAX_UPLOAD_BYTES,
+        "max_image_pixels": MAX_IMAGE_PIXELS,
+        "text_cache": text_cache.stats(),
+        "image_embedding_cache": image_embedding_cache.stats(),
+        "categories": category_registry.stats(),
+        "index_bundle": bundle_status(search_service.index_path),
+        "color_palettes": search_service.color_palettes.stats(),
+        "shared_resources": registry.stats(),
+        "shards": shard_coordinator.shard_urls if shard_coordinator else None,
+        "cascade": cascade_stats(),
+        "image_cache": image_proxy.cache.stats(),
+        "sessions": session_store.stats(),
+        "cursors": cursor_store.stats(),
+        "profiling": profiler.stats(),
+        "schedulers": {
+            "image_encode": image_scheduler.stats(),
+            "text_encode": text_scheduler.stats(),
+            "search": search_scheduler.stats()
+        },
+        "stage_metrics": stage_metrics.summary()
     }
 
 if __name__ == "__main__":
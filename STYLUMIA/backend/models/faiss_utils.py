@@ -1,19 +1,30 @@
 import faiss
 import numpy as np
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from index_bundle import check_loaded, validate_bundle
+from resource_registry import acquire_index
+
+# Resolved against this file, not the working directory
+INDEX_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "faiss_index")
 
 class FaissSearch:
-    def __init__(self):
+    def __init__(self, index_dir=INDEX_DIR):
+        self.index_dir = index_dir
         self.index = None
         self.product_ids = []
         self.load_index()
     
     def load_index(self):
-        index_path = "backend/faiss_index/cosine_index.faiss"
-        ids_path = "backend/faiss_index/product_ids.npy"
+        index_path = os.path.join(self.index_dir, "cosine_index.faiss")
+        ids_path = os.path.join(self.index_dir, "product_ids.npy")
         
         if os.path.exists(index_path) and os.path.exists(ids_path):
-            self.index = faiss.read_index(index_path)
+            manifest = validate_bundle(self.index_dir)
+            self.index = acquire_index(index_path)
+            check_loaded(manifest, self.index.d, self.index.ntotal, self.index_dir)
             self.product_ids = np.load(ids_path)
         else:
             raise FileNotFoundError("FAISS index files not found")
@@ -32,8 +43,11 @@ class FaissSearch:
         
         return results
 
-# Global instance
-faiss_search = FaissSearch()
+# Global instance, created on first search rather than at import
+faiss_search = None
 
 def search_similar_items(embedding, top_k=5):
+    global faiss_search
+    if faiss_search is None:
+        faiss_search = FaissSearch()
     return faiss_search.search(embedding, top_k)
\ No newline at end of file
@@ -0,0 +1,58 @@
+import logging
+import os
+import threading
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+BRAND_COLUMN = "brand"
+
+
+def read_product_csv(metadata_csv: Optional[str], columns: List[str]) -> Optional[pd.DataFrame]:
+    """Read selected columns of a product metadata CSV (utf-8, falling back to latin1)"""
+    if not metadata_csv or not os.path.exists(metadata_csv):
+        return None
+    try:
+        try:
+            return pd.read_csv(metadata_csv, usecols=columns, encoding='utf-8')
+        except UnicodeDecodeError:
+            return pd.read_csv(metadata_csv, usecols=columns, encoding='latin1')
+    except Exception as e:
+        logger.error(f"Error reading {columns} from {metadata_csv}: {e}")
+        return None
+
+
+class BrandCodes:
+    """Integer brand code per index row (-1 when unknown), loaded on first use"""
+
+    def __init__(self, metadata_csv: Optional[str], product_ids: np.ndarray):
+        self.metadata_csv = metadata_csv
+        self.product_ids = product_ids
+        self.brands = []
+        self._codes = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self) -> Optional[np.ndarray]:
+        df = read_product_csv(self.metadata_csv, ["product_id", BRAND_COLUMN])
+        if df is None:
+            return None
+        df = df.dropna().drop_duplicates("product_id")
+        codes, self.brands = pd.factorize(df[BRAND_COLUMN].astype(str).str.strip().str.lower())
+        by_product = pd.Series(codes, index=df["product_id"].astype(str))
+        row_codes = by_product.reindex(pd.Index(self.product_ids).astype(str)).fillna(-1).to_numpy('int32')
+        logger.info(f"Loaded brands for {int((row_codes >= 0).sum())}/{len(row_codes)} products "
+                    f"({len(self.brands)} brands)")
+        return row_codes
+
+    @property
+    def codes(self) -> Optional[np.ndarray]:
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._codes = self._load()
+                    self._loaded = True
+        return self._codes
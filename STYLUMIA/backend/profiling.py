@@ -0,0 +1,229 @@
+import io
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from collections import Counter
+from typing import Dict, List, Optional
+
+from image_proxy import DiskLRUCache
+
+logger = logging.getLogger(__name__)
+
+# Fraction of /search* requests profiled without being asked (0 disables sampling)
+PROFILE_SAMPLE_RATE = float(os.environ.get("STYLUMIA_PROFILE_SAMPLE_RATE", 0.0))
+PROFILE_DIR = os.environ.get("STYLUMIA_PROFILE_DIR", "profiles")
+PROFILE_MAX_BYTES = int(os.environ.get("STYLUMIA_PROFILE_MAX_BYTES", 256 * 1024 * 1024))
+PROFILE_INTERVAL_S = float(os.environ.get("STYLUMIA_PROFILE_INTERVAL_MS", 2.0)) / 1000.0
+# Admin endpoints and X-Profile requests need X-Admin-Token to match (unset disables both)
+ADMIN_TOKEN = os.environ.get("STYLUMIA_ADMIN_TOKEN")
+PROFILED_PATHS = ("/search",)
+
+# Innermost frames of threads that are parked rather than working
+IDLE_FRAMES = {("threading.py", "wait"), ("queue.py", "get"), ("selectors.py", "select"), ("thread.py", "_worker")}
+
+
+class StackSampler(threading.Thread):
+    """
+    Samples the Python stacks of every other thread at a fixed interval
+
+    Counts are kept per (thread, stack) in flamegraph "folded" form. Work in
+    C extensions (torch, FAISS, PIL) shows up under the Python frame that
+    called into it; parked threads are skipped.
+    """
+
+    def __init__(self, interval_s: float = PROFILE_INTERVAL_S):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval_s = interval_s
+        self.counts = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own = threading.get_ident()
+        while not self._stop_event.wait(self.interval_s):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self) -> str:
+        self._stop_event.set()
+        self.join()
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+_torch_profiler_error = None
+
+
+def _start_torch_profiler():
+    """A running torch.profiler session, or None when torch's profiler is unavailable"""
+    global _torch_profiler_error
+    if _torch_profiler_error is not None:
+        return None
+    try:
+        import torch
+        from torch.profiler import ProfilerActivity, profile
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+        profiler = profile(activities=activities)
+        profiler.start()
+        return profiler
+    except Exception as e:
+        _torch_profiler_error = str(e)
+        logger.warning(f"torch.profiler unavailable, capturing Python stacks only: {e}")
+        return None
+
+
+def _stop_torch_profiler(profiler) -> Optional[bytes]:
+    """Stop a torch.profiler session and return its Chrome trace JSON"""
+    try:
+        profiler.stop()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.json")
+            profiler.export_chrome_trace(path)
+            with open(path, "rb") as f:
+                return f.read()
+    except Exception as e:
+        logger.warning(f"Could not export torch.profiler trace: {e}")
+        return None
+
+
+class ProfileSession:
+    def __init__(self, reason: str, path: str, method: str):
+        self.reason = reason
+        self.path = path
+        self.method = method
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.sampler = StackSampler()
+        self.sampler.start()
+        self.torch_profiler = _start_torch_profiler()
+
+    def stop(self, status_code: int) -> bytes:
+        """Stop capturing and pack the profile as a zip of meta.json, stacks.folded and torch_trace.json"""
+        duration = time.perf_counter() - self._start
+        trace = _stop_torch_profiler(self.torch_profiler) if self.torch_profiler is not None else None
+        folded = self.sampler.stop()
+        meta = {
+            "reason": self.reason,
+            "method": self.method,
+            "path": self.path,
+            "status_code": status_code,
+            "started_at": self.started_at,
+            "duration_ms": round(duration * 1000.0, 3),
+            "samples": self.sampler.samples,
+            "interval_ms": self.sampler.interval_s * 1000.0,
+            "torch_trace": trace is not None
+        }
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("meta.json", json.dumps(meta, indent=2))
+            archive.writestr("stacks.folded", folded)
+            if trace is not None:
+                archive.writestr("torch_trace.json", trace)
+        return buffer.getvalue()
+
+
+class RequestProfiler:
+    """
+    On-demand per-request profiling into a size-bounded ring buffer of zip files
+
+    A request is profiled when an admin sends X-Profile: 1, or at random with
+    probability sample_rate on the /search endpoints. Stack sampling is
+    process-wide, so a concurrent request's work appears in the capture too;
+    only one request is profiled at a time and the rest run untouched.
+    """
+
+    def __init__(self, directory: str = PROFILE_DIR, max_bytes: int = PROFILE_MAX_BYTES,
+                 sample_rate: float = PROFILE_SAMPLE_RATE, admin_token: Optional[str] = ADMIN_TOKEN):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.sample_rate = sample_rate
+        self.admin_token = admin_token
+        self.captured = 0
+        self.skipped_busy = 0
+        self._active = threading.Lock()
+        self.store = DiskLRUCache(directory, max_bytes) if self.enabled else None
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or bool(self.admin_token)
+
+    def is_admin(self, headers) -> bool:
+        return bool(self.admin_token) and headers.get("x-admin-token") == self.admin_token
+
+    def reason(self, path: str, headers) -> Optional[str]:
+        """Why a request should be profiled ("requested" / "sampled"), or None"""
+        if headers.get("x-profile") and self.is_admin(headers):
+            return "requested"
+        if self.sample_rate > 0 and path.startswith(PROFILED_PATHS) and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    def start(self, reason: str, path: str, method: str) -> Optional[ProfileSession]:
+        """Begin profiling, or None if another request is already being profiled"""
+        if not self._active.acquire(blocking=False):
+            self.skipped_busy += 1
+            return None
+        try:
+            return ProfileSession(reason, path, method)
+        except Exception:
+            self._active.release()
+            raise
+
+    def finish(self, session: ProfileSession, status_code: int) -> str:
+        """Stop a session and store its profile; returns the profile id"""
+        try:
+            data = session.stop(status_code)
+        finally:
+            self._active.release()
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(session.started_at))}-{uuid.uuid4().hex[:8]}"
+        self.store.put(profile_id, data, ".zip")
+        self.captured += 1
+        logger.info(f"Stored profile {profile_id} ({session.reason} {session.method} {session.path}, "
+                    f"{len(data)} bytes)")
+        return profile_id
+
+    def path(self, profile_id: str) -> Optional[str]:
+        return self.store.get(profile_id)
+
+    def list(self) -> List[Dict[str, object]]:
+        """Metadata of the stored profiles, newest first"""
+        profiles = []
+        for profile_id, filename, size in self.store.entries():
+            try:
+                with zipfile.ZipFile(os.path.join(self.directory, filename)) as archive:
+                    meta = json.loads(archive.read("meta.json"))
+            except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+                continue
+            profiles.append({"profile_id": profile_id, "bytes": size, **meta})
+        return sorted(profiles, key=lambda profile: profile["started_at"], reverse=True)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "captured": self.captured,
+            "skipped_busy": self.skipped_busy,
+            "torch_profiler_error": _torch_profiler_error,
+            "store": self.store.stats() if self.store is not None else None
+        }
@@ -0,0 +1,62 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+
+# Scale of the negative centroid subtracted from the positive one
+NEGATIVE_WEIGHT = 0.5
+MAX_COMPOSE_ITEMS = 50
+# Uploads are encoded concurrently; keep them under the per-client scheduler limit
+MAX_COMPOSE_IMAGES = 4
+
+
+def parse_weighted_ids(ids: Optional[str]) -> List[Tuple[str, float]]:
+    """Parse "p1,p2:0.5,p3:2" into [(product_id, weight)] (weight defaults to 1)"""
+    items = []
+    if not ids:
+        return items
+    for term in ids.split(","):
+        product_id, sep, weight = term.strip().partition(":")
+        if not product_id:
+            continue
+        try:
+            value = float(weight) if sep else 1.0
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid weight in {term!r}")
+        if value <= 0:
+            raise HTTPException(status_code=400, detail=f"Weights must be positive: {term!r}")
+        items.append((product_id, value))
+    return items
+
+
+def parse_weights(weights: Optional[str], n: int) -> List[float]:
+    """Parse "1,0.5" into n positive weights (all 1 when not given)"""
+    if not weights:
+        return [1.0] * n
+    try:
+        values = [float(weight) for weight in weights.split(",")]
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid image weights: {weights!r}")
+    if len(values) != n:
+        raise HTTPException(status_code=400, detail=f"Expected {n} image weights, got {len(values)}")
+    if any(value <= 0 for value in values):
+        raise HTTPException(status_code=400, detail="Weights must be positive")
+    return values
+
+
+def compose_query(positive: np.ndarray, positive_weights: np.ndarray,
+                  negative: Optional[np.ndarray] = None, negative_weights: Optional[np.ndarray] = None,
+                  negative_weight: float = NEGATIVE_WEIGHT) -> np.ndarray:
+    """
+    Weighted positive centroid minus a scaled weighted negative centroid, L2 normalized
+
+    Returns:
+        (1, d) float32 query vector
+    """
+    query = (positive_weights / positive_weights.sum()) @ positive
+    if negative is not None and len(negative):
+        query = query - negative_weight * ((negative_weights / negative_weights.sum()) @ negative)
+    norm = np.linalg.norm(query)
+    if norm < 1e-6:
+        raise HTTPException(status_code=400, detail="Positive and negative items cancel out")
+    return (query / norm).astype('float32').reshape(1, -1)
@@ -0,0 +1,118 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import clip
+import faiss
+import torch
+
+logger = logging.getLogger(__name__)
+
+CLIP_MODEL = "ViT-B/32"
+DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+
+
+class ResourceRegistry:
+    """
+    Process-wide handles (CLIP models, FAISS indexes) shared by key
+
+    acquire() creates a resource on first use and counts references;
+    release() drops it once the last holder lets go. Each entry records its
+    approximate size so /stats can show where memory goes.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Hashable, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[Hashable, threading.Lock] = {}
+
+    def acquire(self, key: Hashable, factory: Callable[[], Any],
+                size_fn: Optional[Callable[[Any], int]] = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry["refs"] += 1
+                return entry["value"]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Load outside the registry lock so other keys stay available
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry["refs"] += 1
+                    return entry["value"]
+
+            start = time.time()
+            value = factory()
+            entry = {
+                "value": value,
+                "refs": 1,
+                "bytes": size_fn(value) if size_fn else 0,
+                "load_seconds": time.time() - start,
+            }
+            with self._lock:
+                self._entries[key] = entry
+            logger.info(f"Loaded shared resource {key} in {entry['load_seconds']:.2f}s")
+            return value
+
+    def release(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry["refs"] -= 1
+            if entry["refs"] <= 0:
+                del self._entries[key]
+                logger.info(f"Released shared resource {key}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = {
+                ":".join(str(part) for part in key) if isinstance(key, tuple) else str(key): {
+                    "refs": entry["refs"],
+                    "bytes": entry["bytes"],
+                    "load_seconds": round(entry["load_seconds"], 3),
+                }
+                for key, entry in self._entries.items()
+            }
+        return {"resources": entries, "total_bytes": sum(entry["bytes"] for entry in entries.values())}
+
+
+# Global instance
+registry = ResourceRegistry()
+
+
+def _model_bytes(loaded) -> int:
+    model, _ = loaded
+    return sum(p.numel() * p.element_size() for p in model.parameters())
+
+
+def clip_key(model_name: str, device: str):
+    return ("clip", model_name, device)
+
+
+def acquire_clip(model_name: str = CLIP_MODEL, device: str = DEVICE):
+    """Shared (model, preprocess) for a CLIP backbone; pair with release_clip()"""
+    return registry.acquire(clip_key(model_name, device),
+                            lambda: clip.load(model_name, device=device), _model_bytes)
+
+
+def release_clip(model_name: str = CLIP_MODEL, device: str = DEVICE):
+    registry.release(clip_key(model_name, device))
+
+
+def index_key(index_file: str):
+    return ("faiss", os.path.abspath(index_file))
+
+
+def acquire_index(index_file: str):
+    """Shared read-only FAISS index for a file; pair with release_index()"""
+    return registry.acquire(index_key(index_file), lambda: faiss.read_index(index_file),
+                            lambda _: os.path.getsize(index_file))
+
+
+def release_index(index_file: str):
+    registry.release(index_key(index_file))
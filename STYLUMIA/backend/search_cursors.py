@@ -0,0 +1,83 @@
+import os
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+
+from lru_cache import LRUCache
+
+# Results kept per paginated search, and how many searches / for how long
+CURSOR_CANDIDATES = int(os.environ.get("STYLUMIA_CURSOR_CANDIDATES", 500))
+MAX_CURSORS = int(os.environ.get("STYLUMIA_MAX_CURSORS", 2000))
+CURSOR_TTL_S = float(os.environ.get("STYLUMIA_CURSOR_TTL_S", 600))
+# Re-ranking scores carried over from the first page
+SCORE_FIELDS = ("keyword_score", "fused_score", "taste_similarity", "personalized_score")
+
+
+class CandidateList:
+    """
+    One search's ranked results reduced to arrays: category code, index row
+    and similarity per result, plus any re-ranking scores (NaN where absent)
+    """
+
+    def __init__(self, results: List[Dict[str, Any]], page_size: int):
+        self.page_size = page_size
+        self.categories = sorted({result["category"] for result in results})
+        codes = {category: code for code, category in enumerate(self.categories)}
+        self.codes = np.array([codes[result["category"]] for result in results], dtype='int16')
+        self.rows = np.array([result["id"] for result in results], dtype='int64')
+        self.similarities = np.array([result["similarity"] for result in results], dtype='float32')
+        self.scores = {
+            field: np.array([result.get(field, np.nan) for result in results], dtype='float32')
+            for field in SCORE_FIELDS if any(field in result for result in results)
+        }
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.rows.nbytes + self.similarities.nbytes + \
+            sum(scores.nbytes for scores in self.scores.values())
+
+
+class CursorStore:
+    """Candidate lists of paginated searches in a TTL-bounded LRU, addressed by opaque cursors"""
+
+    def __init__(self, max_cursors: int = MAX_CURSORS, ttl_s: float = CURSOR_TTL_S):
+        self.lists = LRUCache(max_cursors, ttl=ttl_s)
+        self.pages = 0
+
+    def create(self, results: List[Dict[str, Any]], page_size: int) -> Tuple[CandidateList, str]:
+        """Store a search's results; returns (candidates, list id)"""
+        candidates = CandidateList(results, page_size)
+        list_id = uuid.uuid4().hex
+        self.lists.put(list_id, candidates)
+        return candidates, list_id
+
+    def get(self, list_id: str) -> Optional[CandidateList]:
+        candidates = self.lists.get(list_id)
+        if candidates is not None:
+            self.pages += 1
+        return candidates
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.lists.stats(), "ttl_s": self.lists.ttl, "pages_served": self.pages}
+
+
+def encode_cursor(list_id: str, offset: int) -> str:
+    return f"{list_id}.{offset}"
+
+
+def next_cursor(list_id: str, candidates: CandidateList, offset: int) -> Optional[str]:
+    """Cursor of the page after the one starting at offset, or None on the last page"""
+    offset += candidates.page_size
+    return encode_cursor(list_id, offset) if offset < len(candidates) else None
+
+
+def parse_cursor(cursor: str) -> Tuple[str, int]:
+    list_id, _, offset = cursor.partition(".")
+    if not list_id or not offset.isdigit():
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor!r}")
+    return list_id, int(offset)
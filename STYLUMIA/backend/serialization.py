@@ -0,0 +1,83 @@
+import json
+import time
+from typing import Any, Dict, Optional, Set
+
+import numpy as np
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+from stage_metrics import StageTimer, stage_metrics
+
+try:
+    import orjson
+except ImportError:  # stdlib json fallback
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Fields a search result can carry; fields= projects results onto a subset
+RESULT_FIELDS = {
+    "id", "product_id", "category", "similarity", "rank", "image_url", "image_path",
+    "thumbnail_urls", "metadata", "duplicate_cluster", "duplicate_count", "attributes", "shard",
+    "keyword_score", "fused_score", "taste_similarity", "personalized_score", "cascade_similarity",
+    "style_score", "style_cluster",
+}
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Set[str]]:
+    """Parse "product_id,similarity,thumbnail_urls" into a field set (None keeps everything)"""
+    if not fields:
+        return None
+    selected = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = selected - RESULT_FIELDS
+    if unknown:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown result fields {sorted(unknown)}; valid fields: {sorted(RESULT_FIELDS)}")
+    return selected
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (np.ndarray, tuple, set)):
+        return list(obj.tolist() if isinstance(obj, np.ndarray) else obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+def render(content: Dict[str, Any], accept: Optional[str] = None,
+           fields: Optional[Set[str]] = None, timer: Optional[StageTimer] = None) -> Response:
+    """
+    Serialize a response body directly, skipping FastAPI's jsonable_encoder
+
+    Results are projected onto `fields` first. Callers sending
+    Accept: application/msgpack get msgpack; everyone else gets JSON (orjson
+    when installed). Time spent is recorded as serialize_<encoder>.
+    """
+    if fields is not None and "results" in content:
+        content["results"] = [{key: value for key, value in result.items() if key in fields}
+                              for result in content["results"]]
+
+    start = time.perf_counter()
+    if accept and any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES):
+        if msgpack is None:
+            raise HTTPException(status_code=406, detail="msgpack responses are not available on this server")
+        encoder, media_type = "msgpack", "application/msgpack"
+        body = msgpack.packb(content, default=_default, use_bin_type=True)
+    elif orjson is not None:
+        encoder, media_type = "orjson", "application/json"
+        body = orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    else:
+        encoder, media_type = "json", "application/json"
+        body = json.dumps(content, default=_default, separators=(",", ":")).encode("utf-8")
+    elapsed = time.perf_counter() - start
+
+    if timer is not None:
+        timer.add(f"serialize_{encoder}", elapsed)
+    else:
+        stage_metrics.record(f"serialize_{encoder}", elapsed)
+    return Response(content=body, media_type=media_type,
+                    headers={"Server-Timing": f"serialize;dur={elapsed * 1000.0:.3f}"})
@@ -0,0 +1,117 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+MAX_SESSIONS = int(os.environ.get("STYLUMIA_MAX_SESSIONS", 100000))
+SESSION_TTL_S = float(os.environ.get("STYLUMIA_SESSION_TTL_S", 1800))
+# Engagement older by one half-life counts half as much
+TASTE_HALF_LIFE_S = float(os.environ.get("STYLUMIA_TASTE_HALF_LIFE_S", 600))
+# Candidates over-fetched from the index before personalizing
+TASTE_CANDIDATES = int(os.environ.get("STYLUMIA_TASTE_CANDIDATES", 200))
+DEFAULT_TASTE_WEIGHT = 0.3
+EVENT_WEIGHTS = {"click": 1.0, "like": 3.0}
+# Cap on the decayed sum's length, well inside float16 range
+MAX_TASTE_NORM = 1000.0
+
+
+class SessionStore:
+    """
+    Per-session taste vectors: exponentially decayed sums of engaged products' embeddings
+
+    Each session holds one float16 vector plus its last update time and event
+    count, in a bounded LRU that drops sessions SESSION_TTL_S after their last
+    event. With a sqlite path, sessions are also written through to disk and
+    read back on a miss, so they survive restarts.
+    """
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, ttl_s: float = SESSION_TTL_S,
+                 half_life_s: float = TASTE_HALF_LIFE_S, db_path: Optional[str] = None):
+        self.ttl_s = ttl_s
+        self.half_life_s = half_life_s
+        self.sessions = LRUCache(max_sessions, ttl=ttl_s)
+        self.events = 0
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS sessions "
+                             "(session_id TEXT PRIMARY KEY, vector BLOB, updated_at REAL, events INTEGER)")
+            self._db.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - ttl_s,))
+            self._db.commit()
+
+    def _load(self, session_id: str) -> Optional[Tuple[np.ndarray, float, int]]:
+        """(float16 taste, updated_at, events) from memory, else from sqlite; caller holds the lock"""
+        state = self.sessions.get(session_id)
+        if state is not None or self._db is None:
+            return state
+        row = self._db.execute("SELECT vector, updated_at, events FROM sessions WHERE session_id = ?",
+                               (session_id,)).fetchone()
+        if row is None or row[1] < time.time() - self.ttl_s:
+            return None
+        state = (np.frombuffer(row[0], dtype='float16').copy(), row[1], row[2])
+        self.sessions.put(session_id, state)
+        return state
+
+    def record(self, session_id: str, vector: np.ndarray, weight: float = 1.0) -> int:
+        """Fold one engaged product's embedding into the session's taste; returns the event count"""
+        now = time.time()
+        with self._lock:
+            state = self._load(session_id)
+            if state is None or state[0].shape[0] != vector.shape[0]:
+                taste, events = weight * vector, 1
+            else:
+                previous, updated_at, events = state
+                decay = 0.5 ** ((now - updated_at) / self.half_life_s)
+                taste, events = decay * previous.astype('float32') + weight * vector, events + 1
+            norm = float(np.linalg.norm(taste))
+            if norm > MAX_TASTE_NORM:
+                taste = taste * (MAX_TASTE_NORM / norm)
+            taste = taste.astype('float16')
+            self.sessions.put(session_id, (taste, now, events))
+            self.events += 1
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+                                 (session_id, taste.tobytes(), now, events))
+                self._db.commit()
+        return events
+
+    def taste(self, session_id: str) -> Optional[np.ndarray]:
+        """Unit-length float32 taste vector, or None for unknown / expired sessions"""
+        state = self.sessions.get(session_id)
+        if state is None and self._db is not None:
+            with self._lock:
+                state = self._load(session_id)
+        if state is None:
+            return None
+        taste = state[0].astype('float32')
+        return taste / max(float(np.linalg.norm(taste)), 1e-6)
+
+    def reset(self, session_id: str):
+        with self._lock:
+            self.sessions.pop(session_id)
+            if self._db is not None:
+                self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+                self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            **self.sessions.stats(),
+            "events": self.events,
+            "ttl_s": self.ttl_s,
+            "half_life_s": self.half_life_s,
+            "persistent": self._db is not None
+        }
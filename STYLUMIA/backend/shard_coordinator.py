@@ -0,0 +1,131 @@
+import asyncio
+import glob
+import heapq
+import logging
+import os
+import subprocess
+import sys
+import time
+from itertools import islice
+from typing import Any, Dict, List, Tuple
+
+import httpx
+import numpy as np
+
+from shard_worker import encode_vector
+from stage_metrics import stage_metrics
+
+logger = logging.getLogger(__name__)
+
+SHARD_TIMEOUT_MS = float(os.environ.get("STYLUMIA_SHARD_TIMEOUT_MS", 250))
+
+
+class ShardCoordinator:
+    """
+    Scatter a query vector to all shard workers and gather a merged top-k
+
+    Each shard gets its own timeout; shards that time out or fail are
+    reported and the merge proceeds with whatever responded.
+    """
+
+    def __init__(self, shard_urls: List[str], timeout_ms: float = SHARD_TIMEOUT_MS):
+        self.shard_urls = [url.rstrip("/") for url in shard_urls]
+        self.timeout = timeout_ms / 1000.0
+        self._client = None
+        self._loop = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Pooled keep-alive connections to every shard, bound to the running loop
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._loop = loop
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(max_keepalive_connections=4 * len(self.shard_urls)),
+                timeout=self.timeout,
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _query_shard(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(self.client.post(f"{url}/search", json=payload), self.timeout)
+            response.raise_for_status()
+            return response.json()
+        finally:
+            stage_metrics.record("shard_request", time.perf_counter() - start)
+
+    async def search(self, query_embedding: np.ndarray, top_k: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Return (merged results, shard report) for one query vector"""
+        payload = {"vector": encode_vector(query_embedding.reshape(-1)), "top_k": top_k}
+        responses = await asyncio.gather(
+            *(self._query_shard(url, payload) for url in self.shard_urls), return_exceptions=True
+        )
+
+        per_shard, failed = [], []
+        for shard, (url, response) in enumerate(zip(self.shard_urls, responses)):
+            if isinstance(response, BaseException):
+                reason = "timeout" if isinstance(response, (asyncio.TimeoutError, httpx.TimeoutException)) \
+                    else str(response) or type(response).__name__
+                failed.append({"shard": shard, "url": url, "error": reason})
+                stage_metrics.increment("shard_failures")
+                continue
+            per_shard.append([
+                (score, product_id, shard)
+                for product_id, score in zip(response["product_ids"], response["scores"])
+            ])
+
+        # Each shard's list is already sorted by score: k-way heap merge
+        merged = islice(heapq.merge(*per_shard, key=lambda hit: hit[0], reverse=True), top_k)
+        results = [
+            {"product_id": product_id, "similarity": float(score), "rank": rank, "shard": shard}
+            for rank, (score, product_id, shard) in enumerate(merged, 1)
+        ]
+        report = {
+            "total": len(self.shard_urls),
+            "responded": len(self.shard_urls) - len(failed),
+            "failed": failed,
+            "partial": bool(failed),
+        }
+        if failed:
+            stage_metrics.increment("shard_partial_results")
+        return results, report
+
+
+def launch_local_shards(shards_dir: str, base_port: int = 8101) -> Tuple[List[str], List[subprocess.Popen]]:
+    """Start one shard_worker process per shard_* directory on localhost"""
+    worker = os.path.join(os.path.dirname(os.path.abspath(__file__)), "shard_worker.py")
+    shard_dirs = sorted(glob.glob(os.path.join(shards_dir, "shard_*")),
+                        key=lambda path: int(path.rsplit("_", 1)[-1]))
+    urls, processes = [], []
+    for offset, shard_dir in enumerate(shard_dirs):
+        port = base_port + offset
+        processes.append(subprocess.Popen([
+            sys.executable, worker, "--index-dir", shard_dir, "--host", "127.0.0.1", "--port", str(port)
+        ]))
+        urls.append(f"http://127.0.0.1:{port}")
+    logger.info(f"Launched {len(processes)} local shard workers from {shards_dir}")
+    return urls, processes
+
+
+def wait_for_shards(urls: List[str], timeout_s: float = 60.0):
+    """Block until every shard answers /health (or the timeout passes)"""
+    deadline = time.time() + timeout_s
+    pending = list(urls)
+    with httpx.Client(timeout=1.0) as client:
+        while pending and time.time() < deadline:
+            for url in list(pending):
+                try:
+                    if client.get(f"{url}/health").status_code == 200:
+                        pending.remove(url)
+                except httpx.HTTPError:
+                    pass
+            if pending:
+                time.sleep(0.2)
+    if pending:
+        logger.warning(f"Shards not ready after {timeout_s}s: {pending}")
@@ -0,0 +1,79 @@
+"""
+Shard worker: serves top-k search over one index shard (see scripts/build_shards.py)
+
+    python shard_worker.py --index-dir faiss_shards/shard_0 --port 8101
+"""
+import argparse
+import base64
+import logging
+import os
+
+import faiss
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+from index_bundle import check_loaded, validate_bundle
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ShardQuery(BaseModel):
+    vector: str  # base64 float32, row-major
+    top_k: int = 10
+
+
+def encode_vector(vector: np.ndarray) -> str:
+    return base64.b64encode(np.ascontiguousarray(vector, dtype='float32').tobytes()).decode("ascii")
+
+
+def decode_vector(data: str, dim: int) -> np.ndarray:
+    vector = np.frombuffer(base64.b64decode(data), dtype='float32')
+    if vector.size != dim:
+        raise HTTPException(status_code=400, detail=f"Expected a {dim}-d vector, got {vector.size}")
+    return vector.reshape(1, dim).copy()
+
+
+def create_shard_app(index_dir: str) -> FastAPI:
+    index_file = os.path.join(index_dir, "cosine_index.faiss")
+    ids_file = os.path.join(index_dir, "product_ids.npy")
+    if not os.path.exists(index_file) or not os.path.exists(ids_file):
+        raise FileNotFoundError(f"Required index files not found in {index_dir}")
+
+    manifest = validate_bundle(index_dir)
+    index = faiss.read_index(index_file)
+    check_loaded(manifest, index.d, index.ntotal, index_dir)
+    product_ids = np.load(ids_file)
+    shard_name = os.path.basename(os.path.normpath(index_dir))
+    logger.info(f"Shard {shard_name}: loaded {index.ntotal} products")
+
+    app = FastAPI(title=f"Stylumia shard {shard_name}")
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy", "shard": shard_name, "total_products": int(index.ntotal)}
+
+    @app.post("/search")
+    def search(query: ShardQuery):
+        vector = decode_vector(query.vector, index.d)
+        faiss.normalize_L2(vector)
+        scores, indices = index.search(vector, min(query.top_k, index.ntotal))
+        valid = indices[0] >= 0
+        return {
+            "shard": shard_name,
+            "product_ids": [str(pid) for pid in product_ids[indices[0][valid]]],
+            "scores": scores[0][valid].tolist()
+        }
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve one index shard over HTTP")
+    parser.add_argument("--index-dir", required=True)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8101)
+    args = parser.parse_args()
+    uvicorn.run(create_shard_app(args.index_dir), host=args.host, port=args.port, log_level="warning")
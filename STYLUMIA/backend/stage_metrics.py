@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Dict
+
+
+class StageMetrics:
+    """Rolling per-stage latency samples and counters, exposed via /stats"""
+
+    def __init__(self, window: int = 1024):
+        self.window = window
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+        self._counters = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float):
+        """Record one duration sample for a stage"""
+        with self._lock:
+            self._samples[stage].append(seconds)
+
+    def increment(self, counter: str, value: int = 1):
+        """Increment a named counter"""
+        with self._lock:
+            self._counters[counter] += value
+
+    def summary(self) -> Dict[str, Dict]:
+        """Latency percentiles (ms) per stage plus raw counters"""
+        with self._lock:
+            samples = {stage: sorted(values) for stage, values in self._samples.items()}
+            counters = dict(self._counters)
+
+        stages = {}
+        for stage, values in samples.items():
+            if not values:
+                continue
+            n = len(values)
+            stages[stage] = {
+                "count": n,
+                "mean_ms": sum(values) / n * 1000.0,
+                "p50_ms": values[int(0.50 * (n - 1))] * 1000.0,
+                "p95_ms": values[int(0.95 * (n - 1))] * 1000.0,
+                "p99_ms": values[int(0.99 * (n - 1))] * 1000.0,
+            }
+        return {"stages": stages, "counters": counters}
+
+
+class StageTimer:
+    """Per-request stage timings that also feed the process-wide StageMetrics"""
+
+    def __init__(self, metrics: StageMetrics):
+        self.metrics = metrics
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float):
+        """Add an externally measured duration to this request's timings"""
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+        self.metrics.record(name, seconds)
+
+    def as_ms(self) -> Dict[str, float]:
+        return {name: round(seconds * 1000.0, 3) for name, seconds in self.timings.items()}
+
+
+# Global instance
+stage_metrics = StageMetrics()
@@ -0,0 +1,102 @@
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from index_bundle import row_fingerprint_mismatch
+
+logger = logging.getLogger(__name__)
+
+STYLE_CLUSTERS_FILE = "style_clusters.npy"
+STYLE_CLUSTER_ITEMS_FILE = "style_cluster_items.npy"
+STYLE_FINGERPRINT_FILE = "style_clusters.json"
+STYLE_TABLE_FILE = os.environ.get("STYLUMIA_STYLE_TABLE", "style_table.npz")
+
+
+def table_key(source: str, target: str) -> str:
+    return f"{source}__{target}"
+
+
+class StyleClusters:
+    """
+    One category's style k-means (see scripts/build_style_tables.py)
+
+    labels holds the cluster of every index row; items[c] holds the rows
+    nearest cluster c's centroid (-1 padded). Both are only used while their
+    row fingerprint matches product_ids.
+    """
+
+    def __init__(self, index_path: str, product_ids: np.ndarray):
+        n = len(product_ids)
+        self.labels = None
+        self.items = None
+        labels_file = os.path.join(index_path, STYLE_CLUSTERS_FILE)
+        items_file = os.path.join(index_path, STYLE_CLUSTER_ITEMS_FILE)
+        if not os.path.exists(labels_file) or not os.path.exists(items_file):
+            return
+        try:
+            mismatch = row_fingerprint_mismatch(os.path.join(index_path, STYLE_FINGERPRINT_FILE), product_ids)
+            if mismatch:
+                logger.warning(f"Ignoring {labels_file} ({mismatch}); re-run build_style_tables.py")
+                return
+            labels = np.load(labels_file, mmap_mode="r")
+            if len(labels) != n:
+                logger.warning(f"Ignoring {labels_file}: {len(labels)} rows, index has {n}; re-run build_style_tables.py")
+                return
+            self.labels = labels
+            self.items = np.load(items_file)
+            logger.info(f"Loaded style clusters: {n} products -> {self.items.shape[0]} clusters")
+        except Exception as e:
+            logger.error(f"Error loading style clusters: {e}")
+            self.labels = None
+
+    @property
+    def available(self) -> bool:
+        return self.labels is not None
+
+    def cluster_items(self, clusters: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, position of each row's cluster in `clusters`) for the given clusters"""
+        items = self.items[clusters]
+        valid = items >= 0
+        positions = np.broadcast_to(np.arange(len(clusters))[:, None], items.shape)
+        return items[valid].astype('int64'), positions[valid]
+
+
+class StyleTable:
+    """
+    Cross-category cluster compatibility: for each (source, target) category
+    pair, the best target clusters and scores of every source cluster
+    """
+
+    def __init__(self, path: str = STYLE_TABLE_FILE):
+        self.path = path
+        self.clusters: Dict[str, np.ndarray] = {}
+        self.scores: Dict[str, np.ndarray] = {}
+        self.targets: Dict[str, List[str]] = {}
+        if not os.path.exists(path):
+            return
+        try:
+            with np.load(path) as data:
+                for name in data.files:
+                    key, _, kind = name.rpartition("/")
+                    (self.clusters if kind == "clusters" else self.scores)[key] = data[name]
+            for key in self.clusters:
+                source, _, target = key.partition("__")
+                self.targets.setdefault(source, []).append(target)
+            logger.info(f"Loaded style table with {len(self.clusters)} category pairs from {path}")
+        except Exception as e:
+            logger.error(f"Error loading style table {path}: {e}")
+            self.clusters, self.scores, self.targets = {}, {}, {}
+
+    @property
+    def available(self) -> bool:
+        return bool(self.clusters)
+
+    def complements(self, source: str, cluster: int, target: str,
+                    limit: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Compatible target-category clusters and scores for one source cluster, best first"""
+        key = table_key(source, target)
+        clusters, scores = self.clusters[key][cluster], self.scores[key][cluster]
+        valid = clusters >= 0
+        return clusters[valid][:limit], scores[valid][:limit]
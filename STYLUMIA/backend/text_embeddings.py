@@ -0,0 +1,60 @@
+import logging
+import os
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+TEXT_CACHE_SIZE = int(os.environ.get("STYLUMIA_TEXT_CACHE_SIZE", 10000))
+
+
+def normalize_query(text: str) -> str:
+    """Cache key for a text query: lowercase with collapsed whitespace"""
+    return " ".join(text.lower().split())
+
+
+class TextEmbeddingCache:
+    """
+    Normalized CLIP text vectors keyed on the normalized query string
+
+    Warm-set entries (see scripts/build_text_warmset.py) are pinned and never
+    evicted; everything else lives in a bounded LRU.
+    """
+
+    def __init__(self, maxsize: int = TEXT_CACHE_SIZE):
+        self.warm: Dict[str, np.ndarray] = {}
+        self.lru = LRUCache(maxsize)
+
+    def get(self, key: str) -> Tuple[Optional[np.ndarray], str]:
+        """Return (vector, source) where source is 'warm', 'hit' or 'miss'"""
+        vector = self.warm.get(key)
+        if vector is not None:
+            return vector, "warm"
+        vector = self.lru.get(key)
+        return vector, "hit" if vector is not None else "miss"
+
+    def put(self, key: str, vector: np.ndarray):
+        # Copied: a row view of a micro-batch result would keep the whole batch alive
+        self.lru.put(key, np.array(vector, dtype='float32'))
+
+    def load_warm_set(self, path: str, model_name: str, dim: int):
+        """Pin precomputed vectors for popular queries; skip mismatched files"""
+        if not os.path.exists(path):
+            return
+        try:
+            with np.load(path) as data:
+                if str(data["model"]) != model_name or data["vectors"].shape[1] != dim:
+                    logger.warning(f"Ignoring text warm set {path}: built for {data['model']}")
+                    return
+                vectors = data["vectors"].astype('float32')
+                for query, vector in zip(data["queries"], vectors):
+                    self.warm[normalize_query(str(query))] = vector
+            logger.info(f"Loaded {len(self.warm)} warm text queries")
+        except Exception as e:
+            logger.error(f"Error loading text warm set: {e}")
+
+    def stats(self):
+        return {"warm": len(self.warm), **self.lru.stats()}
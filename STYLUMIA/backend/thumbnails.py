@@ -0,0 +1,96 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, Optional
+
+from lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZES = (128, 256, 512)
+THUMBNAIL_MEDIA_TYPES = {"webp": "image/webp", "jpg": "image/jpeg"}
+THUMBNAILS_MANIFEST = "thumbnails.json"
+# Thumbnail URLs carry the build version, so a given URL never changes content
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Unversioned requests may see a later build: revalidate with the ETag every time
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches a strong ETag"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+class ThumbnailStore:
+    """
+    Precomputed thumbnails (see scripts/build_thumbnails.py)
+
+    Layout is <thumbs_dir>/<size>/<product_id>.<ext> plus thumbnails.json
+    with the sizes, format and build version. The manifest is re-read when
+    a rebuild rewrites it, so the version always names the files on disk.
+    """
+
+    def __init__(self, thumbs_dir: Optional[str]):
+        self.thumbs_dir = thumbs_dir
+        self.available = False
+        self.sizes = ()
+        self.ext = None
+        self.version = None
+        # (path, mtime_ns, size) -> strong ETag
+        self._etags = LRUCache(maxsize=65536)
+        self._manifest_file = os.path.join(thumbs_dir, THUMBNAILS_MANIFEST) if thumbs_dir else None
+        self._mtime = None
+        self.refresh()
+
+    def refresh(self):
+        """Re-read thumbnails.json if it was (re)written since the last load"""
+        if not self._manifest_file or not os.path.exists(self._manifest_file):
+            return
+        mtime = os.path.getmtime(self._manifest_file)
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self._manifest_file) as f:
+                manifest = json.load(f)
+            self.sizes = tuple(manifest["sizes"])
+            self.ext = manifest["format"]
+            self.version = manifest["version"]
+            self.available = True
+            self._mtime = mtime
+            logger.info(f"Thumbnails: {manifest.get('count', '?')} products at {self.sizes} ({self.ext}), "
+                        f"version {self.version}")
+        except Exception as e:
+            logger.error(f"Error loading thumbnail manifest: {e}")
+
+    @property
+    def media_type(self) -> str:
+        return THUMBNAIL_MEDIA_TYPES[self.ext]
+
+    def path(self, size: int, product_id: str) -> Optional[str]:
+        """Thumbnail file for a product, or None if it was not generated"""
+        if not self.available or size not in self.sizes or os.sep in product_id or "/" in product_id:
+            return None
+        path = os.path.join(self.thumbs_dir, str(size), f"{product_id}.{self.ext}")
+        return path if os.path.exists(path) else None
+
+    def urls(self, product_id: str, category: Optional[str] = None) -> Optional[Dict[str, str]]:
+        """{size: url} for a product; the builder writes every size, so one check suffices"""
+        if self.path(self.sizes[0] if self.sizes else 0, product_id) is None:
+            return None
+        query = f"v={self.version}" + (f"&category={category}" if category else "")
+        return {str(size): f"/thumbs/{size}/{product_id}?{query}" for size in self.sizes}
+
+    def etag(self, path: str) -> str:
+        """Strong ETag (content hash), cached per file version"""
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        etag = self._etags.get(key)
+        if etag is None:
+            with open(path, "rb") as f:
+                etag = f'"{hashlib.sha1(f.read()).hexdigest()}"'
+            self._etags.put(key, etag)
+        return etag
@@ -0,0 +1,127 @@
+import logging
+import os
+import time
+from typing import Optional, Tuple
+
+import faiss
+import numpy as np
+
+from stage_metrics import StageTimer, stage_metrics
+
+logger = logging.getLogger(__name__)
+
+RERANK_CANDIDATES = int(os.environ.get("STYLUMIA_RERANK_CANDIDATES", 200))
+# Larger requests (pagination, MMR pools) re-rank at least this many candidates per result
+RERANK_FACTOR = int(os.environ.get("STYLUMIA_RERANK_FACTOR", 4))
+IVF_NPROBE = int(os.environ.get("STYLUMIA_IVF_NPROBE", 16))
+
+CANDIDATE_IVFPQ_FILE = "candidate_index.faiss"
+CANDIDATE_BINARY_FILE = "candidate_index.bin"
+EMBEDDINGS_FILE = "embeddings.npy"
+
+
+class TwoStageIndex:
+    """
+    Compressed candidate search plus exact re-rank (see scripts/build_two_stage.py)
+
+    Stage 1 queries a compact IVF-PQ or binary sign-hash index for the top
+    max(rerank_candidates, top_k * RERANK_FACTOR) rows within the row mask.
+    Stage 2 re-scores those rows exactly against the full-precision vectors,
+    read from a memory-mapped embeddings.npy by row id, and keeps the top_k.
+    """
+
+    def __init__(self, index_path: str, rerank_candidates: int = RERANK_CANDIDATES,
+                 nprobe: int = IVF_NPROBE):
+        self.rerank_candidates = rerank_candidates
+        self.nprobe = nprobe
+
+        ivfpq_file = os.path.join(index_path, CANDIDATE_IVFPQ_FILE)
+        binary_file = os.path.join(index_path, CANDIDATE_BINARY_FILE)
+        embeddings_file = os.path.join(index_path, EMBEDDINGS_FILE)
+        if not os.path.exists(embeddings_file):
+            raise FileNotFoundError(f"Two-stage embeddings not found: {embeddings_file}")
+
+        if os.path.exists(ivfpq_file):
+            self.kind = "ivfpq"
+            self.candidates = faiss.read_index(ivfpq_file)
+            self.file_size = os.path.getsize(ivfpq_file)
+        elif os.path.exists(binary_file):
+            self.kind = "binary"
+            self.candidates = faiss.read_index_binary(binary_file)
+            self.file_size = os.path.getsize(binary_file)
+        else:
+            raise FileNotFoundError(f"No candidate index found in {index_path}")
+
+        self.embeddings = np.load(embeddings_file, mmap_mode="r")
+        self.ntotal, self.d = self.embeddings.shape
+        if self.candidates.ntotal != self.ntotal:
+            raise ValueError(f"Candidate index has {self.candidates.ntotal} vectors, "
+                             f"embeddings have {self.ntotal}")
+        logger.info(f"Two-stage index: {self.kind} candidates ({self.file_size} bytes) "
+                    f"+ mmapped {self.ntotal}x{self.d} embeddings")
+
+    def _binary_candidate_rows(self, query: np.ndarray, n_candidates: int,
+                               mask: Optional[np.ndarray]) -> np.ndarray:
+        """
+        Hamming top rows within mask: faiss-cpu 1.7 binary indexes take no ID
+        selector, so over-fetch by the mask's density until enough survive
+        """
+        codes = np.packbits(query > 0, axis=1)
+        if mask is None:
+            _, rows = self.candidates.search(codes, n_candidates)
+            return rows[0][rows[0] >= 0]
+        allowed = int(np.count_nonzero(mask))
+        if allowed == 0:
+            return np.empty(0, dtype='int64')
+        n_candidates = min(n_candidates, allowed)
+        k = min(self.ntotal, int(np.ceil(n_candidates * self.ntotal / allowed * 1.2)))
+        while True:
+            _, rows = self.candidates.search(codes, k)
+            rows = rows[0][rows[0] >= 0]
+            rows = rows[mask[rows]]
+            if len(rows) >= n_candidates or k >= self.ntotal:
+                return rows[:n_candidates]
+            k = min(self.ntotal, k * 2)
+
+    def _candidate_rows(self, query: np.ndarray, top_k: int, mask: Optional[np.ndarray]) -> np.ndarray:
+        n_candidates = min(max(self.rerank_candidates, top_k * RERANK_FACTOR), self.ntotal)
+        if self.kind == "binary":
+            return self._binary_candidate_rows(query, n_candidates, mask)
+        if mask is not None:
+            bitmap = np.packbits(mask, bitorder='little')
+            params = faiss.SearchParametersIVF(
+                nprobe=self.nprobe, sel=faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bitmap))
+            )
+        else:
+            params = faiss.SearchParametersIVF(nprobe=self.nprobe)
+        _, rows = self.candidates.search(query, n_candidates, params=params)
+        rows = rows[0]
+        return rows[rows >= 0]
+
+    def search(self, query: np.ndarray, top_k: int, mask: Optional[np.ndarray] = None,
+               timer: Optional[StageTimer] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """FAISS-style (similarities, indices) of shape [1, top_k], padded with -1"""
+        start = time.perf_counter()
+        rows = self._candidate_rows(query, top_k, mask)
+        candidates_done = time.perf_counter()
+
+        # Sorted row ids keep the mmap reads sequential
+        rows = np.sort(rows)
+        scores = np.asarray(self.embeddings[rows], dtype='float32') @ query[0]
+        k = min(top_k, len(rows))
+        similarities = np.full((1, top_k), -np.inf, dtype='float32')
+        indices = np.full((1, top_k), -1, dtype='int64')
+        if k > 0:
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            similarities[0, :k] = scores[top]
+            indices[0, :k] = rows[top]
+        rerank_done = time.perf_counter()
+
+        for name, seconds in (("candidate_search", candidates_done - start),
+                              ("rerank", rerank_done - candidates_done)):
+            if timer is not None:
+                timer.add(name, seconds)
+            else:
+                stage_metrics.record(name, seconds)
+        return similarities, indices
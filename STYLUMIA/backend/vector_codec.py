@@ -0,0 +1,60 @@
+import base64
+import hashlib
+import os
+
+import numpy as np
+from fastapi import HTTPException
+
+# Image query vectors cached by upload content, shared by /search and /embed
+IMAGE_EMBEDDING_CACHE_SIZE = int(os.environ.get("STYLUMIA_IMAGE_EMBEDDING_CACHE_SIZE", 10000))
+MAX_EMBED_BATCH = int(os.environ.get("STYLUMIA_MAX_EMBED_BATCH", 32))
+VECTOR_DTYPES = {"float16": "<f2", "float32": "<f4"}
+OCTET_STREAM = "application/octet-stream"
+
+
+def content_key(contents: bytes) -> str:
+    return hashlib.sha1(contents).hexdigest()
+
+
+def check_dtype(dtype: str) -> str:
+    if dtype not in VECTOR_DTYPES:
+        raise HTTPException(status_code=400, detail=f"dtype must be one of {list(VECTOR_DTYPES)}")
+    return VECTOR_DTYPES[dtype]
+
+
+def encode_vectors(vectors: np.ndarray, dtype: str = "float16") -> bytes:
+    """Row-major little-endian bytes of an (n, d) matrix"""
+    return np.ascontiguousarray(vectors, dtype=check_dtype(dtype)).tobytes()
+
+
+def encode_base64(vector: np.ndarray, dtype: str = "float16") -> str:
+    return base64.b64encode(encode_vectors(vector, dtype)).decode("ascii")
+
+
+def parse_vector(text: str, dim: int) -> np.ndarray:
+    """
+    Query vector from base64 float16 / float32 (told apart by length, as
+    returned by /embed) or comma-separated floats
+
+    Returns:
+        (1, dim) float32, L2 normalized
+    """
+    text = text.strip()
+    try:
+        if "," in text:
+            vector = np.array([float(value) for value in text.split(",")], dtype='float32')
+        else:
+            raw = base64.b64decode(text, validate=True)
+            dtypes = {dim * 2: "<f2", dim * 4: "<f4"}
+            if len(raw) not in dtypes:
+                raise HTTPException(status_code=400, detail=f"vector must hold {dim} float16 or float32 values, "
+                                                            f"got {len(raw)} bytes")
+            vector = np.frombuffer(raw, dtype=dtypes[len(raw)]).astype('float32')
+    except ValueError:  # includes binascii.Error
+        raise HTTPException(status_code=400, detail="vector must be base64 or comma-separated floats")
+    if vector.shape[0] != dim:
+        raise HTTPException(status_code=400, detail=f"vector has {vector.shape[0]} dimensions, expected {dim}")
+    norm = float(np.linalg.norm(vector))
+    if not np.isfinite(norm) or norm < 1e-6:
+        raise HTTPException(status_code=400, detail="vector must be finite and non-zero")
+    return (vector / norm).reshape(1, -1)
@@ -0,0 +1,72 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+STYLUMIA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(STYLUMIA_DIR, "backend"))
+from lexical_index import LexicalIndex, tokenize
+
+BRANDS = ["zara", "h&m", "mango", "only", "vero moda", "forever 21", "biba", "w", "libas", "aurelia"]
+WORDS = ["linen", "cotton", "floral", "maxi", "midi", "mini", "a-line", "bodycon", "wrap", "shirt",
+         "printed", "solid", "striped", "ruffled", "tiered", "fit", "flare", "women", "dress", "party",
+         "casual", "black", "red", "blue", "green", "white", "pink", "yellow", "satin", "georgette"]
+
+
+def _synthetic_catalog(path, n, seed=0):
+    rng = np.random.default_rng(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("product_id,product_name,brand\n")
+        for i in range(n):
+            name = " ".join(rng.choice(WORDS, size=rng.integers(4, 10)))
+            f.write(f"{i},{name},{BRANDS[rng.integers(len(BRANDS))]}\n")
+    return np.arange(n).astype(str)
+
+
+def _time(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000.0
+
+
+def benchmark_lexical(metadata_csv=None, index_dir=None, n=20000, repeat=1000):
+    """Time building the keyword index and answering 1-3 term queries"""
+    if metadata_csv:
+        product_ids = np.load(os.path.join(index_dir, "product_ids.npy"))
+    else:
+        metadata_csv = os.path.join(tempfile.mkdtemp(), "catalog.csv")
+        product_ids = _synthetic_catalog(metadata_csv, n)
+
+    start = time.perf_counter()
+    index = LexicalIndex(metadata_csv, product_ids)
+    print(f"build: {time.perf_counter() - start:.2f}s for {len(product_ids)} products, "
+          f"{len(index.vocabulary)} terms, {index.nbytes / 1024:.0f} KiB")
+    if not index.available:
+        print("No product text indexed")
+        return
+
+    # Query with the most frequent terms: the longest posting lists
+    doc_freqs = np.diff(index.offsets)
+    terms = sorted(index.vocabulary, key=lambda term: -doc_freqs[index.vocabulary[term]])
+    mask = np.ones(len(product_ids), dtype=bool)
+    for query in (terms[0], f"{terms[0]} {terms[1]}", f"{terms[0]} {terms[1]} {terms[2]}", "zara linen"):
+        matches = len(index.search(query)[0])
+        search_ms = _time(lambda: index.search(query, mask, 200), repeat)
+        mask_ms = _time(lambda: index.match_mask(query, len(product_ids)), repeat)
+        print(f"{query!r:32s} {len(tokenize(query))} terms {matches:7d} matches  "
+              f"search {search_ms:.3f} ms  match_mask {mask_ms:.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the BM25 keyword index")
+    parser.add_argument("--metadata-csv", help="product CSV with product_id, product_name and brand")
+    parser.add_argument("--index-dir", default=os.path.join(STYLUMIA_DIR, "faiss_index"),
+                        help="index dir with product_ids.npy (used with --metadata-csv)")
+    parser.add_argument("--products", type=int, default=20000, help="synthetic catalog size without --metadata-csv")
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+    benchmark_lexical(args.metadata_csv, args.index_dir, args.products, args.repeat)
@@ -0,0 +1,63 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+STYLUMIA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(STYLUMIA_DIR, "backend"))
+from fastapi.encoders import jsonable_encoder
+from serialization import render
+
+
+def _sample_response(top_k):
+    results = [{
+        "id": i,
+        "product_id": f"{100000 + i}",
+        "category": "dresses",
+        "similarity": 0.9 - i * 0.001,
+        "rank": i + 1,
+        "image_url": f"/images/{100000 + i}.jpg",
+        "image_path": f"/data/images_dressees/{100000 + i}.jpg",
+        "thumbnail_urls": {size: f"/thumbs/{size}/{100000 + i}?v=1&category=dresses" for size in ("128", "256", "512")},
+        "metadata": {"filename": f"{100000 + i}.jpg", "exists": True},
+        "attributes": {"color": "red", "pattern": "floral", "sleeve": "short", "neckline": "v-neck"},
+    } for i in range(top_k)]
+    return {"success": True, "results": results, "total_found": top_k, "search_time": 0.01,
+            "processing_info": {"device": "cpu", "embedding_shape": (1, 512), "stage_timings_ms": {"search": 1.0}}}
+
+
+def _time(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000.0
+
+
+def benchmark_serialization(top_k=50, repeat=500):
+    """Compare FastAPI's default encoder path with the direct serializers in serialization.py"""
+    content = _sample_response(top_k)
+    lean = {"product_id", "similarity", "thumbnail_urls"}
+    timings = {
+        "jsonable_encoder+json": _time(lambda: json.dumps(jsonable_encoder(content)).encode("utf-8"), repeat),
+        "orjson": _time(lambda: render(dict(content)), repeat),
+        "orjson fields=lean": _time(lambda: render(dict(content), fields=lean), repeat),
+        "msgpack": _time(lambda: render(dict(content), accept="application/msgpack"), repeat),
+    }
+    sizes = {
+        "jsonable_encoder+json": len(json.dumps(jsonable_encoder(content))),
+        "orjson": len(render(dict(content)).body),
+        "orjson fields=lean": len(render(dict(content), fields=lean).body),
+        "msgpack": len(render(dict(content), accept="application/msgpack").body),
+    }
+    baseline = timings["jsonable_encoder+json"]
+    for name, ms in timings.items():
+        print(f"{name:24s} {ms:8.3f} ms  {baseline / ms:6.1f}x  {sizes[name]:7d} bytes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark search response serialization")
+    parser.add_argument("--top-k", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+    benchmark_serialization(args.top_k, args.repeat)
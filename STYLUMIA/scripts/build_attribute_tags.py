@@ -0,0 +1,106 @@
+import argparse
+import json
+import numpy as np
+import os
+import sys
+import time
+
+STYLUMIA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(STYLUMIA_DIR)
+sys.path.append(os.path.join(STYLUMIA_DIR, "backend"))
+from scripts.clip_embeddings import get_text_embeddings
+from scripts.index_io import load_index, index_vectors
+from index_bundle import write_row_fingerprint
+from attribute_facets import ATTRIBUTE_FINGERPRINT_FILE
+
+ATTRIBUTE_CODES_FILE = "attribute_codes.npy"
+ATTRIBUTE_VOCABULARY_FILE = "attribute_vocabulary.json"
+UNKNOWN_CODE = 255
+
+# CLIP's learned logit scale, used to turn cosine similarities into probabilities
+CLIP_LOGIT_SCALE = 100.0
+
+DEFAULT_VOCABULARY = {
+    "color": {
+        "template": "a photo of a {} dress",
+        "values": ["black", "white", "red", "blue", "navy", "green", "yellow", "pink",
+                   "purple", "orange", "brown", "beige", "grey", "gold", "silver", "multicolor"]
+    },
+    "pattern": {
+        "template": "a photo of a {} dress",
+        "values": ["solid", "floral", "striped", "polka dot", "checked", "animal print",
+                   "geometric print", "embroidered", "sequined"]
+    },
+    "sleeve": {
+        "template": "a photo of a {} dress",
+        "values": ["sleeveless", "short sleeve", "long sleeve", "three-quarter sleeve",
+                   "puff sleeve", "off-shoulder", "cap sleeve"]
+    },
+    "neckline": {
+        "template": "a photo of a dress with a {}",
+        "values": ["v-neck", "round neck", "square neck", "halter neck", "sweetheart neckline",
+                   "high neck", "collar", "boat neck"]
+    }
+}
+
+
+def build_attribute_tags(index_dir="faiss_index", vocabulary=None, min_probability=0.25):
+    """
+    Tag every catalog product with zero-shot attribute values
+
+    Encodes all attribute prompts once, scores the whole catalog against them
+    in a single matmul and keeps the best value per facet as a uint8 code
+    (255 = no value above min_probability). Writes attribute_codes.npy
+    (products x facets) and attribute_vocabulary.json next to product_ids.npy,
+    plus attribute_codes.json recording which product_ids the rows belong to.
+    """
+    vocabulary = vocabulary or DEFAULT_VOCABULARY
+    start_time = time.time()
+
+    index, product_ids = load_index(index_dir)
+    vectors = index_vectors(index)
+
+    facets = list(vocabulary)
+    prompts, spans = [], []
+    for facet in facets:
+        values = vocabulary[facet]["values"]
+        if len(values) >= UNKNOWN_CODE:
+            raise ValueError(f"Facet {facet} has too many values for uint8 codes")
+        spans.append((len(prompts), len(prompts) + len(values)))
+        prompts.extend(vocabulary[facet]["template"].format(value) for value in values)
+
+    prompt_vectors = get_text_embeddings(prompts)
+    sims = vectors @ prompt_vectors.T
+
+    codes = np.full((len(vectors), len(facets)), UNKNOWN_CODE, dtype='uint8')
+    for f, (lo, hi) in enumerate(spans):
+        logits = CLIP_LOGIT_SCALE * sims[:, lo:hi]
+        probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+        probs /= probs.sum(axis=1, keepdims=True)
+        best = probs.argmax(axis=1)
+        confident = probs[np.arange(len(best)), best] >= min_probability
+        codes[confident, f] = best[confident]
+
+    np.save(os.path.join(index_dir, ATTRIBUTE_CODES_FILE), codes)
+    with open(os.path.join(index_dir, ATTRIBUTE_VOCABULARY_FILE), "w", encoding="utf-8") as f:
+        json.dump({"facets": {facet: vocabulary[facet]["values"] for facet in facets},
+                   "min_probability": min_probability}, f, indent=2)
+    # Written last: the server only trusts the codes once the fingerprint matches
+    write_row_fingerprint(os.path.join(index_dir, ATTRIBUTE_FINGERPRINT_FILE), product_ids)
+
+    print(f"Tagged {len(vectors)} products with {len(facets)} facets "
+          f"({len(prompts)} prompts) in {time.time() - start_time:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Zero-shot attribute tagging of the catalog")
+    parser.add_argument("--index-dir", default="faiss_index")
+    parser.add_argument("--vocabulary", help="JSON file: {facet: {template, values}}")
+    parser.add_argument("--min-probability", type=float, default=0.25)
+    args = parser.parse_args()
+
+    vocabulary = None
+    if args.vocabulary:
+        with open(args.vocabulary, encoding="utf-8") as f:
+            vocabulary = json.load(f)
+    build_attribute_tags(args.index_dir, vocabulary, args.min_probability)
@@ -0,0 +1,126 @@
+import argparse
+import faiss
+import numpy as np
+import os
+import sys
+import time
+
+STYLUMIA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(STYLUMIA_DIR)
+sys.path.append(os.path.join(STYLUMIA_DIR, "backend"))
+from scripts.index_io import load_index, index_vectors
+from index_bundle import row_fingerprint_mismatch, write_row_fingerprint
+from browse_clusters import (BROWSE_CENTROIDS_FILE, BROWSE_FINGERPRINT_FILE, BROWSE_LABELS_FILE,
+                             BROWSE_MEMBERS_FILE, BROWSE_OFFSETS_FILE, BROWSE_SCORES_FILE)
+
+
+def _save_atomic(path, array):
+    tmp_path = path + ".tmp.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+
+def _assign(vectors, centroids, block_size=4096):
+    """Nearest centroid per row (blocked so the score matrix stays small)"""
+    labels = np.empty(len(vectors), dtype='int32')
+    for start in range(0, len(vectors), block_size):
+        labels[start:start + block_size] = np.argmax(vectors[start:start + block_size] @ centroids.T, axis=1)
+    return labels
+
+
+def _member_centroids(vectors, labels, centroids):
+    """Normalized mean of each cluster's current members (empty clusters keep their centroid)"""
+    sums = np.zeros_like(centroids, dtype='float64')
+    np.add.at(sums, labels, vectors)
+    norms = np.linalg.norm(sums, axis=1)
+    updated = centroids.astype('float32').copy()
+    nonempty = norms > 0
+    updated[nonempty] = (sums[nonempty] / norms[nonempty, None]).astype('float32')
+    return updated
+
+
+def build_browse_clusters(index_dir="faiss_index", clusters=50, niter=25, seed=0, incremental=False):
+    """
+    Precompute "browse by look" clusters over a category's stored embeddings
+
+    Runs spherical FAISS k-means and stores each product's cluster id, the
+    normalized mean of every cluster's members as its centroid, and the
+    members sorted by similarity to that mean, with offsets per cluster.
+    With unit vectors the member closest to the normalized mean also
+    maximizes summed similarity to the rest of the cluster, so each
+    cluster's first member is its (cosine) medoid.
+
+    With incremental=True, rows appended to the index since the last build
+    are assigned to the nearest existing centroid and the centroids and
+    medoids are recomputed from the members; nothing is reclustered. Labels
+    index into product_ids.npy, so browse_clusters.json records a fingerprint
+    of the ids they were built for, and a mismatch (e.g. after build_faiss.py
+    re-listed the images) reclusters from scratch.
+    """
+    start_time = time.time()
+    index, product_ids = load_index(index_dir)
+    vectors = index_vectors(index)
+    n = len(vectors)
+
+    centroids_path = os.path.join(index_dir, BROWSE_CENTROIDS_FILE)
+    labels_path = os.path.join(index_dir, BROWSE_LABELS_FILE)
+    fingerprint_path = os.path.join(index_dir, BROWSE_FINGERPRINT_FILE)
+
+    labels = None
+    mode = "Built"
+    if incremental and os.path.exists(centroids_path) and os.path.exists(labels_path):
+        mismatch = row_fingerprint_mismatch(fingerprint_path, product_ids)
+        centroids = np.load(centroids_path)
+        old_labels = np.load(labels_path)
+        if mismatch or centroids.shape[1] != vectors.shape[1] or len(old_labels) > n:
+            print(f"Existing clusters do not match index ({mismatch or 'dimension or row count'}), "
+                  f"reclustering from scratch")
+        elif len(old_labels) == n:
+            print("Browse clusters already up to date")
+            return
+        else:
+            labels = np.concatenate([old_labels, _assign(vectors[len(old_labels):], centroids)])
+            mode = "Updated"
+            print(f"Assigned {n - len(old_labels)} new products to {len(centroids)} existing clusters")
+
+    if labels is None:
+        k = min(clusters, n)
+        kmeans = faiss.Kmeans(vectors.shape[1], k, niter=niter, spherical=True, seed=seed)
+        kmeans.train(vectors)
+        centroids = kmeans.centroids.copy()
+        faiss.normalize_L2(centroids)
+        labels = _assign(vectors, centroids)
+
+    # Score members against the mean of who is actually in each cluster, not the
+    # k-means (or previous build's) centroid, so the first member is the medoid
+    centroids = _member_centroids(vectors, labels, centroids)
+
+    # Group rows by cluster, most typical first
+    scores = np.einsum('ij,ij->i', vectors, centroids[labels])
+    members = np.lexsort((-scores, labels)).astype('int32')
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=len(centroids)))]).astype('int64')
+
+    _save_atomic(centroids_path, centroids.astype('float32'))
+    _save_atomic(labels_path, labels)
+    _save_atomic(os.path.join(index_dir, BROWSE_MEMBERS_FILE), members)
+    _save_atomic(os.path.join(index_dir, BROWSE_SCORES_FILE), scores[members].astype('float16'))
+    _save_atomic(os.path.join(index_dir, BROWSE_OFFSETS_FILE), offsets)
+    # Written last: the server only trusts the clusters once the fingerprint matches
+    write_row_fingerprint(fingerprint_path, product_ids, clusters=len(centroids))
+
+    sizes = np.diff(offsets)
+    print(f"{mode} {len(centroids)} browse clusters for {n} products (sizes {sizes.min()}-{sizes.max()}) "
+          f"in {time.time() - start_time:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute k-means 'browse by look' clusters")
+    parser.add_argument("--index-dir", default="faiss_index")
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--niter", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--incremental", action="store_true",
+                        help="Assign rows appended to the index since the last build to existing centroids "
+                             "(reclusters if product_ids.npy no longer matches)")
+    args = parser.parse_args()
+    build_browse_clusters(args.index_dir, args.clusters, args.niter, args.seed, args.incremental)
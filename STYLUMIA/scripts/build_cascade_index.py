@@ -0,0 +1,105 @@
+import argparse
+import clip
+import faiss
+import json
+import numpy as np
+import os
+import sys
+import time
+import torch
+from PIL import Image
+
+STYLUMIA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(STYLUMIA_DIR)
+sys.path.append(os.path.join(STYLUMIA_DIR, "backend"))
+from scripts.index_io import load_index
+from index_bundle import write_row_fingerprint
+from cascade import CASCADE_FINGERPRINT_FILE, ENCODERS_DIR, ENCODERS_FILE, encoder_dir_name
+
+PRIMARY_MODEL = "ViT-B/32"
+
+
+def _find_image(images_dir, product_id):
+    for ext in ('.jpg', '.png'):
+        path = os.path.join(images_dir, f"{product_id}{ext}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def build_cascade_index(images_dir, index_dir="faiss_index", model_name="RN50", batch_size=64):
+    """
+    Embed the catalog with a cheaper CLIP backbone for first-pass retrieval
+
+    Writes encoders/<model>/cosine_index.faiss with ids equal to the rows of
+    product_ids.npy (so results map onto the primary index), a fingerprint
+    of those product_ids next to it, and records both model tags in
+    encoders.json.
+    """
+    if model_name not in clip.available_models():
+        raise ValueError(f"Unknown CLIP model {model_name}; available: {clip.available_models()}")
+
+    start_time = time.time()
+    primary, product_ids = load_index(index_dir)
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model, preprocess = clip.load(model_name, device=device)
+
+    rows, paths = [], []
+    for row, product_id in enumerate(product_ids):
+        path = _find_image(images_dir, product_id)
+        if path is not None:
+            rows.append(row)
+            paths.append(path)
+    missing = len(product_ids) - len(rows)
+    if not rows:
+        raise ValueError(f"No catalog images found in {images_dir}")
+
+    embeddings = []
+    for start in range(0, len(paths), batch_size):
+        images = [preprocess(Image.open(path).convert('RGB')) for path in paths[start:start + batch_size]]
+        with torch.no_grad():
+            batch = model.encode_image(torch.stack(images).to(device))
+        embeddings.append(batch.cpu().numpy().astype('float32'))
+        print(f"Encoded {min(start + batch_size, len(paths))}/{len(paths)} images")
+
+    embeddings = np.vstack(embeddings)
+    faiss.normalize_L2(embeddings)
+    index = faiss.IndexIDMap2(faiss.IndexFlatIP(embeddings.shape[1]))
+    index.add_with_ids(embeddings, np.array(rows, dtype='int64'))
+
+    relative_dir = os.path.join(ENCODERS_DIR, encoder_dir_name(model_name))
+    output_dir = os.path.join(index_dir, relative_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    faiss.write_index(index, os.path.join(output_dir, "cosine_index.faiss"))
+    write_row_fingerprint(os.path.join(output_dir, CASCADE_FINGERPRINT_FILE), product_ids)
+
+    manifest_file = os.path.join(index_dir, ENCODERS_FILE)
+    manifest = {}
+    if os.path.exists(manifest_file):
+        with open(manifest_file) as f:
+            manifest = json.load(f)
+    manifest.setdefault("primary", {"model": PRIMARY_MODEL, "path": ".", "dim": primary.d,
+                                    "num_embeddings": int(primary.ntotal)})
+    manifest["cascade"] = {
+        "model": model_name,
+        "path": relative_dir,
+        "dim": int(embeddings.shape[1]),
+        "num_embeddings": len(rows),
+        "missing_images": missing,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+    with open(manifest_file, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    print(f"Built {model_name} cascade index for {len(rows)} products "
+          f"({missing} without images) in {time.time() - start_time:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index the catalog under a cheap first-pass CLIP encoder")
+    parser.add_argument("--images-dir", required=True)
+    parser.add_argument("--index-dir", default="faiss_index")
+    parser.add_argument("--model", default="RN50", help="CLIP backbone, see check_clip.py")
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+    build_cascade_index(args.images_dir, args.index_dir, args.model, args.batch_size)
@@ -0,0 +1,150 @@
+import argparse
+import numpy as np
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+STYLUMIA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(STYLUMIA_DIR)
+sys.path.append(os.path.join(STYLUMIA_DIR, "backend"))
+from index_bundle import write_row_fingerprint
+from color_palette import (COLOR_FINGERPRINT_FILE, COLOR_PALETTES_FILE, COLOR_WEIGHTS_FILE, lab_to_uint8,
+                           rgb_to_lab)
+
+# Pixels this close (CIE76) to the median border color are treated as studio background
+BACKGROUND_DISTANCE = 12.0
+
+
+def _save_atomic(path, array):
+    tmp_path = path + ".tmp.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+
+def _find_image(images_dir, product_id):
+    for ext in ('.jpg', '.png'):
+        path = os.path.join(images_dir, f"{product_id}{ext}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _load_pixels(path, size):
+    """size x size RGB pixels (aspect ratio ignored), or None for a missing / unreadable image"""
+    if path is None:
+        return None
+    try:
+        with Image.open(path) as image:
+            image.draft("RGB", (size * 2, size * 2))
+            return np.asarray(image.convert("RGB").resize((size, size), Image.Resampling.BILINEAR))
+    except Exception as e:
+        print(f"Skipping {path}: {e}")
+        return None
+
+
+def _foreground_weights(pixels, size):
+    """(B, P) 0/1 weights dropping pixels close to each image's median border color"""
+    grid = pixels.reshape(len(pixels), size, size, 3)
+    border = np.concatenate([grid[:, 0], grid[:, -1], grid[:, 1:-1, 0], grid[:, 1:-1, -1]], axis=1)
+    background = np.median(border, axis=1)
+    weights = (np.square(pixels - background[:, None]).sum(axis=2) > BACKGROUND_DISTANCE ** 2).astype('float32')
+    # Products filling the frame (or matching the backdrop) keep every pixel
+    weights[weights.mean(axis=1) < 0.1] = 1.0
+    return weights
+
+
+def _kmeans_palettes(pixels, weights, k, iterations):
+    """
+    Weighted k-means over a batch of images at once
+
+    pixels (B, P, 3) Lab, weights (B, P). Farthest-first initialization, then
+    Lloyd iterations as (B, P, k) array ops. Returns (B, k, 3) centers and
+    (B, k) pixel shares, largest share first.
+    """
+    batch = np.arange(len(pixels))
+    mean = (weights[..., None] * pixels).sum(axis=1) / weights.sum(axis=1)[:, None]
+    distances = np.where(weights > 0, np.square(pixels - mean[:, None]).sum(axis=2), np.inf)
+    centers = np.empty((len(pixels), k, 3), dtype='float32')
+    centers[:, 0] = pixels[batch, distances.argmin(axis=1)]
+    nearest = np.square(pixels - centers[:, 0, None]).sum(axis=2)
+    for j in range(1, k):
+        centers[:, j] = pixels[batch, np.where(weights > 0, nearest, -1.0).argmax(axis=1)]
+        nearest = np.minimum(nearest, np.square(pixels - centers[:, j, None]).sum(axis=2))
+
+    # Nearest center by |c|^2 - 2 x.c (|x|^2 is constant per pixel); batched matmuls throughout
+    for step in range(iterations + 1):
+        scores = np.square(centers).sum(axis=2)[:, None] - 2.0 * np.matmul(pixels, centers.transpose(0, 2, 1))
+        labels = scores.argmin(axis=2)
+        assignment = (labels[..., None] == np.arange(k)).astype('float32')
+        assignment *= weights[..., None]
+        counts = assignment.sum(axis=1)
+        if step == iterations:
+            break
+        sums = np.matmul(assignment.transpose(0, 2, 1), pixels)
+        centers = np.where(counts[..., None] > 0, sums / np.maximum(counts, 1e-9)[..., None], centers)
+
+    shares = counts / counts.sum(axis=1, keepdims=True)
+    order = np.argsort(-shares, axis=1)
+    return np.take_along_axis(centers, order[..., None], axis=1), np.take_along_axis(shares, order, axis=1)
+
+
+def build_color_palettes(images_dir, index_dir="faiss_index", colors=5, size=32, iterations=10,
+                         batch_size=256, keep_background=False, workers=8):
+    """
+    Extract a dominant-color palette for every catalog image
+
+    Each image is downsampled to size x size, converted to Lab and clustered
+    into `colors` colors; a batch of images is clustered together with
+    vectorized k-means. Writes color_palettes.npy ((n, colors, 3) uint8
+    OpenCV 8-bit Lab) and color_weights.npy ((n, colors) uint8 pixel share
+    * 255, all zero for products without an image) next to product_ids.npy,
+    plus color_palettes.json recording which product_ids the rows belong to.
+    """
+    start_time = time.time()
+    product_ids = np.load(os.path.join(index_dir, "product_ids.npy"))
+    n = len(product_ids)
+    palettes = np.zeros((n, colors, 3), dtype='uint8')
+    weights = np.zeros((n, colors), dtype='uint8')
+    paths = [_find_image(images_dir, product_id) for product_id in product_ids]
+
+    missing = 0
+    with ThreadPoolExecutor(workers) as pool:
+        for start in range(0, n, batch_size):
+            loaded = list(pool.map(lambda path: _load_pixels(path, size), paths[start:start + batch_size]))
+            rows = np.array([start + i for i, pixels in enumerate(loaded) if pixels is not None], dtype='int64')
+            missing += len(loaded) - len(rows)
+            if not len(rows):
+                continue
+            pixels = rgb_to_lab(np.stack([pixels for pixels in loaded if pixels is not None])
+                                .reshape(len(rows), size * size, 3))
+            pixel_weights = np.ones(pixels.shape[:2], dtype='float32') if keep_background else \
+                _foreground_weights(pixels, size)
+            centers, shares = _kmeans_palettes(pixels, pixel_weights, colors, iterations)
+            palettes[rows] = lab_to_uint8(centers)
+            weights[rows] = np.rint(shares * 255.0).astype('uint8')
+            print(f"Palettes: {min(start + batch_size, n)}/{n}")
+
+    _save_atomic(os.path.join(index_dir, COLOR_PALETTES_FILE), palettes)
+    _save_atomic(os.path.join(index_dir, COLOR_WEIGHTS_FILE), weights)
+    # Written last: the server only trusts the palettes once the fingerprint matches
+    write_row_fingerprint(os.path.join(index_dir, COLOR_FINGERPRINT_FILE), product_ids)
+    print(f"Extracted {colors}-color palettes for {n - missing} products ({missing} without images) "
+          f"in {time.time() - start_time:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute dominant-color palettes for color= filtering")
+    parser.add_argument("--images-dir", required=True)
+    parser.add_argument("--index-dir", default="faiss_index")
+    parser.add_argument("--colors", type=int, default=5, help="palette colors per product")
+    parser.add_argument("--size", type=int, default=32, help="downsampled image side in pixels")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--keep-background", action="store_true",
+                        help="cluster every pixel instead of dropping the border-colored backdrop")
+    parser.add_argument("--workers", type=int, default=8, help="image decoding threads")
+    args = parser.parse_args()
+    build_color_palettes(args.images_dir, args.index_dir, args.colors, args.size, args.iterations,
+                         args.batch_size, args.keep_background, args.workers)
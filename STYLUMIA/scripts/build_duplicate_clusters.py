@@ -0,0 +1,74 @@
+import argparse
+import numpy as np
+import os
+import sys
+import time
+
+STYLUMIA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(STYLUMIA_DIR)
+sys.path.append(os.path.join(STYLUMIA_DIR, "backend"))
+from scripts.index_io import load_index, index_vectors
+from index_bundle import write_row_fingerprint
+
+DUPLICATE_CLUSTERS_FILE = "duplicate_clusters.npy"
+DUPLICATE_FINGERPRINT_FILE = "duplicate_clusters.json"
+
+
+def _find(parent, i):
+    root = i
+    while parent[root] != root:
+        root = parent[root]
+    while parent[i] != root:
+        parent[i], i = root, parent[i]
+    return root
+
+
+def build_duplicate_clusters(index_dir="faiss_index", threshold=0.97, block_size=1024):
+    """
+    Group near-identical catalog images into duplicate clusters
+
+    Runs a blocked similarity join and unions every pair scoring at least
+    `threshold`. Each row gets the smallest row id of its cluster as cluster
+    id, so rows where cluster_id == row are the cluster representatives.
+    Stored as int32 next to product_ids.npy, with duplicate_clusters.json
+    fingerprinting the product ids those rows belong to.
+    """
+    start_time = time.time()
+    index, product_ids = load_index(index_dir)
+    vectors = index_vectors(index)
+    n = len(vectors)
+
+    parent = np.arange(n)
+    num_pairs = 0
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        # Upper triangle only: compare the block against itself and later rows
+        sims = vectors[start:stop] @ vectors[start:].T
+        rows, cols = np.nonzero(sims >= threshold)
+        cols = cols + start
+        rows = rows + start
+        keep = cols > rows
+        for i, j in zip(rows[keep], cols[keep]):
+            root_i, root_j = _find(parent, i), _find(parent, j)
+            if root_i != root_j:
+                parent[max(root_i, root_j)] = min(root_i, root_j)
+        num_pairs += int(keep.sum())
+
+    clusters = np.array([_find(parent, i) for i in range(n)], dtype='int32')
+    np.save(os.path.join(index_dir, DUPLICATE_CLUSTERS_FILE), clusters)
+    write_row_fingerprint(os.path.join(index_dir, DUPLICATE_FINGERPRINT_FILE), product_ids,
+                          threshold=float(threshold))
+
+    num_clusters = int((clusters == np.arange(n)).sum())
+    print(f"Found {num_pairs} duplicate pairs: {n} products -> {num_clusters} clusters "
+          f"(threshold={threshold}) in {time.time() - start_time:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Assign near-duplicate cluster ids to catalog products")
+    parser.add_argument("--index-dir", default="faiss_index")
+    parser.add_argument("--threshold", type=float, default=0.97,
+                        help="Cosine similarity at or above which two images are duplicates")
+    parser.add_argument("--block-size", type=int, default=1024)
+    args = parser.parse_args()
+    build_duplicate_clusters(args.index_dir, args.threshold, args.block_size)
@@ -1,9 +1,14 @@
+import argparse
 import numpy as np
 import faiss
 import os
+import sys
 import time
 
-def build_faiss_index(embeddings_dir="embeddings", output_dir="faiss_index"):
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+from index_bundle import describe_index, write_manifest
+
+def build_faiss_index(embeddings_dir="embeddings", output_dir="faiss_index", model="ViT-B/32"):
     # Validate input directory
     if not os.path.exists(embeddings_dir):
         raise FileNotFoundError(f"Directory not found: {embeddings_dir}")
@@ -14,6 +19,7 @@ def build_faiss_index(embeddings_dir="embeddings", output_dir="faiss_index"):
     start_time = time.time()
     embeddings = []
     product_ids = []
+    skipped = 0
     
     for emb_file in os.listdir(embeddings_dir):
         if emb_file.endswith('.npy'):
@@ -24,12 +30,14 @@ def build_faiss_index(embeddings_dir="embeddings", output_dir="faiss_index"):
                 if emb.ndim == 1:
                     emb = emb.reshape(1, -1)
                 if not np.isfinite(emb).all():
+                    skipped += 1
                     continue
                     
                 embeddings.append(emb)
                 product_ids.append(product_id)
             except Exception as e:
                 print(f"Skipping {emb_file}: {str(e)}")
+                skipped += 1
                 continue
 
     if not embeddings:
@@ -50,15 +58,20 @@ def build_faiss_index(embeddings_dir="embeddings", output_dir="faiss_index"):
     faiss.write_index(index, os.path.join(output_dir, "cosine_index.faiss"))
     np.save(os.path.join(output_dir, "product_ids.npy"), np.array(product_ids))
     
-    # Save metadata
-    metadata = {
-        "num_embeddings": len(product_ids),
-        "embedding_dim": dimension,
-        "build_time": time.time() - start_time
-    }
-    np.save(os.path.join(output_dir, "metadata.npy"), metadata)
+    # Manifest: model, shape and checksums, validated by the loaders
+    build_time = time.time() - start_time
+    write_manifest(output_dir, model, dimension, len(product_ids), describe_index(index), {
+        "embeddings_dir": os.path.abspath(embeddings_dir),
+        "skipped": skipped,
+        "build_time": round(build_time, 3)
+    })
 
-    print(f"Built index with {len(product_ids)} embeddings in {metadata['build_time']:.2f}s")
+    print(f"Built index with {len(product_ids)} embeddings in {build_time:.2f}s")
 
 if __name__ == "__main__":
-    build_faiss_index()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build the cosine FAISS index from per-product embeddings")
+    parser.add_argument("--embeddings-dir", default="embeddings")
+    parser.add_argument("--output-dir", default="faiss_index")
+    parser.add_argument("--model", default="ViT-B/32", help="CLIP model the embeddings were made with")
+    args = parser.parse_args()
+    build_faiss_index(args.embeddings_dir, args.output_dir, args.model)
\ No newline at end of file
@@ -0,0 +1,128 @@
+import argparse
+import numpy as np
+import os
+import sys
+import time
+
+STYLUMIA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(STYLUMIA_DIR)
+sys.path.append(os.path.join(STYLUMIA_DIR, "backend"))
+from scripts.index_io import load_index, index_vectors
+from index_bundle import row_fingerprint_mismatch, write_row_fingerprint
+from knn_graph import KNN_FINGERPRINT_FILE, KNN_IDS_FILE, KNN_SCORES_FILE
+
+
+def _top_k(scores, k):
+    """Row-wise top-k (indices, scores) of a score block, sorted descending"""
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1)
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_scores, order, axis=1)
+
+
+def _neighbors_for_rows(vectors, rows, k, block_size):
+    """Exact top-k neighbors (excluding self) for the given rows against all vectors"""
+    ids = np.empty((len(rows), k), dtype='int32')
+    scores = np.empty((len(rows), k), dtype='float16')
+
+    for start in range(0, len(rows), block_size):
+        block_rows = rows[start:start + block_size]
+        sims = vectors[block_rows] @ vectors.T
+        sims[np.arange(len(block_rows)), block_rows] = -np.inf
+        block_ids, block_scores = _top_k(sims, k)
+        ids[start:start + len(block_rows)] = block_ids
+        scores[start:start + len(block_rows)] = block_scores
+    return ids, scores
+
+
+def _save_atomic(path, array):
+    tmp_path = path + ".tmp.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+
+def build_knn_graph(index_dir="faiss_index", k=50, block_size=1024, incremental=False):
+    """
+    Precompute the top-k neighbors of every catalog product
+
+    Runs a blocked self-join (vectors are L2-normalized, so a matmul gives
+    cosine similarity) and stores neighbor row ids (int32) and scores
+    (float16) next to product_ids.npy. Row ids index into product_ids.npy,
+    so knn_graph.json records a fingerprint of the ids the graph was built for.
+
+    With incremental=True, only rows appended to the index since the last
+    build are joined against the catalog, and existing rows merge the new
+    products into their current top-k. That requires the old rows to still
+    hold the same products; otherwise (e.g. after build_faiss.py re-listed
+    the images) the graph is rebuilt from scratch.
+    """
+    start_time = time.time()
+    index, product_ids = load_index(index_dir)
+    vectors = index_vectors(index)
+    n = len(vectors)
+    k = min(k, n - 1)
+    if k < 1:
+        raise ValueError("Need at least two products to build a kNN graph")
+
+    ids_path = os.path.join(index_dir, KNN_IDS_FILE)
+    scores_path = os.path.join(index_dir, KNN_SCORES_FILE)
+    fingerprint_path = os.path.join(index_dir, KNN_FINGERPRINT_FILE)
+
+    old_ids = old_scores = None
+    if incremental and os.path.exists(ids_path) and os.path.exists(scores_path):
+        mismatch = row_fingerprint_mismatch(fingerprint_path, product_ids)
+        old_ids = np.load(ids_path)
+        old_scores = np.load(scores_path)
+        if mismatch or old_ids.shape[1] != k:
+            print(f"Existing graph does not match index ({mismatch or f'k={old_ids.shape[1]}'}), "
+                  f"rebuilding from scratch")
+            old_ids = old_scores = None
+
+    if old_ids is None:
+        knn_ids, knn_scores = _neighbors_for_rows(vectors, np.arange(n), k, block_size)
+    else:
+        n_old = old_ids.shape[0]
+        if n_old == n:
+            print("kNN graph already up to date")
+            return
+        new_rows = np.arange(n_old, n)
+        new_ids, new_scores = _neighbors_for_rows(vectors, new_rows, k, block_size)
+
+        # Merge the new products into the neighbor lists of existing rows
+        merged_ids = np.empty((n_old, k), dtype='int32')
+        merged_scores = np.empty((n_old, k), dtype='float16')
+        for start in range(0, n_old, block_size):
+            stop = min(start + block_size, n_old)
+            cand_scores = np.hstack([
+                old_scores[start:stop].astype('float32'),
+                vectors[start:stop] @ vectors[new_rows].T,
+            ])
+            cand_ids = np.hstack([
+                old_ids[start:stop],
+                np.broadcast_to(new_rows.astype('int32'), (stop - start, len(new_rows))),
+            ])
+            pos, top_scores = _top_k(cand_scores, k)
+            merged_ids[start:stop] = np.take_along_axis(cand_ids, pos, axis=1)
+            merged_scores[start:stop] = top_scores
+
+        knn_ids = np.vstack([merged_ids, new_ids])
+        knn_scores = np.vstack([merged_scores, new_scores])
+
+    _save_atomic(ids_path, knn_ids)
+    _save_atomic(scores_path, knn_scores)
+    # Written last: the server only trusts the graph once the fingerprint matches
+    write_row_fingerprint(fingerprint_path, product_ids, k=int(k))
+
+    mode = "Updated" if old_ids is not None else "Built"
+    print(f"{mode} kNN graph for {n} products (k={k}) in {time.time() - start_time:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute top-k similar items for every product")
+    parser.add_argument("--index-dir", default="faiss_index")
+    parser.add_argument("--k", type=int, default=50)
+    parser.add_argument("--block-size", type=int, default=1024)
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only add rows appended to the index since the last build")
+    args = parser.parse_args()
+    build_knn_graph(args.index_dir, args.k, args.block_size, args.incremental)
@@ -0,0 +1,34 @@
+import argparse
+import os
+import sys
+import time
+
+STYLUMIA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(STYLUMIA_DIR)
+sys.path.append(os.path.join(STYLUMIA_DIR, "backend"))
+from scripts.index_io import load_index
+from index_bundle import BUNDLE_MANIFEST, describe_index, write_manifest
+
+
+def build_manifest(index_dir="faiss_index", model="ViT-B/32"):
+    """
+    Write manifest.json for an existing index dir (built before manifests,
+    or re-copied) so the loaders can validate it
+    """
+    start_time = time.time()
+    index, product_ids = load_index(index_dir)
+    if len(product_ids) != index.ntotal:
+        raise ValueError(f"{index_dir}: {index.ntotal} vectors but {len(product_ids)} product ids")
+    manifest = write_manifest(index_dir, model, index.d, index.ntotal, describe_index(index),
+                              {"backfilled": True})
+    size = sum(entry["bytes"] for entry in manifest["files"].values())
+    print(f"Wrote {os.path.join(index_dir, BUNDLE_MANIFEST)}: {model}, {index.ntotal} x {index.d} "
+          f"{manifest['index_type']}, {size / 1024 / 1024:.1f} MiB checksummed in {time.time() - start_time:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a checksummed manifest for an existing index dir")
+    parser.add_argument("--index-dir", default="faiss_index")
+    parser.add_argument("--model", default="ViT-B/32", help="CLIP model the index was built with")
+    args = parser.parse_args()
+    build_manifest(args.index_dir, args.model)
@@ -0,0 +1,64 @@
+import argparse
+import faiss
+import numpy as np
+import os
+import sys
+import time
+import zlib
+
+STYLUMIA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(STYLUMIA_DIR)
+sys.path.append(os.path.join(STYLUMIA_DIR, "backend"))
+from scripts.index_io import load_index, index_vectors
+from index_bundle import describe_index, load_manifest, write_manifest
+
+
+def shard_of(product_id, num_shards):
+    """Stable shard assignment by hash of product_id"""
+    return zlib.crc32(str(product_id).encode("utf-8")) % num_shards
+
+
+def build_shards(index_dir="faiss_index", output_dir="faiss_shards", num_shards=4, model=None):
+    """
+    Partition the catalog index into num_shards shard directories
+
+    Each output_dir/shard_<i> holds its own cosine_index.faiss and
+    product_ids.npy and can be served by backend/shard_worker.py. Shard
+    manifests inherit the model of the source manifest unless given.
+    """
+    start_time = time.time()
+    index, product_ids = load_index(index_dir)
+    source = load_manifest(index_dir) or {}
+    model = model or source.get("model")
+    if model is None:
+        raise ValueError(f"No manifest in {index_dir}; pass --model")
+    vectors = index_vectors(index)
+
+    assignment = np.array([shard_of(pid, num_shards) for pid in product_ids])
+    for shard in range(num_shards):
+        rows = np.nonzero(assignment == shard)[0]
+        shard_dir = os.path.join(output_dir, f"shard_{shard}")
+        os.makedirs(shard_dir, exist_ok=True)
+
+        shard_index = faiss.IndexIDMap2(faiss.IndexFlatIP(vectors.shape[1]))
+        shard_index.add_with_ids(vectors[rows], np.arange(len(rows)).astype('int64'))
+        faiss.write_index(shard_index, os.path.join(shard_dir, "cosine_index.faiss"))
+        np.save(os.path.join(shard_dir, "product_ids.npy"), product_ids[rows])
+        write_manifest(shard_dir, model, vectors.shape[1], len(rows), describe_index(shard_index), {
+            "source": os.path.abspath(index_dir),
+            "shard": shard,
+            "num_shards": num_shards
+        }, source.get("normalization", "l2"))
+        print(f"Shard {shard}: {len(rows)} products")
+
+    print(f"Built {num_shards} shards from {len(product_ids)} products in {time.time() - start_time:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Partition the index into hash shards")
+    parser.add_argument("--index-dir", default="faiss_index")
+    parser.add_argument("--output-dir", default="faiss_shards")
+    parser.add_argument("--num-shards", type=int, default=4)
+    parser.add_argument("--model", help="CLIP model of the index (default: from its manifest)")
+    args = parser.parse_args()
+    build_shards(args.index_dir, args.output_dir, args.num_shards, args.model)
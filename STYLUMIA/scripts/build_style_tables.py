@@ -0,0 +1,163 @@
+import argparse
+import faiss
+import json
+import numpy as np
+import os
+import sys
+import time
+
+import pandas as pd
+
+STYLUMIA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(STYLUMIA_DIR)
+sys.path.append(os.path.join(STYLUMIA_DIR, "backend"))
+from scripts.index_io import load_index, index_vectors
+from category_registry import load_category_configs
+from index_bundle import write_row_fingerprint
+from style_tables import (STYLE_CLUSTERS_FILE, STYLE_CLUSTER_ITEMS_FILE, STYLE_FINGERPRINT_FILE, STYLE_TABLE_FILE,
+                          table_key)
+
+
+def _save_atomic(path, array):
+    tmp_path = path + ".tmp.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+
+def _kmeans(vectors, k, seed):
+    """Spherical k-means; returns (unit centroids, cluster label per row)"""
+    k = min(k, len(vectors))
+    kmeans = faiss.Kmeans(vectors.shape[1], k, niter=25, spherical=True, seed=seed)
+    kmeans.train(vectors)
+    _, labels = kmeans.index.search(vectors, 1)
+    centroids = kmeans.centroids.copy()
+    faiss.normalize_L2(centroids)
+    return centroids, labels[:, 0].astype('int16')
+
+
+def _cluster_items(vectors, centroids, labels, per_cluster):
+    """Rows nearest each centroid, (k, per_cluster) int32 padded with -1"""
+    items = np.full((len(centroids), per_cluster), -1, dtype='int32')
+    for cluster in range(len(centroids)):
+        rows = np.flatnonzero(labels == cluster)
+        nearest = rows[np.argsort(-(vectors[rows] @ centroids[cluster]))[:per_cluster]]
+        items[cluster, :len(nearest)] = nearest
+    return items
+
+
+def _cooccurrence(cooccurrence_csv, categories, labels, row_maps, num_clusters):
+    """{(source, target): (k_source, k_target) counts} from an outfit_id,product_id CSV"""
+    df = pd.read_csv(cooccurrence_csv, usecols=["outfit_id", "product_id"], dtype=str).dropna()
+    located = []
+    for product_id in df["product_id"]:
+        for name in categories:
+            row = row_maps[name].get(product_id)
+            if row is not None:
+                located.append((name, int(labels[name][row])))
+                break
+        else:
+            located.append(None)
+    df["item"] = located
+    df = df[df["item"].notna()]
+
+    counts = {}
+    for _, items in df.groupby("outfit_id")["item"]:
+        items = list(items)
+        for source, source_cluster in items:
+            for target, target_cluster in items:
+                if source == target:
+                    continue
+                if (source, target) not in counts:
+                    counts[(source, target)] = np.zeros((num_clusters[source], num_clusters[target]),
+                                                        dtype='float32')
+                counts[(source, target)][source_cluster, target_cluster] += 1
+    print(f"Co-occurrence: {len(df)} catalog items in {df['outfit_id'].nunique()} outfits, "
+          f"{len(counts)} category pairs")
+    return counts
+
+
+def build_style_tables(categories_file, output=STYLE_TABLE_FILE, clusters=64, rules_file=None,
+                       cooccurrence_csv=None, cooccurrence_weight=0.7, top_pairs=8, items_per_cluster=32, seed=0):
+    """
+    Build "complete the look" tables across categories
+
+    Clusters every category's embeddings with k-means and stores the cluster
+    of each row plus the items nearest each centroid in the category's index
+    dir, with a style_clusters.json fingerprint of the product_ids they
+    index. For each (source, target) category pair allowed by the pairing rules
+    ({"dresses": {"shoes": 1.0, "bags": 0.8}}, default: every pair at 1.0),
+    every source cluster gets its top_pairs target clusters, scored by
+    rule weight * centroid cosine, blended with normalized outfit
+    co-occurrence counts when a co-occurrence CSV is given.
+    """
+    start_time = time.time()
+    configs = load_category_configs(categories_file, {})
+    categories = list(configs)
+    if len(categories) < 2:
+        raise ValueError(f"Need at least two categories in {categories_file}, found {categories}")
+
+    if rules_file:
+        with open(rules_file, encoding="utf-8") as f:
+            rules = json.load(f)
+    else:
+        rules = {source: {target: 1.0 for target in categories if target != source} for source in categories}
+
+    centroids, labels, row_maps = {}, {}, {}
+    for name in categories:
+        index_dir = configs[name].index_path
+        index, product_ids = load_index(index_dir)
+        vectors = index_vectors(index)
+        centroids[name], labels[name] = _kmeans(vectors, clusters, seed)
+        items = _cluster_items(vectors, centroids[name], labels[name], items_per_cluster)
+        _save_atomic(os.path.join(index_dir, STYLE_CLUSTERS_FILE), labels[name])
+        _save_atomic(os.path.join(index_dir, STYLE_CLUSTER_ITEMS_FILE), items)
+        # Written last: the server only trusts the clusters once the fingerprint matches
+        write_row_fingerprint(os.path.join(index_dir, STYLE_FINGERPRINT_FILE), product_ids)
+        row_maps[name] = {str(product_id): row for row, product_id in enumerate(product_ids)}
+        sizes = np.bincount(labels[name], minlength=len(centroids[name]))
+        print(f"{name}: {len(vectors)} products -> {len(centroids[name])} clusters "
+              f"(sizes {sizes.min()}-{sizes.max()})")
+
+    counts = {}
+    if cooccurrence_csv:
+        num_clusters = {name: len(centroids[name]) for name in categories}
+        counts = _cooccurrence(cooccurrence_csv, categories, labels, row_maps, num_clusters)
+
+    table = {}
+    for source, targets in rules.items():
+        for target, weight in targets.items():
+            if source not in centroids or target not in centroids or source == target:
+                print(f"Skipping rule {source} -> {target}")
+                continue
+            scores = centroids[source] @ centroids[target].T
+            if (source, target) in counts:
+                observed = counts[(source, target)]
+                observed = observed / np.maximum(observed.max(axis=1, keepdims=True), 1.0)
+                scores = (1.0 - cooccurrence_weight) * scores + cooccurrence_weight * observed
+            scores = float(weight) * scores
+            order = np.argsort(-scores, axis=1)[:, :top_pairs]
+            table[f"{table_key(source, target)}/clusters"] = order.astype('int16')
+            table[f"{table_key(source, target)}/scores"] = np.take_along_axis(scores, order, axis=1).astype('float32')
+
+    tmp_output = output + ".tmp.npz"
+    np.savez(tmp_output, **table)
+    os.replace(tmp_output, output)
+    print(f"Wrote {len(table) // 2} category pairs to {output} "
+          f"({os.path.getsize(output) / 1024:.1f} KiB) in {time.time() - start_time:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build cross-category 'complete the look' tables")
+    parser.add_argument("--categories", default="categories.json",
+                        help="{category: {index_path, ...}} JSON, as used by the backend")
+    parser.add_argument("--output", default=STYLE_TABLE_FILE)
+    parser.add_argument("--clusters", type=int, default=64, help="k-means clusters per category")
+    parser.add_argument("--rules", help='JSON pairing rules: {"dresses": {"shoes": 1.0, "bags": 0.8}}')
+    parser.add_argument("--cooccurrence", help="CSV with outfit_id,product_id rows of items worn together")
+    parser.add_argument("--cooccurrence-weight", type=float, default=0.7)
+    parser.add_argument("--top-pairs", type=int, default=8, help="target clusters kept per source cluster")
+    parser.add_argument("--items-per-cluster", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    build_style_tables(args.categories, args.output, args.clusters, args.rules, args.cooccurrence,
+                       args.cooccurrence_weight, args.top_pairs, args.items_per_cluster, args.seed)
@@ -0,0 +1,43 @@
+import argparse
+import numpy as np
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.clip_embeddings import get_text_embeddings
+
+CLIP_MODEL = "ViT-B/32"
+
+
+def build_text_warmset(queries_file="top_text_queries.txt", output_dir="faiss_index"):
+    """
+    Precompute CLIP text vectors for the most popular text queries
+
+    Reads one query per line and writes text_warmset.npz (queries, vectors,
+    model) which the API pins in its text-embedding cache at startup.
+    """
+    if not os.path.exists(queries_file):
+        raise FileNotFoundError(f"Queries file not found: {queries_file}")
+
+    start_time = time.time()
+    with open(queries_file, encoding="utf-8") as f:
+        queries = list(dict.fromkeys(line.strip() for line in f if line.strip()))
+    if not queries:
+        raise ValueError("No queries found")
+
+    vectors = get_text_embeddings(queries)
+
+    os.makedirs(output_dir, exist_ok=True)
+    np.savez(os.path.join(output_dir, "text_warmset.npz"),
+             queries=np.array(queries), vectors=vectors, model=np.array(CLIP_MODEL))
+
+    print(f"Encoded {len(queries)} warm text queries in {time.time() - start_time:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute text embeddings for popular queries")
+    parser.add_argument("--queries-file", default="top_text_queries.txt")
+    parser.add_argument("--output-dir", default="faiss_index")
+    args = parser.parse_args()
+    build_text_warmset(args.queries_file, args.output_dir)
@@ -0,0 +1,111 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, features
+
+STYLUMIA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(STYLUMIA_DIR)
+sys.path.append(os.path.join(STYLUMIA_DIR, "backend"))
+from image_decode import decode_image
+from thumbnails import THUMBNAIL_SIZES, THUMBNAILS_MANIFEST
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+def _make_thumbnails(task):
+    """Decode one image near the largest size and write every thumbnail size"""
+    image_path, product_id, output_dir, sizes, fmt, quality = task
+    outputs = [os.path.join(output_dir, str(size), f"{product_id}.{fmt}") for size in sizes]
+    source_mtime = os.path.getmtime(image_path)
+    if all(os.path.exists(out) and os.path.getmtime(out) >= source_mtime for out in outputs):
+        return "skipped"
+
+    try:
+        image, _ = decode_image(image_path, target_size=max(sizes))
+    except Exception as e:
+        return f"error: {getattr(e, 'detail', e)}"
+
+    # Largest first so each smaller size resamples an already reduced image
+    for size, out in sorted(zip(sizes, outputs), reverse=True):
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        tmp = f"{out}.tmp"
+        if fmt == "webp":
+            image.save(tmp, "WEBP", quality=quality, method=4)
+        else:
+            image.save(tmp, "JPEG", quality=quality, optimize=True, progressive=True)
+        os.replace(tmp, out)
+    return "written"
+
+
+def build_thumbnails(images_dir, output_dir=None, sizes=THUMBNAIL_SIZES, fmt="webp",
+                     quality=80, workers=None):
+    """
+    Generate multi-size thumbnails for every catalog image, in parallel
+
+    Writes <output_dir>/<size>/<product_id>.<fmt> (output_dir defaults to
+    <images_dir>_thumbs) and thumbnails.json, whose version is embedded in
+    the API's thumbnail URLs. Thumbnails newer than their source are kept.
+    """
+    if not os.path.exists(images_dir):
+        raise FileNotFoundError(f"Directory not found: {images_dir}")
+    if fmt == "webp" and not features.check("webp"):
+        print("Pillow was built without WebP support, falling back to JPEG")
+        fmt = "jpg"
+
+    output_dir = output_dir or os.path.normpath(images_dir) + "_thumbs"
+    sizes = sorted(set(sizes))
+    for size in sizes:
+        os.makedirs(os.path.join(output_dir, str(size)), exist_ok=True)
+
+    start_time = time.time()
+    tasks = [
+        (os.path.join(images_dir, filename), os.path.splitext(filename)[0], output_dir, sizes, fmt, quality)
+        for filename in sorted(os.listdir(images_dir))
+        if filename.lower().endswith(IMAGE_EXTENSIONS)
+    ]
+
+    counts = {"written": 0, "skipped": 0, "errors": 0}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for (image_path, *_), status in zip(tasks, pool.map(_make_thumbnails, tasks, chunksize=32)):
+            if status.startswith("error"):
+                counts["errors"] += 1
+                print(f"Skipping {image_path}: {status}")
+            else:
+                counts[status] += 1
+
+    # Keep the version (and so every cached URL) unless some thumbnail changed
+    manifest_file = os.path.join(output_dir, THUMBNAILS_MANIFEST)
+    version = format(int(time.time()), "x")
+    if counts["written"] == 0 and os.path.exists(manifest_file):
+        with open(manifest_file) as f:
+            previous = json.load(f)
+        if previous.get("sizes") == sizes and previous.get("format") == fmt:
+            version = previous["version"]
+
+    manifest = {
+        "sizes": sizes,
+        "format": fmt,
+        "quality": quality,
+        "count": counts["written"] + counts["skipped"],
+        "version": version,
+    }
+    with open(manifest_file, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    print(f"Thumbnails: {counts['written']} written, {counts['skipped']} up to date, "
+          f"{counts['errors']} failed in {time.time() - start_time:.2f}s -> {output_dir}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate catalog thumbnails")
+    parser.add_argument("--images-dir", required=True)
+    parser.add_argument("--output-dir", default=None)
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(THUMBNAIL_SIZES))
+    parser.add_argument("--format", choices=["webp", "jpg"], default="webp")
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    build_thumbnails(args.images_dir, args.output_dir, args.sizes, args.format, args.quality, args.workers)
@@ -0,0 +1,126 @@
+import argparse
+import faiss
+import json
+import numpy as np
+import os
+import sys
+import time
+
+STYLUMIA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(STYLUMIA_DIR)
+sys.path.append(os.path.join(STYLUMIA_DIR, "backend"))
+from scripts.index_io import load_index, index_vectors
+from stage_metrics import StageMetrics, StageTimer
+from two_stage import (CANDIDATE_BINARY_FILE, CANDIDATE_IVFPQ_FILE, EMBEDDINGS_FILE,
+                       TwoStageIndex)
+
+
+def _exact_top_k(queries, vectors, k, block_size=256):
+    ids = np.empty((len(queries), k), dtype='int64')
+    for start in range(0, len(queries), block_size):
+        sims = queries[start:start + block_size] @ vectors.T
+        part = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        ids[start:start + block_size] = part
+    return ids
+
+
+def recall_report(index_dir, vectors, top_k=10, rerank_candidates=200, nprobe=16,
+                  num_queries=500, noise=0.05, seed=0):
+    """
+    Recall@top_k of two-stage search vs exact flat search, plus stage timings
+
+    Queries are catalog vectors with Gaussian noise added (then re-normalized)
+    to stand in for unseen photos of catalog items.
+    """
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(vectors), min(num_queries, len(vectors)), replace=False)
+    queries = vectors[rows] + noise * rng.standard_normal((len(rows), vectors.shape[1])).astype('float32')
+    faiss.normalize_L2(queries)
+
+    exact = _exact_top_k(queries, vectors, top_k)
+    searcher = TwoStageIndex(index_dir, rerank_candidates, nprobe)
+
+    metrics = StageMetrics(window=len(queries))
+    hits = 0
+    for query, truth in zip(queries, exact):
+        _, found = searcher.search(query.reshape(1, -1), top_k, timer=StageTimer(metrics))
+        hits += len(set(found[0].tolist()) & set(truth.tolist()))
+    stages = metrics.summary()["stages"]
+
+    return {
+        "kind": searcher.kind,
+        "top_k": top_k,
+        "rerank_candidates": rerank_candidates,
+        "nprobe": nprobe,
+        "num_queries": len(queries),
+        "recall_at_k": hits / (len(queries) * top_k),
+        "candidate_search_ms": stages["candidate_search"],
+        "rerank_ms": stages["rerank"],
+        "candidate_index_bytes": searcher.file_size,
+        "flat_index_bytes": int(vectors.nbytes),
+    }
+
+
+def build_two_stage(index_dir="faiss_index", kind="ivfpq", nlist=None, pq_m=64,
+                    top_k=10, rerank_candidates=200, nprobe=16, num_eval_queries=500):
+    """
+    Build the compressed candidate index and memory-mappable embeddings
+
+    Writes embeddings.npy (float32, rows aligned with product_ids.npy) and
+    either candidate_index.faiss (IVF-PQ) or candidate_index.bin (binary
+    sign hash), then writes two_stage_report.json with recall vs exact search.
+    """
+    start_time = time.time()
+    index, product_ids = load_index(index_dir)
+    vectors = index_vectors(index)
+    n, d = vectors.shape
+
+    np.save(os.path.join(index_dir, EMBEDDINGS_FILE), vectors)
+
+    ivfpq_file = os.path.join(index_dir, CANDIDATE_IVFPQ_FILE)
+    binary_file = os.path.join(index_dir, CANDIDATE_BINARY_FILE)
+    if kind == "ivfpq":
+        if n < 256 * 39:
+            raise ValueError(f"{n} vectors are too few to train 8-bit PQ; use --kind binary")
+        nlist = nlist or max(1, int(4 * np.sqrt(n)))
+        quantizer = faiss.IndexFlatIP(d)
+        candidates = faiss.IndexIVFPQ(quantizer, d, nlist, pq_m, 8, faiss.METRIC_INNER_PRODUCT)
+        rng = np.random.default_rng(0)
+        train = vectors[rng.choice(n, min(n, 100_000), replace=False)]
+        candidates.train(train)
+        candidates.add_with_ids(vectors, np.arange(n).astype('int64'))
+        faiss.write_index(candidates, ivfpq_file)
+        if os.path.exists(binary_file):
+            os.remove(binary_file)
+    elif kind == "binary":
+        candidates = faiss.IndexBinaryFlat(d)
+        candidates.add(np.packbits(vectors > 0, axis=1))
+        faiss.write_index_binary(candidates, binary_file)
+        if os.path.exists(ivfpq_file):
+            os.remove(ivfpq_file)
+    else:
+        raise ValueError(f"Unknown candidate index kind: {kind}")
+
+    print(f"Built {kind} candidate index for {n} products in {time.time() - start_time:.2f}s")
+
+    report = recall_report(index_dir, vectors, top_k, rerank_candidates, nprobe, num_eval_queries)
+    with open(os.path.join(index_dir, "two_stage_report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Recall@{top_k}: {report['recall_at_k']:.4f} "
+          f"(candidates p50 {report['candidate_search_ms']['p50_ms']:.2f}ms, "
+          f"rerank p50 {report['rerank_ms']['p50_ms']:.2f}ms)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the two-stage (compressed + exact re-rank) index")
+    parser.add_argument("--index-dir", default="faiss_index")
+    parser.add_argument("--kind", choices=["ivfpq", "binary"], default="ivfpq")
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--pq-m", type=int, default=64, help="PQ sub-quantizers (must divide the dimension)")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--rerank-candidates", type=int, default=200)
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--eval-queries", type=int, default=500)
+    args = parser.parse_args()
+    build_two_stage(args.index_dir, args.kind, args.nlist, args.pq_m, args.top_k,
+                    args.rerank_candidates, args.nprobe, args.eval_queries)
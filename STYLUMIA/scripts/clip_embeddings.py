@@ -1,10 +1,14 @@
 import os
+import sys
 import clip
 import torch
 from PIL import Image
-from typing import Union
+from typing import List, Union
 import numpy as np
 
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+from resource_registry import acquire_clip
+
 # Initialize CLIP model (loaded once at startup)
 device = "cuda" if torch.cuda.is_available() else "cpu"
 model, preprocess = None, None
@@ -13,7 +17,8 @@ def initialize_clip():
     """Initialize CLIP model (call this once at startup)"""
     global model, preprocess
     if model is None or preprocess is None:
-        model, preprocess = clip.load("ViT-B/32", device=device)
+        # Shared with any other CLIP user in this process
+        model, preprocess = acquire_clip("ViT-B/32", device)
 
 def get_embedding(image_input: Union[str, Image.Image]) -> np.ndarray:  # Changed return type
     """
@@ -52,6 +57,28 @@ def get_embedding(image_input: Union[str, Image.Image]) -> np.ndarray:  # Change
     except Exception as e:
         print(f"Error processing image: {str(e)}")
         return None
+
+
+def get_text_embeddings(texts: List[str], batch_size: int = 256) -> np.ndarray:
+    """
+    Get L2-normalized CLIP text embeddings for a list of queries
+
+    Returns:
+        np.ndarray: float32 array of shape [len(texts), 512]
+    """
+    if model is None or preprocess is None:
+        initialize_clip()
+
+    embeddings = []
+    for start in range(0, len(texts), batch_size):
+        tokens = clip.tokenize(texts[start:start + batch_size], truncate=True).to(device)
+        with torch.no_grad():
+            embeddings.append(model.encode_text(tokens).cpu().numpy().astype('float32'))
+
+    embeddings = np.vstack(embeddings)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings
+
 # Example usage
 '''if __name__ == "__main__":
     # Initialize once
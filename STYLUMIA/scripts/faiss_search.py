@@ -1,8 +1,13 @@
 import faiss
 import numpy as np
 import os
+import sys
 from typing import List
 
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+from index_bundle import check_loaded, validate_bundle
+from resource_registry import acquire_index
+
 class EmbeddingSimilaritySearch:
     def __init__(self, index_path: str = "faiss_index"):
         """
@@ -28,7 +33,9 @@ class EmbeddingSimilaritySearch:
         if not os.path.exists(index_file) or not os.path.exists(ids_file):
             raise FileNotFoundError("Required index files not found")
 
-        self.index = faiss.read_index(index_file)
+        manifest = validate_bundle(index_path)
+        self.index = acquire_index(index_file)
+        check_loaded(manifest, self.index.d, self.index.ntotal, index_path)
         self.product_ids = np.load(ids_file)
 
     def search(self, embedding: np.ndarray, top_k: int = 5) -> List[str]:
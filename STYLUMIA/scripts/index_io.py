@@ -0,0 +1,35 @@
+import faiss
+import numpy as np
+import os
+
+
+def load_index(index_dir="faiss_index"):
+    """Load cosine_index.faiss and product_ids.npy from an index directory"""
+    index_file = os.path.join(index_dir, "cosine_index.faiss")
+    ids_file = os.path.join(index_dir, "product_ids.npy")
+
+    if not os.path.exists(index_file) or not os.path.exists(ids_file):
+        raise FileNotFoundError(f"Required index files not found in {index_dir}")
+
+    return faiss.read_index(index_file), np.load(ids_file)
+
+
+def index_vectors(index):
+    """
+    Return the stored (normalized) vectors of a flat index as a float32 matrix
+
+    Rows are ordered by index id, which build_faiss assigns as the row number
+    in product_ids.npy.
+    """
+    ids = None
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        ids = faiss.vector_to_array(index.id_map)
+        index = faiss.downcast_index(index.index)
+
+    vectors = index.reconstruct_n(0, index.ntotal).astype('float32')
+
+    if ids is not None and not np.array_equal(ids, np.arange(len(ids))):
+        ordered = np.empty_like(vectors)
+        ordered[ids] = vectors
+        vectors = ordered
+    return vectors
@@ -0,0 +1,102 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from image_proxy import DiskLRUCache, ImageProxy
+
+URL = "https://images.example.com/p1.jpg"
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 64
+
+
+def make_proxy(tmp_path, handler, **kwargs):
+    cache = DiskLRUCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    return ImageProxy(cache, transport=httpx.MockTransport(handler), **kwargs)
+
+
+def run(proxy, *coroutines):
+    """Run fetches on one event loop, closing the proxy's client afterwards"""
+    async def main():
+        try:
+            return await asyncio.gather(*coroutines, return_exceptions=True)
+        finally:
+            await proxy.close()
+    return asyncio.run(main())
+
+
+def test_miss_then_hit_fetches_once(tmp_path):
+    calls = []
+
+    def handler(request):
+        calls.append(str(request.url))
+        return httpx.Response(200, content=JPEG, headers={"content-type": "image/jpeg"})
+
+    proxy = make_proxy(tmp_path, handler)
+    (path, media_type, source), = run(proxy, proxy.fetch(URL))
+    assert (media_type, source) == ("image/jpeg", "miss")
+    with open(path, "rb") as f:
+        assert f.read() == JPEG
+
+    (hit_path, _, hit_source), = run(proxy, proxy.fetch(URL))
+    assert (hit_path, hit_source) == (path, "hit")
+    assert calls == [URL]
+    assert proxy.cache.stats()["entries"] == 1
+
+
+def test_concurrent_fetches_are_coalesced(tmp_path):
+    calls = []
+
+    async def handler(request):
+        calls.append(str(request.url))
+        # Yield long enough for every other fetch to find the in-flight task
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, content=JPEG, headers={"content-type": "image/jpeg"})
+
+    proxy = make_proxy(tmp_path, handler)
+    results = run(proxy, *(proxy.fetch(URL) for _ in range(5)))
+    assert len(calls) == 1
+    assert sorted(source for _, _, source in results) == ["coalesced"] * 4 + ["miss"]
+    assert len({path for path, _, _ in results}) == 1
+
+
+def test_coalesced_fetches_share_an_upstream_error(tmp_path):
+    calls = []
+
+    async def handler(request):
+        calls.append(str(request.url))
+        await asyncio.sleep(0.05)
+        return httpx.Response(503)
+
+    proxy = make_proxy(tmp_path, handler)
+    results = run(proxy, *(proxy.fetch(URL) for _ in range(3)))
+    assert len(calls) == 1
+    assert [error.status_code for error in results] == [502, 502, 502]
+
+
+@pytest.mark.parametrize("response, status_code", [
+    (httpx.Response(404), 404),
+    (httpx.Response(500), 502),
+    (httpx.Response(200, content=b"<html></html>", headers={"content-type": "text/html"}), 502),
+    (httpx.Response(200, content=JPEG * 4, headers={"content-type": "image/jpeg"}), 502),
+    (httpx.ReadTimeout("timed out"), 504),
+    (httpx.ConnectError("connection refused"), 502),
+])
+def test_upstream_errors_map_to_http_errors_and_are_not_cached(tmp_path, response, status_code):
+    calls = []
+
+    def handler(request):
+        calls.append(str(request.url))
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    proxy = make_proxy(tmp_path, handler, max_bytes=len(JPEG) * 2)
+    error, = run(proxy, proxy.fetch(URL))
+    assert isinstance(error, HTTPException)
+    assert error.status_code == status_code
+
+    # Failures are not cached: the next request goes upstream again
+    run(proxy, proxy.fetch(URL))
+    assert len(calls) == 2
+    assert proxy.cache.stats()["entries"] == 0